@@ -3,6 +3,7 @@ from pathlib import Path
 from datetime import timedelta
 import environ
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,6 +21,111 @@ ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['localhost', '127.0.0.1'])
 
 DEEPSEEK_API_KEY = env('DEEPSEEK_API_KEY', default='YOUR_API_KEY')
 
+# Threads for blocking provider calls per worker: async AI views and, under ASGI,
+# the sync AI views (learning/async_views.py AIThreadPoolMixin)
+AI_ASYNC_MAX_THREADS = env.int('AI_ASYNC_MAX_THREADS', default=64)
+
+# LLM provider client (learning/llm_client.py)
+DEEPSEEK_API_URL = env('DEEPSEEK_API_URL', default='https://api.deepseek.com')
+DEEPSEEK_MODEL = env('DEEPSEEK_MODEL', default='deepseek-chat')
+LLM_CONNECT_TIMEOUT = env.float('LLM_CONNECT_TIMEOUT', default=5.0)
+LLM_READ_TIMEOUT = env.float('LLM_READ_TIMEOUT', default=60.0)
+LLM_POOL_MAXSIZE = env.int('LLM_POOL_MAXSIZE', default=20)
+LLM_MAX_RETRIES = env.int('LLM_MAX_RETRIES', default=2)
+LLM_RETRY_BACKOFF = env.float('LLM_RETRY_BACKOFF', default=0.5)
+LLM_BREAKER_THRESHOLD = env.int('LLM_BREAKER_THRESHOLD', default=5)
+LLM_BREAKER_RESET_SECONDS = env.float('LLM_BREAKER_RESET_SECONDS', default=30.0)
+
+# LLM backends and hedging (learning/llm_router.py). LLM_BACKENDS is a JSON list of
+# {"name", "url", "api_key", "model"} in order of preference; empty = the DEEPSEEK_* provider only
+LLM_BACKENDS = env.json('LLM_BACKENDS', default=[])
+LLM_BACKEND_MAX_ERROR_RATE = env.float('LLM_BACKEND_MAX_ERROR_RATE', default=0.5)
+LLM_ROUTER_WINDOW = env.int('LLM_ROUTER_WINDOW', default=200)
+LLM_HEDGE_CALL_TYPES = env.list('LLM_HEDGE_CALL_TYPES', default=['grade_submission'])
+LLM_HEDGE_PERCENTILE = env.float('LLM_HEDGE_PERCENTILE', default=0.95)
+LLM_HEDGE_MIN_SAMPLES = env.int('LLM_HEDGE_MIN_SAMPLES', default=20)
+LLM_HEDGE_DEFAULT_DELAY = env.float('LLM_HEDGE_DEFAULT_DELAY', default=10.0)  # until enough samples
+LLM_HEDGE_MIN_DELAY = env.float('LLM_HEDGE_MIN_DELAY', default=0.5)
+
+# LLM response cache TTLs per call type, seconds (0 = never cached, e.g. personalized grading)
+LLM_CACHE_TTLS = {
+    'generate_task': env.int('LLM_CACHE_TTL_GENERATE_TASK', default=6 * 3600),
+    'generate_level_test': env.int('LLM_CACHE_TTL_LEVEL_TEST', default=24 * 3600),
+    'generate_recommendations': 0,
+    'grade_submission': 0,
+    'evaluate_level_test': 0,
+}
+LLM_CACHE_MAX_ENTRY_BYTES = env.int('LLM_CACHE_MAX_ENTRY_BYTES', default=64 * 1024)
+
+# Single-flight coalescing of identical AI calls (learning/single_flight.py)
+SINGLE_FLIGHT_DEADLINE = env.float('SINGLE_FLIGHT_DEADLINE', default=90.0)
+SINGLE_FLIGHT_RESULT_TTL_MS = env.int('SINGLE_FLIGHT_RESULT_TTL_MS', default=5000)
+
+# Pre-generated task pool (learning/task_pool.py, manage.py refill_task_pool)
+TASK_POOL_LOW_WATER = env.int('TASK_POOL_LOW_WATER', default=5)
+TASK_POOL_HIGH_WATER = env.int('TASK_POOL_HIGH_WATER', default=20)
+TASK_POOL_TTL_SECONDS = env.int('TASK_POOL_TTL_SECONDS', default=24 * 3600)
+TASK_POOL_USERNAME = env('TASK_POOL_USERNAME', default='task-pool')
+
+# Per-user context snapshot (learning/context_snapshot.py)
+CONTEXT_SNAPSHOT_RECENT_PER_TYPE = env.int('CONTEXT_SNAPSHOT_RECENT_PER_TYPE', default=10)
+CONTEXT_SNAPSHOT_CACHE_TTL = env.int('CONTEXT_SNAPSHOT_CACHE_TTL', default=3600)
+
+# Prompt token budgets per LLM call type (learning/prompt_budget.py)
+PROMPT_TOKEN_BUDGETS = {
+    'generate_task': env.int('PROMPT_TOKENS_GENERATE_TASK', default=1200),
+    'grade_submission': env.int('PROMPT_TOKENS_GRADE_SUBMISSION', default=1500),
+    'generate_recommendations': env.int('PROMPT_TOKENS_RECOMMENDATIONS', default=1500),
+    'generate_level_test': env.int('PROMPT_TOKENS_LEVEL_TEST', default=800),
+    'evaluate_level_test': env.int('PROMPT_TOKENS_EVALUATE_LEVEL_TEST', default=2000),
+}
+PROMPT_TOKEN_BUDGET_DEFAULT = env.int('PROMPT_TOKEN_BUDGET_DEFAULT', default=1500)
+PROMPT_SUMMARY_REFRESH_EVERY = env.int('PROMPT_SUMMARY_REFRESH_EVERY', default=20)
+PROMPT_SESSION_LOGS_KEEP = env.int('PROMPT_SESSION_LOGS_KEEP', default=20)
+
+# Per-user response cache for polled endpoints (learning/response_cache.py)
+RESPONSE_CACHE_TTL = env.int('RESPONSE_CACHE_TTL', default=600)
+RESPONSE_CACHE_L1_TTL = env.float('RESPONSE_CACHE_L1_TTL', default=2.0)
+RESPONSE_CACHE_L1_MAX_ENTRIES = env.int('RESPONSE_CACHE_L1_MAX_ENTRIES', default=10000)
+
+# Keyset pagination of exercise history listings (learning/pagination.py)
+HISTORY_PAGE_SIZE = env.int('HISTORY_PAGE_SIZE', default=50)
+HISTORY_MAX_PAGE_SIZE = env.int('HISTORY_MAX_PAGE_SIZE', default=200)
+
+# Compressed AI XML/prompt columns (learning/compression.py, learning/fields.py)
+COMPRESSION_CODEC = env('COMPRESSION_CODEC', default='zstd')  # falls back to zlib without zstandard
+COMPRESSION_LEVEL = env.int('COMPRESSION_LEVEL', default=6)
+COMPRESSION_MIN_BYTES = env.int('COMPRESSION_MIN_BYTES', default=128)
+COMPRESSION_DICTIONARY_ID = env.int('COMPRESSION_DICTIONARY_ID', default=0)  # 0 = no dictionary
+COMPRESSION_DICTIONARY_DIR = env('COMPRESSION_DICTIONARY_DIR', default=str(BASE_DIR / 'compression_dicts'))
+
+# Hot/cold archival of exercise history (learning/archive.py)
+ARCHIVE_AFTER_DAYS = env.int('ARCHIVE_AFTER_DAYS', default=90)
+ARCHIVE_BACKEND = env('ARCHIVE_BACKEND', default='table')  # 'table' or 'segments'
+ARCHIVE_DIR = env('ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+
+# Batch ratings/notes intake (learning/intake.py)
+BULK_INTAKE_MAX_ITEMS = env.int('BULK_INTAKE_MAX_ITEMS', default=200)
+
+# Cross-worker coordination Redis (learning/redis_conn.py): throttling, admission,
+# single-flight, idempotency. Must not evict keys; empty = reuse the cache Redis
+COORDINATION_REDIS_URL = env('COORDINATION_REDIS_URL', default='')
+COORDINATION_REDIS_TIMEOUT = env.float('COORDINATION_REDIS_TIMEOUT', default=0.5)
+
+# Cluster-wide admission control for ai-* endpoints (learning/admission.py)
+ADMISSION_MAX_CONCURRENT = env.int('ADMISSION_MAX_CONCURRENT', default=16)
+ADMISSION_MAX_QUEUE = env.int('ADMISSION_MAX_QUEUE', default=32)
+ADMISSION_MAX_WAIT = env.float('ADMISSION_MAX_WAIT', default=10.0)  # seconds a request may queue
+ADMISSION_LEASE_SECONDS = env.float('ADMISSION_LEASE_SECONDS', default=110.0)  # below the gunicorn timeout
+ADMISSION_WAITER_TTL = env.float('ADMISSION_WAITER_TTL', default=2.0)
+ADMISSION_POLL_INTERVAL = env.float('ADMISSION_POLL_INTERVAL', default=0.05)
+
+# Idempotency-Key replay for AI generate/submit (learning/idempotency.py)
+IDEMPOTENCY_TTL = env.int('IDEMPOTENCY_TTL', default=86400)
+IDEMPOTENCY_LOCK_TTL = env.int('IDEMPOTENCY_LOCK_TTL', default=130)  # pending claim, above the gunicorn timeout
+IDEMPOTENCY_WAIT = env.float('IDEMPOTENCY_WAIT', default=60.0)  # how long a duplicate waits for the original
+IDEMPOTENCY_POLL_INTERVAL = env.float('IDEMPOTENCY_POLL_INTERVAL', default=0.1)
+
 # Application definition
 
 REST_FRAMEWORK = {
@@ -30,7 +136,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_THROTTLE_CLASSES": [
-        'rest_framework.throttling.ScopedRateThrottle',
+        'learning.throttling.TokenBucketThrottle',
     ],
     "DEFAULT_THROTTLE_RATES": {
         'ai-generate': '10/min',
@@ -79,6 +185,8 @@ MIDDLEWARE = [
 
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=['http://localhost:5173'])
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Retry-After', 'Idempotent-Replayed']
 
 ROOT_URLCONF = 'd_learner_back.urls'
 
@@ -100,6 +208,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'd_learner_back.wsgi.application'
+ASGI_APPLICATION = 'd_learner_back.asgi.application'
 
 
 # Database
@@ -229,5 +338,15 @@ CACHES = {
         } if not DEBUG else {},
         'KEY_PREFIX': 'deutschlearner',
         'TIMEOUT': 300,
-    }
+    },
+    # Keys that must not be evicted (idempotency claims); see learning/redis_conn.py
+    'coordination': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache' if DEBUG else 'django_redis.cache.RedisCache',
+        'LOCATION': COORDINATION_REDIS_URL or env('REDIS_URL', default='redis://127.0.0.1:6379/0'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        } if not DEBUG else {},
+        'KEY_PREFIX': 'deutschlearner',
+        'TIMEOUT': 300,
+    },
 }
@@ -0,0 +1,124 @@
+"""
+Computerized adaptive placement test on a calibrated 2PL item bank.
+
+The next item is the one with maximum Fisher information at the current
+ability estimate; ability is estimated locally by vectorized maximum
+likelihood over a theta grid, and the test stops once the standard error
+drops below SE_TARGET (or the item limit is reached). The
+CEFR level is derived from theta, so no LLM call is needed to place a learner.
+"""
+import numpy as np
+
+from .models import AdaptiveTestItem
+
+THETA_GRID = np.linspace(-4.0, 4.0, 161)
+
+# Upper theta bound of each CEFR band; above the last one is C2
+LEVEL_CUTOFFS = [(-1.5, 'A1'), (-0.5, 'A2'), (0.5, 'B1'), (1.5, 'B2'), (2.5, 'C1')]
+
+MIN_ITEMS = 5
+MAX_ITEMS = 25
+SE_TARGET = 0.35
+
+
+def probability(theta, a, b):
+    return 1.0 / (1.0 + np.exp(-a * (theta - b)))
+
+
+def information(theta, a, b):
+    p = probability(theta, a, b)
+    return a * a * p * (1.0 - p)
+
+
+def estimate_ability(a, b, responses):
+    """
+    Grid maximum-likelihood estimate of theta and its standard error.
+    a, b, responses are equal-length arrays for the administered items.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    u = np.asarray(responses, dtype=float)
+    if a.size == 0:
+        return 0.0, float('inf')
+    # items x grid probability matrix
+    p = probability(THETA_GRID[None, :], a[:, None], b[:, None])
+    p = np.clip(p, 1e-9, 1 - 1e-9)
+    loglik = (u[:, None] * np.log(p) + (1 - u[:, None]) * np.log(1 - p)).sum(axis=0)
+    if u.min() == u.max():
+        # All right or all wrong: the MLE is unbounded, use a standard normal prior
+        loglik = loglik - 0.5 * THETA_GRID ** 2
+    theta = float(THETA_GRID[np.argmax(loglik)])
+    test_info = information(theta, a, b).sum()
+    se = float(1.0 / np.sqrt(test_info)) if test_info > 0 else float('inf')
+    return theta, se
+
+
+def select_next(theta, a, b, administered):
+    """Index of the most informative item not yet administered, or None."""
+    info = information(theta, a, b)
+    if administered:
+        info[list(administered)] = -np.inf
+    index = int(np.argmax(info))
+    return None if np.isneginf(info[index]) else index
+
+
+def should_stop(n_items, se, min_items=MIN_ITEMS, max_items=MAX_ITEMS, se_target=SE_TARGET):
+    return n_items >= max_items or (n_items >= min_items and se <= se_target)
+
+
+def level_for(theta):
+    for cutoff, level in LEVEL_CUTOFFS:
+        if theta < cutoff:
+            return level
+    return 'C2'
+
+
+class ItemBank:
+    """Item parameters as NumPy arrays, reloaded when the bank changes."""
+
+    def __init__(self):
+        self.version = None
+        self.ids = np.array([], dtype=np.int64)
+        self.a = np.array([])
+        self.b = np.array([])
+
+    def refresh(self):
+        qs = AdaptiveTestItem.objects.filter(active=True)
+        latest = qs.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        version = (qs.count(), latest)
+        if version != self.version:
+            rows = list(qs.order_by('id').values_list('id', 'discrimination', 'difficulty'))
+            self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+            self.a = np.array([r[1] for r in rows], dtype=float)
+            self.b = np.array([r[2] for r in rows], dtype=float)
+            self.version = version
+        return self
+
+
+bank = ItemBank()
+
+
+def step(responses):
+    """
+    Advance a test given the responses so far ([{'item_id', 'correct'}, ...]).
+    Returns dict with theta, se, finished, level and next_item_id.
+    """
+    bank.refresh()
+    position = {int(item_id): i for i, item_id in enumerate(bank.ids)}
+    scored = [(position[int(r['item_id'])], 1.0 if r['correct'] else 0.0) for r in responses if int(r['item_id']) in position]
+    administered = [i for i, _ in scored]
+    correct = [u for _, u in scored]
+    theta, se = estimate_ability(bank.a[administered], bank.b[administered], correct)
+    if not responses:
+        theta = 0.0
+    finished = should_stop(len(administered), se)
+    next_index = None if finished else select_next(theta, bank.a, bank.b, administered)
+    if next_index is None:
+        finished = True
+    return {
+        'theta': theta,
+        'se': se,
+        'finished': finished,
+        'level': level_for(theta),
+        'next_item_id': None if next_index is None else int(bank.ids[next_index]),
+    }
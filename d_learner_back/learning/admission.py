@@ -0,0 +1,300 @@
+"""
+Admission control for the LLM-backed (ai-*) endpoints.
+
+Throttles cap each user's request rate; this caps how many provider calls the
+whole deployment has outstanding. A request takes one of
+ADMISSION_MAX_CONCURRENT slots, or waits in a queue of at most
+ADMISSION_MAX_QUEUE entries for up to ADMISSION_MAX_WAIT seconds. The queue
+is ordered by priority (grading before generation before recommendations),
+then arrival; when it is full, a newcomer displaces the lowest-priority
+waiter if it outranks it, otherwise it is rejected. Rejections surface as
+503 with Retry-After instead of a worker pinned until the gunicorn timeout.
+
+With Redis (learning/redis_conn.py) the slots and the queue are shared by all
+workers: holders and waiters are sorted sets, every step is one Lua call, and
+slots are leases (ADMISSION_LEASE_SECONDS) so a killed worker cannot leak
+them. Waiters that stop polling drop out of the queue. Without Redis the same
+policy is applied per process.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+from . import redis_conn
+
+logger = logging.getLogger('learning')
+
+KEY_PREFIX = 'deutschlearner:adm'
+HOLDERS = f'{KEY_PREFIX}:holders'
+QUEUE = f'{KEY_PREFIX}:queue'
+SEEN = f'{KEY_PREFIX}:seen'
+STATS = f'{KEY_PREFIX}:stats'
+
+# Lower runs first; scopes not listed get DEFAULT_PRIORITY
+PRIORITIES = {
+    'ai-submit': 0,
+    'ai-generate': 1,
+    'ai-recommend': 2,
+}
+DEFAULT_PRIORITY = 1
+
+ADMITTED, QUEUED, QUEUE_FULL, SHED = 1, 0, -1, -2
+
+# KEYS holders, queue, seen, stats
+# ARGV token, limit, max queue, priority, lease ms, waiter ttl ms, already queued (0/1)
+# -> {ADMITTED, 0} | {QUEUED, rank} | {QUEUE_FULL, depth} | {SHED, 0}
+_ACQUIRE_SCRIPT = """
+local holders, queue, seen, stats = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local token = ARGV[1]
+local limit, max_queue = tonumber(ARGV[2]), tonumber(ARGV[3])
+local priority, lease, waiter_ttl = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', holders, '-inf', now)
+for _, waiter in ipairs(redis.call('ZRANGEBYSCORE', seen, '-inf', now - waiter_ttl)) do
+    redis.call('ZREM', queue, waiter)
+    redis.call('ZREM', seen, waiter)
+end
+
+if not redis.call('ZSCORE', queue, token) then
+    if ARGV[7] == '1' then
+        return {-2, 0}
+    end
+    local score = priority * 1e13 + now
+    if redis.call('ZCARD', queue) >= max_queue then
+        local worst = redis.call('ZRANGE', queue, -1, -1, 'WITHSCORES')
+        if worst[1] == nil or math.floor(tonumber(worst[2]) / 1e13) <= priority then
+            redis.call('HINCRBY', stats, 'rejected_queue_full', 1)
+            return {-1, redis.call('ZCARD', queue)}
+        end
+        redis.call('ZREM', queue, worst[1])
+        redis.call('ZREM', seen, worst[1])
+        redis.call('HINCRBY', stats, 'shed', 1)
+    end
+    redis.call('ZADD', queue, score, token)
+end
+redis.call('ZADD', seen, now, token)
+
+local rank = redis.call('ZRANK', queue, token)
+if rank < limit - redis.call('ZCARD', holders) then
+    redis.call('ZREM', queue, token)
+    redis.call('ZREM', seen, token)
+    redis.call('ZADD', holders, now + lease, token)
+    redis.call('HINCRBY', stats, 'admitted', 1)
+    return {1, 0}
+end
+return {0, rank}
+"""
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'AI service is busy, please retry later.'
+    default_code = 'overloaded'
+
+    def __init__(self, reason, wait):
+        super().__init__()
+        self.reason = reason
+        self.wait = wait
+
+
+class Ticket:
+    __slots__ = ('token', 'started')
+
+    def __init__(self, token):
+        self.token = token
+        self.started = time.monotonic()
+
+
+class _LocalAdmission:
+    """Per-process fallback with the same queueing policy."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.holders = {}
+        self.queue = []
+        self.shed = set()
+        self.stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0, 'shed': 0,
+                      'released': 0, 'hold_ms': 0}
+
+    def acquire(self, token, priority, until):
+        with self.cond:
+            entry = ((priority, time.monotonic()), token)
+            if len(self.queue) >= settings.ADMISSION_MAX_QUEUE:
+                if not self.queue or self.queue[-1][0][0] <= priority:
+                    self.stats['rejected_queue_full'] += 1
+                    return QUEUE_FULL
+                self.shed.add(self.queue.pop()[1])
+                self.stats['shed'] += 1
+                self.cond.notify_all()
+            bisect.insort(self.queue, entry)
+            while True:
+                now = time.monotonic()
+                if token in self.shed:
+                    self.shed.discard(token)
+                    return SHED
+                self.holders = {t: expiry for t, expiry in self.holders.items() if expiry > now}
+                if self.queue.index(entry) < settings.ADMISSION_MAX_CONCURRENT - len(self.holders):
+                    self.queue.remove(entry)
+                    self.holders[token] = now + settings.ADMISSION_LEASE_SECONDS
+                    self.stats['admitted'] += 1
+                    self.cond.notify_all()
+                    return ADMITTED
+                if now >= until:
+                    self.queue.remove(entry)
+                    self.stats['rejected_timeout'] += 1
+                    self.cond.notify_all()
+                    return None
+                self.cond.wait(until - now)
+
+    def release(self, ticket, hold_ms):
+        with self.cond:
+            if self.holders.pop(ticket.token, None) is not None:
+                self.stats['released'] += 1
+                self.stats['hold_ms'] += hold_ms
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            now = time.monotonic()
+            data = dict(self.stats)
+            data['in_flight'] = sum(1 for expiry in self.holders.values() if expiry > now)
+            data['queue_depth'] = len(self.queue)
+        return data
+
+
+_local = _LocalAdmission()
+_scripts = {}
+
+
+def _script(conn):
+    script = _scripts.get(id(conn))
+    if script is None:
+        script = _scripts[id(conn)] = conn.register_script(_ACQUIRE_SCRIPT)
+    return script
+
+
+def _redis_acquire(conn, token, priority, until):
+    script = _script(conn)
+    queued = '0'
+    while True:
+        state, value = script(
+            keys=[HOLDERS, QUEUE, SEEN, STATS],
+            args=[token, settings.ADMISSION_MAX_CONCURRENT, settings.ADMISSION_MAX_QUEUE, priority,
+                  int(settings.ADMISSION_LEASE_SECONDS * 1000), int(settings.ADMISSION_WAITER_TTL * 1000), queued],
+        )
+        state = int(state)
+        if state != QUEUED:
+            return state
+        if time.monotonic() >= until:
+            pipe = conn.pipeline()
+            pipe.zrem(QUEUE, token)
+            pipe.zrem(SEEN, token)
+            pipe.hincrby(STATS, 'rejected_timeout', 1)
+            pipe.execute()
+            return None
+        queued = '1'
+        time.sleep(settings.ADMISSION_POLL_INTERVAL)
+
+
+def retry_after(stats=None):
+    """Seconds until a slot is likely free: mean hold time scaled by the queue ahead."""
+    stats = stats or get_stats()
+    released = int(stats.get('released') or 0)
+    mean_hold = int(stats.get('hold_ms') or 0) / released / 1000 if released else settings.ADMISSION_MAX_WAIT
+    waves = (int(stats.get('queue_depth') or 0) + 1) / settings.ADMISSION_MAX_CONCURRENT
+    return min(60, max(1, math.ceil(mean_hold * waves)))
+
+
+def acquire(scope):
+    """Take a slot for a request of this throttle scope; raises Overloaded when shed."""
+    token = uuid.uuid4().hex
+    priority = PRIORITIES.get(scope, DEFAULT_PRIORITY)
+    until = time.monotonic() + settings.ADMISSION_MAX_WAIT
+    conn = redis_conn.get_connection()
+    result = None
+    if conn is not None:
+        try:
+            result = _redis_acquire(conn, token, priority, until)
+        except Exception as e:
+            # Fail open: an unreachable Redis must not take the AI endpoints down
+            logger.warning(f'Admission control unavailable, admitting {scope} request: {e}')
+            return None
+    else:
+        result = _local.acquire(token, priority, until)
+    if result == ADMITTED:
+        return Ticket(token)
+    reason = {QUEUE_FULL: 'queue_full', SHED: 'shed'}.get(result, 'timeout')
+    wait = retry_after()
+    logger.warning(f'Admission rejected {scope} request ({reason}), retry after {wait}s')
+    raise Overloaded(reason, wait)
+
+
+async def aacquire(scope):
+    return await sync_to_async(acquire, thread_sensitive=False)(scope)
+
+
+def release(ticket):
+    if ticket is None:
+        return
+    hold_ms = int((time.monotonic() - ticket.started) * 1000)
+    conn = redis_conn.get_connection()
+    if conn is None:
+        _local.release(ticket, hold_ms)
+        return
+    try:
+        pipe = conn.pipeline()
+        pipe.zrem(HOLDERS, ticket.token)
+        pipe.hincrby(STATS, 'released', 1)
+        pipe.hincrby(STATS, 'hold_ms', hold_ms)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'Admission slot {ticket.token} not released, lease will expire: {e}')
+
+
+def get_stats():
+    conn = redis_conn.get_connection()
+    if conn is None:
+        data = _local.snapshot()
+    else:
+        pipe = conn.pipeline()
+        pipe.zcount(HOLDERS, int(time.time() * 1000), '+inf')
+        pipe.zcard(QUEUE)
+        pipe.hgetall(STATS)
+        in_flight, depth, counters = pipe.execute()
+        data = {k.decode(): int(v) for k, v in counters.items()}
+        data['in_flight'] = in_flight
+        data['queue_depth'] = depth
+    data['max_concurrent'] = settings.ADMISSION_MAX_CONCURRENT
+    data['max_queue'] = settings.ADMISSION_MAX_QUEUE
+    return data
+
+
+def guards(request, scope):
+    return bool(scope) and scope.startswith('ai-') and request.method not in SAFE_METHODS
+
+
+class AdmissionControlMixin:
+    """APIView side: holds a slot from after throttling until the response is finalized."""
+    _admission_ticket = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scope = getattr(self, 'throttle_scope', None)
+        if guards(request, scope):
+            self._admission_ticket = acquire(scope)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        release(self._admission_ticket)
+        self._admission_ticket = None
+        return super().finalize_response(request, response, *args, **kwargs)
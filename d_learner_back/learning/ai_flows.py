@@ -0,0 +1,179 @@
+"""
+Task generation, recommendation and level test flows shared by the AI views
+and their async variants (async_views.py). Like grading.grade_exercise, each
+flow takes the already validated input, uses the sync ORM and returns
+(payload, status_code); the async views run them in the AI thread pool.
+Exceptions propagate so each view keeps its own 500 handling.
+"""
+import logging
+
+from django.utils import timezone
+from rest_framework import status
+
+from .models import ExerciseHistory, Recommendation, CompletionStatus, LevelTest
+from . import ai_service, xml_parsers, task_pool, single_flight, level_test_bank, context_snapshot
+from .audit import log_audit
+from .monitoring import MonitoringMetrics
+
+logger = logging.getLogger('learning')
+
+
+def generate_task(user, task_type, desired_difficulty=None):
+    """Serve a pooled task when one is ready, otherwise generate it via AI."""
+    level = desired_difficulty or user.profile.language_level
+    pooled = task_pool.pop_task(task_type, level)
+    if pooled is not None:
+        exercise = ExerciseHistory.objects.create(
+            user=user,
+            task_type=task_type,
+            ai_prompt=pooled.ai_prompt,
+            ai_generated_task_xml=pooled.ai_generated_task_xml,
+            parsed_task=pooled.parsed_task,
+            parse_errors=[],
+            completion_status=CompletionStatus.IN_PROGRESS
+        )
+        context_snapshot.record_attempt(exercise, created=True)
+        log_audit('ai_generate_task', user.id, {
+            'task_type': task_type,
+            'exercise_id': exercise.id,
+            'source': 'pool',
+        })
+        return {
+            'task_id': exercise.id,
+            'task_xml': pooled.ai_generated_task_xml,
+            'task_type': task_type,
+            'difficulty': level,
+            'parsed_task': pooled.parsed_task,
+            'parse_errors': [],
+            'message': 'Task generated successfully'
+        }, status.HTTP_201_CREATED
+
+    result = ai_service.generate_task_xml(
+        user=user,
+        task_type=task_type,
+        desired_difficulty=desired_difficulty
+    )
+    if 'error' in result:
+        MonitoringMetrics.record_ai_failure('generate_task', result.get('error', 'Unknown error'), user.id)
+        return {'error': 'AI task generation failed', 'details': result['error'], 'raw_xml': result.get('raw_xml')}, status.HTTP_400_BAD_REQUEST
+
+    # Parse XML strictly
+    parse_errors = []
+    try:
+        parsed_task = xml_parsers.parse_task_xml(task_type, result['xml'])
+    except xml_parsers.ParseError as e:
+        parsed_task = {}
+        parse_errors.append(str(e))
+        MonitoringMetrics.record_xml_parse_error(task_type, result['xml'], str(e))
+    exercise = ExerciseHistory.objects.create(
+        user=user,
+        task_type=task_type,
+        ai_prompt=result.get('prompt_used', ''),
+        ai_generated_task_xml=result['xml'],
+        parsed_task=parsed_task,
+        parse_errors=parse_errors,
+        completion_status=CompletionStatus.IN_PROGRESS
+    )
+    context_snapshot.record_attempt(exercise, created=True)
+    log_audit('ai_generate_task', user.id, {
+        'task_type': task_type,
+        'exercise_id': exercise.id,
+        'parse_errors': parse_errors,
+    })
+    payload = {
+        'task_id': exercise.id,
+        'task_xml': result['xml'],
+        'task_type': task_type,
+        'difficulty': level,
+        'parsed_task': parsed_task,
+        'parse_errors': parse_errors,
+        'message': 'Task generated successfully' if not parse_errors else 'Task generated with parsing issues'
+    }
+    return payload, status.HTTP_201_CREATED if not parse_errors else status.HTTP_207_MULTI_STATUS
+
+
+def generate_recommendations(user, current_skill=None):
+    result = ai_service.generate_recommendations_xml(user=user, current_skill=current_skill)
+    if 'error' in result:
+        return result, status.HTTP_400_BAD_REQUEST
+
+    recommendation = Recommendation.objects.create(
+        user=user,
+        ai_prompt=result.get('prompt_used', ''),
+        generated_recommendations_xml=result['recommendations_xml']
+    )
+    logger.info(f'AI recommendations generated for {user.username}, id={recommendation.id}')
+    log_audit('ai_recommendations', user.id, {
+        'recommendation_id': recommendation.id,
+    })
+    return {
+        'recommendation_id': recommendation.id,
+        'recommendations_xml': result['recommendations_xml'],
+        'message': 'Recommendations generated successfully'
+    }, status.HTTP_201_CREATED
+
+
+def start_level_test(user, test_type):
+    """Start a level test from the bank, or generate one; one incomplete test per user."""
+    existing = LevelTest.objects.filter(user=user, completed=False).first()
+    if existing:
+        return {
+            'error': 'You have an incomplete test',
+            'test_id': existing.id,
+            'message': 'Please complete or cancel the existing test first'
+        }, status.HTTP_400_BAD_REQUEST
+
+    entry = level_test_bank.pick(user, test_type)
+    if entry is not None:
+        result = {'test_xml': entry.test_xml, 'prompt_used': entry.ai_prompt}
+    else:
+        # Bank is empty for this type: identical starts share one LLM call
+        result = single_flight.run(
+            f'level_test:{test_type}',
+            lambda: ai_service.generate_level_test_xml(test_type)
+        )
+
+    level_test = LevelTest.objects.create(
+        user=user,
+        test_type=test_type,
+        ai_generated_test_xml=result['test_xml'],
+        ai_prompt=result.get('prompt_used', ''),
+        bank_entry=entry
+    )
+    logger.info(f'Level test started for {user.username}, id={level_test.id}')
+    return {
+        'test_id': level_test.id,
+        'test_xml': result['test_xml'],
+        'test_type': test_type,
+        'message': 'Level test generated successfully'
+    }, status.HTTP_201_CREATED
+
+
+def submit_level_test(user, level_test, user_answers):
+    """Evaluate the answers and move the user to the determined level."""
+    evaluation = ai_service.evaluate_level_test(level_test.ai_generated_test_xml, user_answers)
+
+    level_test.user_answers = user_answers
+    level_test.ai_evaluation_xml = evaluation['evaluation_xml']
+    level_test.determined_level = evaluation['determined_level']
+    level_test.total_score = evaluation['total_score']
+    level_test.completed = True
+    level_test.completed_at = timezone.now()
+    level_test.save()
+
+    profile = user.profile
+    profile.language_level = evaluation['determined_level']
+    profile.last_level_test_date = timezone.now()
+    # If this is the first test
+    if level_test.test_type == 'initial' and not profile.initial_test_completed:
+        profile.initial_test_completed = True
+    profile.save()
+
+    logger.info(f'Level test {level_test.id} completed by {user.username}, level: {evaluation["determined_level"]}')
+    return {
+        'test_id': level_test.id,
+        'determined_level': evaluation['determined_level'],
+        'total_score': evaluation['total_score'],
+        'evaluation_xml': evaluation['evaluation_xml'],
+        'message': 'Test completed successfully'
+    }, status.HTTP_200_OK
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class LearningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'learning'
+
+    def ready(self):
+        from . import signals, redis_conn
+        signals.connect()
+        redis_conn.check_configuration()
@@ -0,0 +1,187 @@
+"""
+Hot/cold tiering for ExerciseHistory.
+
+Attempts older than ARCHIVE_AFTER_DAYS keep their summary columns in the
+hot table (task type, score, status, timestamp, parsed feedback), while the
+bulky columns move to cold storage and are blanked in place:
+
+- 'table':    ExerciseArchive.payload, a compressed JSON document
+- 'segments': gzip NDJSON segment files under ARCHIVE_DIR; every record is
+              its own gzip member, so one attempt is read back with a seek
+              and a single small decompress (offset/length in ExerciseArchive)
+
+archive_batch() works in short primary-key batches and is resumable: an
+attempt is archived once its ExerciseArchive row commits. hydrate() and
+hydrate_many() put the cold columns back on instances; views that serve
+history include HydrateArchivedMixin, so archived attempts read the same as
+hot ones in lists and detail responses.
+"""
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+
+from .models import ExerciseHistory, ExerciseArchive, CompletionStatus
+from . import sparse_fields
+
+logger = logging.getLogger('learning')
+
+# Column -> value left in the hot row
+ARCHIVED_FIELDS = {
+    'ai_prompt': '',
+    'ai_generated_task_xml': '',
+    'ai_feedback_xml': '',
+    'user_submission_raw': '',
+    'user_submission_parsed': {},
+    'parsed_task': {},
+}
+
+
+def _segment_path():
+    day = timezone.now().strftime('%Y-%m-%d')
+    return os.path.join(day, f'{uuid.uuid4().hex}.ndjson.gz')
+
+
+def write_segment(payloads):
+    """Append payloads to a new segment file; returns [(segment, offset, length)] per payload."""
+    segment = _segment_path()
+    path = os.path.join(settings.ARCHIVE_DIR, segment)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    locations = []
+    with open(path, 'ab') as f:
+        for payload in payloads:
+            member = gzip.compress((json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8'))
+            offset = f.tell()
+            f.write(member)
+            locations.append((segment, offset, len(member)))
+        f.flush()
+        os.fsync(f.fileno())
+    return locations
+
+
+def read_segment(segment, offset, length):
+    with open(os.path.join(settings.ARCHIVE_DIR, segment), 'rb') as f:
+        f.seek(offset)
+        return json.loads(gzip.decompress(f.read(length)))
+
+
+def archive_batch(cutoff, batch_size=500, backend=None):
+    """Archive up to batch_size attempts older than cutoff; returns the number archived."""
+    backend = backend or settings.ARCHIVE_BACKEND
+    with transaction.atomic():
+        rows = list(
+            ExerciseHistory.objects
+            # Lock only history rows: archive__isnull would be a LEFT JOIN, and
+            # PostgreSQL refuses FOR UPDATE on the nullable side of an outer join
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(attempt_timestamp__lt=cutoff)
+            .filter(~Exists(ExerciseArchive.objects.filter(exercise=OuterRef('pk'))))
+            .exclude(completion_status=CompletionStatus.IN_PROGRESS)  # may still be submitted
+            .only('id', 'user_id', *ARCHIVED_FIELDS)
+            .order_by('id')[:batch_size]
+        )
+        if not rows:
+            return 0
+        payloads = [{name: getattr(row, name) for name in ARCHIVED_FIELDS} for row in rows]
+        if backend == 'segments':
+            # Written before commit: if the transaction rolls back, the orphaned
+            # records are never referenced and the rows are archived again later.
+            archives = [
+                ExerciseArchive(exercise_id=row.id, user_id=row.user_id, segment=segment, offset=offset, length=length)
+                for row, (segment, offset, length) in zip(rows, write_segment(payloads))
+            ]
+        else:
+            archives = [
+                ExerciseArchive(exercise_id=row.id, user_id=row.user_id, payload=json.dumps(payload, ensure_ascii=False))
+                for row, payload in zip(rows, payloads)
+            ]
+        ExerciseArchive.objects.bulk_create(archives)
+        for row in rows:
+            for name, blank in ARCHIVED_FIELDS.items():
+                setattr(row, name, blank)
+        ExerciseHistory.objects.bulk_update(rows, list(ARCHIVED_FIELDS))
+    return len(rows)
+
+
+def archive_older_than(days, batch_size=500, backend=None, max_batches=None):
+    """Archive in batches until nothing is left (or max_batches); yields the count per batch."""
+    cutoff = timezone.now() - timedelta(days=days)
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = archive_batch(cutoff, batch_size, backend)
+        if not archived:
+            return
+        batches += 1
+        yield archived
+
+
+def load(archive):
+    if archive.segment:
+        return read_segment(archive.segment, archive.offset, archive.length)
+    return json.loads(archive.payload)
+
+
+def hydrate_many(exercises, fields=None):
+    """
+    Restore the cold columns (all, or only those in fields) of the archived
+    attempts among exercises, with one ExerciseArchive query. Hot rows are left as is.
+    """
+    names = [name for name in ARCHIVED_FIELDS if fields is None or name in fields]
+    by_id = {exercise.pk: exercise for exercise in exercises}
+    if not names or not by_id:
+        return exercises
+    for archive in ExerciseArchive.objects.filter(exercise_id__in=by_id):
+        try:
+            payload = load(archive)
+        except (OSError, ValueError) as e:
+            logger.error(f'Archived payload of exercise {archive.exercise_id} unreadable: {e}')
+            continue
+        for name in names:
+            if name in payload:
+                setattr(by_id[archive.exercise_id], name, payload[name])
+    return exercises
+
+
+def hydrate(exercise):
+    """Restore the cold columns of an archived attempt onto the instance (no-op if hot)."""
+    hydrate_many([exercise])
+    return exercise
+
+
+class HydrateArchivedMixin:
+    """
+    View side, for ExerciseHistory list/detail views: archived attempts are
+    hydrated before serialization, limited to the fields the response
+    includes. Writes are left alone so an update never copies cold data back
+    into the hot row.
+    """
+
+    def _archived_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            return []
+        selected = sparse_fields.resolve(
+            self.request, self.get_serializer_class().Meta.fields, getattr(self, 'default_fields', None)
+        )
+        return [name for name in selected if name in ARCHIVED_FIELDS]
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        fields = self._archived_fields()
+        if page is not None and fields:
+            hydrate_many(page, fields)
+        return page
+
+    def get_object(self):
+        exercise = super().get_object()
+        fields = self._archived_fields()
+        if fields:
+            hydrate_many([exercise], fields)
+        return exercise
@@ -0,0 +1,280 @@
+"""
+Async variants of the AI endpoints, meant to be served through ASGI (uvicorn workers).
+
+The request itself (auth, throttling, validation) runs on the event loop; the
+blocking flow shared with the sync views (ai_flows, grading) is pushed to a
+bounded thread pool so a slow provider response does not stall cheap endpoints
+like /learning/profile/ on the same worker.
+
+The sync AI views (views.py) use the same pool through AIThreadPoolMixin when
+served under ASGI, so at most AI_ASYNC_MAX_THREADS provider calls hold
+threads per worker; every other sync view runs as Django schedules it.
+"""
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .models import ExerciseHistory, TaskType, LevelTest
+from . import grading, ai_flows, admission, idempotency
+from .monitoring import MonitoringMetrics
+from .throttling import TokenBucketThrottle
+
+logger = logging.getLogger('learning')
+
+_ai_executor = ThreadPoolExecutor(
+    max_workers=settings.AI_ASYNC_MAX_THREADS,
+    thread_name_prefix='ai-call',
+)
+
+
+def _run_ai_call(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads keep their own DB connection; drop it if it went stale.
+        close_old_connections()
+
+
+async def call_ai(func, *args, **kwargs):
+    """Run a blocking ai_service function without holding the event loop."""
+    return await sync_to_async(_run_ai_call, thread_sensitive=False, executor=_ai_executor)(func, *args, **kwargs)
+
+
+class AIThreadPoolMixin:
+    """
+    For sync APIViews that call the LLM: under ASGI the whole view runs in the
+    AI thread pool instead of a thread of Django's own; under WSGI it runs
+    unchanged on the request thread.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        @functools.wraps(view)
+        async def ai_view(request, *args, **kwargs):
+            if isinstance(request, ASGIRequest):
+                return await call_ai(view, request, *args, **kwargs)
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        return ai_view
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAIView(View):
+    """Base class: JWT auth, scoped throttling, admission control and Idempotency-Key for async views."""
+    throttle_scope = None
+    idempotent = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=401)
+        if auth is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = auth[0]
+
+        if self.throttle_scope:
+            throttle = TokenBucketThrottle()
+            allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                wait = throttle.wait()
+                response = JsonResponse({'detail': 'Request was throttled.', 'retry_after': wait}, status=429)
+                if wait is not None:
+                    response['Retry-After'] = str(wait)
+                return response
+
+        if request.body:
+            try:
+                request.data = json.loads(request.body)
+            except json.JSONDecodeError:
+                return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        else:
+            request.data = {}
+
+        try:
+            key = idempotency.get_key(request) if self.idempotent and request.method == 'POST' else None
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=400)
+        if key is None:
+            return await self._dispatch_admitted(request, *args, **kwargs)
+        ckey = idempotency.cache_key(request.user.id, request.path, key)
+        fp = idempotency.fingerprint(request.path, request.data)
+        try:
+            record = await idempotency.aclaim(ckey, fp)
+        except idempotency.KeyReused as e:
+            return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        except idempotency.RequestInFlight as e:
+            response = JsonResponse({'detail': str(e.detail), 'retry_after': e.wait}, status=e.status_code)
+            response['Retry-After'] = str(e.wait)
+            return response
+        if record is not None:
+            response = JsonResponse(record['data'], status=record['status'], safe=False)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        try:
+            response = await self._dispatch_admitted(request, *args, **kwargs)
+        except BaseException:
+            await sync_to_async(idempotency.abandon, thread_sensitive=False)(ckey)
+            raise
+        if response.streaming or response.get('Content-Type') != 'application/json':
+            await sync_to_async(idempotency.abandon, thread_sensitive=False)(ckey)
+        else:
+            await sync_to_async(idempotency.complete, thread_sensitive=False)(
+                ckey, fp, response.status_code, json.loads(response.content)
+            )
+        return response
+
+    async def _dispatch_admitted(self, request, *args, **kwargs):
+        if not admission.guards(request, self.throttle_scope):
+            return await super().dispatch(request, *args, **kwargs)
+        try:
+            ticket = await admission.aacquire(self.throttle_scope)
+        except admission.Overloaded as e:
+            response = JsonResponse({'detail': str(e.detail), 'retry_after': e.wait}, status=503)
+            response['Retry-After'] = str(e.wait)
+            return response
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        except BaseException:
+            await sync_to_async(admission.release, thread_sensitive=False)(ticket)
+            raise
+        if response.streaming:
+            # The provider call runs while the body streams: hold the slot until it ends
+            response.streaming_content = _release_after(response.streaming_content, ticket)
+        else:
+            await sync_to_async(admission.release, thread_sensitive=False)(ticket)
+        return response
+
+
+async def _release_after(content, ticket):
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        await sync_to_async(admission.release, thread_sensitive=False)(ticket)
+
+
+class AsyncAIGenerateTaskView(AsyncAIView):
+    """POST /learning/ai/async/generate-task/"""
+    throttle_scope = 'ai-generate'
+    idempotent = True
+
+    async def post(self, request):
+        task_type = request.data.get('task_type')
+        desired_difficulty = request.data.get('desired_difficulty')
+
+        if not task_type:
+            return JsonResponse({'error': 'task_type is required'}, status=400)
+        if task_type not in [t.value for t in TaskType]:
+            return JsonResponse({
+                'error': f'Invalid task_type. Must be one of: {[t.value for t in TaskType]}'
+            }, status=400)
+
+        try:
+            payload, status_code = await call_ai(ai_flows.generate_task, request.user, task_type, desired_difficulty)
+            return JsonResponse(payload, status=status_code)
+        except Exception as e:
+            MonitoringMetrics.record_ai_failure('generate_task', str(e), request.user.id)
+            logger.exception(f'Error generating AI task (async): {e}')
+            return JsonResponse({'error': 'Failed to generate task', 'details': str(e)}, status=500)
+
+
+class AsyncAISubmitTaskView(AsyncAIView):
+    """POST /learning/ai/async/submit-task/"""
+    throttle_scope = 'ai-submit'
+    idempotent = True
+
+    async def post(self, request):
+        task_id = request.data.get('task_id')
+        user_solution = request.data.get('user_solution')
+
+        if not task_id or not user_solution:
+            return JsonResponse({'error': 'task_id and user_solution are required'}, status=400)
+
+        try:
+            exercise = await ExerciseHistory.objects.aget(id=task_id, user=request.user)
+        except ExerciseHistory.DoesNotExist:
+            return JsonResponse({'error': 'Task not found or does not belong to current user'}, status=404)
+
+        if not exercise.ai_generated_task_xml:
+            return JsonResponse({'error': 'Task does not have AI-generated XML'}, status=400)
+
+        try:
+            # grade_exercise does its stats bookkeeping with the sync ORM, so the
+            # whole grading step runs in the AI thread pool
+            payload, status_code = await call_ai(grading.grade_exercise, request.user, exercise, user_solution)
+            return JsonResponse(payload, status=status_code)
+        except Exception as e:
+            MonitoringMetrics.record_ai_failure('grade_submission', str(e), request.user.id)
+            logger.exception(f'Error grading submission (async): {e}')
+            return JsonResponse({'error': 'Failed to grade submission', 'details': str(e)}, status=500)
+
+
+class AsyncAIRecommendationsView(AsyncAIView):
+    """POST /learning/ai/async/recommendations/"""
+    throttle_scope = 'ai-recommend'
+
+    async def post(self, request):
+        try:
+            payload, status_code = await call_ai(
+                ai_flows.generate_recommendations, request.user, request.data.get('current_skill')
+            )
+            return JsonResponse(payload, status=status_code)
+        except Exception as e:
+            logger.exception(f'Error generating recommendations (async): {e}')
+            return JsonResponse({'error': 'Failed to generate recommendations', 'details': str(e)}, status=500)
+
+
+class AsyncLevelTestView(AsyncAIView):
+    """POST /learning/level-test/async/ - start or submit a level test."""
+    throttle_scope = 'level-test'
+
+    async def post(self, request):
+        action = request.data.get('action')
+        if action == 'start':
+            return await self._start(request)
+        if action == 'submit':
+            return await self._submit(request)
+        return JsonResponse({'error': 'Invalid action. Use "start" or "submit"'}, status=400)
+
+    async def _start(self, request):
+        test_type = request.data.get('test_type', 'initial')
+
+        try:
+            payload, status_code = await call_ai(ai_flows.start_level_test, request.user, test_type)
+            return JsonResponse(payload, status=status_code)
+        except Exception as e:
+            logger.exception(f'Error generating level test (async): {e}')
+            return JsonResponse({'error': 'Failed to generate level test', 'details': str(e)}, status=500)
+
+    async def _submit(self, request):
+        test_id = request.data.get('test_id')
+        user_answers = request.data.get('answers')
+        if not test_id or not user_answers:
+            return JsonResponse({'error': 'test_id and answers are required'}, status=400)
+
+        try:
+            level_test = await LevelTest.objects.aget(id=test_id, user=request.user, completed=False)
+        except LevelTest.DoesNotExist:
+            return JsonResponse({'error': 'Test not found or already completed'}, status=404)
+
+        try:
+            payload, status_code = await call_ai(ai_flows.submit_level_test, request.user, level_test, user_answers)
+            return JsonResponse(payload, status=status_code)
+        except Exception as e:
+            logger.exception(f'Error evaluating level test (async): {e}')
+            return JsonResponse({'error': 'Failed to evaluate test', 'details': str(e)}, status=500)
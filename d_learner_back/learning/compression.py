@@ -0,0 +1,108 @@
+"""
+Codec for compressed text columns (see learning/fields.py).
+
+Stored format: MAGIC + codec byte + 4-byte dictionary id + payload.
+Values without MAGIC are legacy raw UTF-8 (rows written before the column
+was compressed, or values below COMPRESSION_MIN_BYTES), so old and new rows
+can coexist while a migration converts a table in batches.
+
+zstd (optional `zstandard` package) can use a dictionary trained on our
+XML (manage.py train_compression_dictionary); dictionaries live in
+COMPRESSION_DICTIONARY_DIR as <id>.zdict and are referenced by id in every
+value, so rotating the dictionary never breaks old rows.
+"""
+import os
+import struct
+import threading
+import zlib
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zlib is always available
+    zstandard = None
+
+MAGIC = b'\x00Z'
+ZLIB = b'z'
+ZSTD = b's'
+_HEADER = struct.Struct('>2scI')
+
+_local = threading.local()
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def _dictionary(dict_id):
+    with _dictionaries_lock:
+        if dict_id not in _dictionaries:
+            path = os.path.join(settings.COMPRESSION_DICTIONARY_DIR, f'{dict_id}.zdict')
+            with open(path, 'rb') as f:
+                _dictionaries[dict_id] = zstandard.ZstdCompressionDict(f.read())
+        return _dictionaries[dict_id]
+
+
+def _zstd(kind, dict_id):
+    # zstandard (de)compressor objects are not thread-safe: one per thread
+    cache = _local.__dict__.setdefault(kind, {})
+    if dict_id not in cache:
+        kwargs = {'dict_data': _dictionary(dict_id)} if dict_id else {}
+        if kind == 'compressor':
+            cache[dict_id] = zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL, **kwargs)
+        else:
+            cache[dict_id] = zstandard.ZstdDecompressor(**kwargs)
+    return cache[dict_id]
+
+
+def codec():
+    """Codec used for new values: zstd when installed and configured, else zlib."""
+    return ZSTD if settings.COMPRESSION_CODEC == 'zstd' and zstandard is not None else ZLIB
+
+
+def is_compressed(data):
+    return bytes(data[:2]) == MAGIC
+
+
+def compress(text, use_codec=None, dict_id=None):
+    raw = text.encode('utf-8')
+    if len(raw) < settings.COMPRESSION_MIN_BYTES:
+        return raw
+    use_codec = use_codec or codec()
+    if use_codec == ZSTD:
+        dict_id = settings.COMPRESSION_DICTIONARY_ID if dict_id is None else dict_id
+        payload = _zstd('compressor', dict_id).compress(raw)
+    else:
+        dict_id = 0
+        payload = zlib.compress(raw, min(settings.COMPRESSION_LEVEL, 9))
+    return _HEADER.pack(MAGIC, use_codec, dict_id) + payload
+
+
+def decompress(data):
+    data = bytes(data)
+    if not is_compressed(data):
+        return data.decode('utf-8')
+    _, used_codec, dict_id = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:]
+    if used_codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError('zstd-compressed value found but the zstandard package is not installed')
+        return _zstd('decompressor', dict_id).decompress(payload).decode('utf-8')
+    return zlib.decompress(payload).decode('utf-8')
+
+
+class Packed:
+    """
+    Compressed value as loaded from the database. Model attributes decompress
+    it on first access; values()/values_list() hand it out as is, use str().
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return decompress(self.data)
+
+    def __repr__(self):
+        return f'<Packed {len(self.data)} bytes>'
+
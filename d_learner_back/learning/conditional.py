@@ -0,0 +1,74 @@
+"""
+ETag / conditional GET for per-user list and detail endpoints.
+
+The validator is the user's response cache generation (bumped on every
+write, see learning/signals.py; code using QuerySet.update()/bulk_create()
+bumps it itself), so a revalidation costs one cache read and no database
+query. Only If-None-Match is evaluated and no Last-Modified is sent: rows
+such as ExerciseHistory are graded in place without their timestamp
+changing, so a date alone could produce a wrong 304.
+
+Views whose body comes from response_cache render through cached_response(),
+so the ETag names the generation the body was built under: an L1 entry that
+outlived a bump elsewhere is served with its own (old) tag, never the new one.
+"""
+import hashlib
+import logging
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from . import response_cache
+
+logger = logging.getLogger('learning')
+
+
+class ConditionalGetMixin:
+    """
+    For generic views and viewsets: answers list/retrieve with 304 when the
+    client's If-None-Match still matches.
+    """
+
+    def get_etag(self, request, generation=None):
+        """ETag for this request (current generation unless given), or None to disable conditional handling."""
+        if generation is None:
+            try:
+                generation = response_cache.generation(request.user.id)
+            except Exception as e:
+                logger.warning(f'Conditional GET disabled, cache unavailable: {e}')
+                return None
+        raw = f'{type(self).__name__}:{request.get_full_path()}:{generation}'
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def cached_response(self, request, endpoint, build, variant=''):
+        """Response for response_cache.cached_entry(), tagged with the generation of its body."""
+        data, generation = response_cache.cached_entry(endpoint, request.user.id, build, variant)
+        response = Response(data)
+        response.cache_generation = generation
+        return response
+
+    def get_conditional(self, request, render):
+        """Return 304 for a matching If-None-Match, else render() with validators attached."""
+        etag = self.get_etag(request)
+        if etag is None:
+            return render()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = render()
+            if hasattr(response, 'cache_generation'):
+                if response.cache_generation is None:
+                    return response
+                etag = self.get_etag(request, response.cache_generation)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            # Per-user data: the browser may keep it but must revalidate every time
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,184 @@
+"""
+Incrementally maintained per-user context snapshot.
+
+Instead of re-querying recent history per task type on every request
+(build_user_context), each write on the task path folds the changed
+ExerciseHistory row into a small JSON document: recent attempts per type,
+rolling scores, error categories and the daily streak. Reads are one cache
+GET, or one primary-key lookup on a miss.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserContextSnapshot, ExerciseHistory, CompletionStatus
+
+logger = logging.getLogger('learning')
+
+SNAPSHOT_VERSION = 1
+EMA_ALPHA = 0.3
+
+
+def _cache_key(user_id):
+    return f'context_snapshot:v{SNAPSHOT_VERSION}:{user_id}'
+
+
+def empty():
+    return {
+        'version': SNAPSHOT_VERSION,
+        'recent_by_type': {},
+        'scores': {},
+        'error_categories': {},
+        'streak': {'current': 0, 'best': 0, 'last_day': None},
+        'totals': {'attempts': 0, 'graded': 0, 'completed': 0},
+    }
+
+
+def _attempt(exercise):
+    return {
+        'id': exercise.id,
+        'status': exercise.completion_status,
+        'score': exercise.result_score,
+        'at': exercise.attempt_timestamp.isoformat() if exercise.attempt_timestamp else None,
+    }
+
+
+def _error_categories(parsed_feedback):
+    """Error categories reported in parsed feedback (LLM or local grader)."""
+    if not isinstance(parsed_feedback, dict):
+        return []
+    categories = []
+    for error in parsed_feedback.get('errors') or []:
+        if isinstance(error, dict):
+            categories.append(error.get('category') or error.get('type') or 'other')
+        elif error:
+            categories.append(str(error))
+    for item in parsed_feedback.get('items') or []:
+        if isinstance(item, dict) and item.get('result') == 'article':
+            categories.append('articles')
+    return categories
+
+
+def apply(data, exercise, created=False):
+    """
+    Fold one ExerciseHistory row into the snapshot dict (in place).
+    created marks a new attempt; otherwise the row is an update (grading)
+    of an attempt that may already have dropped out of the recent list.
+    """
+    limit = settings.CONTEXT_SNAPSHOT_RECENT_PER_TYPE
+    recent = data['recent_by_type'].setdefault(exercise.task_type, [])
+    existing = next((a for a in recent if a['id'] == exercise.id), None)
+    previous = dict(existing) if existing is not None else {}
+    if existing is not None:
+        existing.update(_attempt(exercise))
+    elif created:
+        recent.insert(0, _attempt(exercise))
+        del recent[limit:]
+    if created:
+        data['totals']['attempts'] += 1
+
+    newly_graded = exercise.result_score is not None and previous.get('score') is None
+    if not newly_graded:
+        return data
+
+    scores = data['scores'].setdefault(exercise.task_type, {'count': 0, 'sum': 0.0, 'avg': None, 'ema': None})
+    scores['count'] += 1
+    scores['sum'] += exercise.result_score
+    scores['avg'] = scores['sum'] / scores['count']
+    scores['ema'] = exercise.result_score if scores['ema'] is None else (
+        EMA_ALPHA * exercise.result_score + (1 - EMA_ALPHA) * scores['ema']
+    )
+    data['totals']['graded'] += 1
+    if exercise.completion_status == CompletionStatus.COMPLETED:
+        data['totals']['completed'] += 1
+    for category in _error_categories(exercise.parsed_feedback):
+        data['error_categories'][category] = data['error_categories'].get(category, 0) + 1
+
+    day = timezone.localdate(exercise.attempt_timestamp) if exercise.attempt_timestamp else timezone.localdate()
+    streak = data['streak']
+    last_day = streak['last_day']
+    if last_day != day.isoformat():
+        if last_day == (day - timedelta(days=1)).isoformat():
+            streak['current'] += 1
+        else:
+            streak['current'] = 1
+        streak['last_day'] = day.isoformat()
+        streak['best'] = max(streak['best'], streak['current'])
+    return data
+
+
+def record_attempt(exercise, created=False):
+    """Write-path hook: call after an ExerciseHistory row was created or graded."""
+    try:
+        with transaction.atomic():
+            snapshot, snapshot_created = UserContextSnapshot.objects.select_for_update().get_or_create(
+                user_id=exercise.user_id, defaults={'data': empty()}
+            )
+            if snapshot_created and ExerciseHistory.objects.filter(user_id=exercise.user_id).exclude(pk=exercise.pk).exists():
+                # First write for a user with history: start from a full rebuild
+                snapshot.data = build(exercise.user_id)
+            else:
+                apply(snapshot.data, exercise, created=created)
+            snapshot.save(update_fields=['data', 'updated_at'])
+            # Invalidate rather than write the new document: a slower writer
+            # that committed earlier could otherwise overwrite it with stale data.
+            # The next get() reloads the committed row.
+            key = _cache_key(exercise.user_id)
+            transaction.on_commit(lambda: cache.delete(key))
+    except Exception as e:
+        # The snapshot is derived data; never fail the request because of it
+        logger.warning(f'Context snapshot update failed for user {exercise.user_id}: {e}')
+        cache.delete(_cache_key(exercise.user_id))
+
+
+def build(user_id):
+    """Recompute the snapshot from the full history (oldest first)."""
+    data = empty()
+    rows = (
+        ExerciseHistory.objects.filter(user_id=user_id)
+        .only('id', 'user_id', 'task_type', 'completion_status', 'result_score', 'attempt_timestamp', 'parsed_feedback')
+        .order_by('attempt_timestamp', 'id')
+    )
+    for exercise in rows.iterator(chunk_size=2000):
+        apply(data, exercise, created=True)
+    return data
+
+
+def rebuild(user_id):
+    data = build(user_id)
+    UserContextSnapshot.objects.update_or_create(user_id=user_id, defaults={'data': data})
+    cache.set(_cache_key(user_id), data, timeout=settings.CONTEXT_SNAPSHOT_CACHE_TTL)
+    return data
+
+
+def get(user_id):
+    data = cache.get(_cache_key(user_id))
+    if data is not None:
+        return data
+    data = UserContextSnapshot.objects.filter(user_id=user_id).values_list('data', flat=True).first()
+    if data is None or data.get('version') != SNAPSHOT_VERSION:
+        return rebuild(user_id)
+    cache.set(_cache_key(user_id), data, timeout=settings.CONTEXT_SNAPSHOT_CACHE_TTL)
+    return data
+
+
+def check(user_id):
+    """Differences between the stored snapshot and a fresh rebuild ({} if consistent)."""
+    stored = UserContextSnapshot.objects.filter(user_id=user_id).values_list('data', flat=True).first()
+    fresh = build(user_id)
+    if stored is None:
+        return {'missing': True}
+    diffs = {}
+    for key in fresh:
+        if key == 'scores':
+            for task_type, expected in fresh['scores'].items():
+                got = stored.get('scores', {}).get(task_type, {})
+                if got.get('count') != expected['count'] or abs((got.get('sum') or 0) - expected['sum']) > 1e-6:
+                    diffs.setdefault('scores', {})[task_type] = {'stored': got, 'expected': expected}
+        elif stored.get(key) != fresh[key]:
+            diffs[key] = {'stored': stored.get(key), 'expected': fresh[key]}
+    return diffs
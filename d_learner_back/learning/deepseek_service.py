@@ -1,5 +1,4 @@
-import requests
-from django.conf import settings
+from . import llm_client
 
 def generate_assignment(user_profile):
     payload = {
@@ -8,13 +7,7 @@ def generate_assignment(user_profile):
         'progress': user_profile.progress,
     }
     deepseek_url = 'https://api.deepseek.example.com/generate'
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {settings.DEEPSEEK_API_KEY}'
-    }
     try:
-        response = requests.post(deepseek_url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        return {'error': 'Failed to generate assignment', 'details': str(e)}
\ No newline at end of file
+        return llm_client.post_json(deepseek_url, payload, call_type='generate_assignment')
+    except llm_client.LLMError as e:
+        return {'error': 'Failed to generate assignment', 'details': str(e)}
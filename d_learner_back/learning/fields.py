@@ -0,0 +1,62 @@
+"""
+CompressedTextField: a text attribute stored as compressed bytes (bytea).
+
+Rows load with the value still compressed; it is decompressed on first
+attribute access and cached on the instance, so listing views that never
+touch the XML pay nothing for it. Saving an instance whose value was never
+read writes the original bytes back without recompressing.
+"""
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from . import compression
+
+
+class CompressedAttribute(DeferredAttribute):
+    """Data descriptor (unlike DeferredAttribute), so reads always pass through __get__."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, compression.Packed):
+            value = compression.decompress(value.data)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """TextField for forms and serializers, bytea in the database."""
+    descriptor_class = CompressedAttribute
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value  # str: column not converted to bytea yet
+        return compression.Packed(bytes(value))
+
+    def to_python(self, value):
+        if isinstance(value, compression.Packed):
+            return compression.decompress(value.data)
+        if isinstance(value, (bytes, memoryview)):
+            return compression.decompress(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, compression.Packed):
+            return value.data
+        return compression.compress(str(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None:
+            return None
+        return connection.Database.Binary(value)
@@ -0,0 +1,160 @@
+"""
+Submission grading shared by AISubmitTaskView, its async variant and the
+background grading workers (manage.py run_grading_workers).
+"""
+import json
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+
+from .models import CompletionStatus, UserProfile, ExperienceSummary, GradingJob, GradingJobStatus
+from . import ai_service, xml_parsers, local_grader, context_snapshot, response_cache
+from .audit import log_audit
+from .monitoring import MonitoringMetrics
+
+logger = logging.getLogger('learning')
+
+
+def parse_user_solution(user_solution):
+    """Decode a JSON-string solution; anything else is kept as is."""
+    if isinstance(user_solution, str):
+        try:
+            return json.loads(user_solution)
+        except json.JSONDecodeError:
+            return {'raw': user_solution}
+    return user_solution
+
+
+def completion_status_for(score):
+    return (
+        CompletionStatus.COMPLETED if score >= 0.6
+        else CompletionStatus.FAILED if score < 0.4
+        else CompletionStatus.PARTIAL
+    )
+
+
+# Columns written when a graded submission is stored
+GRADED_FIELDS = [
+    'user_submission_raw', 'user_submission_parsed', 'ai_feedback_xml',
+    'parsed_feedback', 'result_score', 'completion_status', 'parse_errors',
+]
+
+
+def apply_submission_stats(user_id, completed, xp_gain):
+    """
+    Add one graded submission to the profile and experience counters.
+    Single UPDATE per table with F() expressions: no read-modify-write, so
+    concurrent submits cannot lose increments. Returns rows updated per table.
+    """
+    if completed:
+        profile_updated = UserProfile.objects.filter(user_id=user_id).update(progress=F('progress') + 10)
+    else:
+        profile_updated = UserProfile.objects.filter(user_id=user_id).update(errors=F('errors') + 1)
+    experience_updated = ExperienceSummary.objects.filter(user_id=user_id).update(
+        total_xp=F('total_xp') + xp_gain,
+        completed_exercises=F('completed_exercises') + 1,
+    )
+    # QuerySet.update() sends no post_save, invalidate cached responses explicitly
+    response_cache.bump_on_commit(user_id)
+    return profile_updated, experience_updated
+
+
+def grade_exercise(user, exercise, user_solution, job=None):
+    """
+    Grade a submission, store the feedback and update user statistics.
+    Returns (payload, http_status) in the shape AISubmitTaskView responds with.
+
+    With a queued GradingJob, the job is finished in the same transaction as
+    the grade, by a conditional UPDATE. A job that another run already finished
+    (e.g. requeued after its worker stalled past the grade) gets its stored
+    result back, and the XP is not applied twice.
+    """
+    user_solution_parsed = parse_user_solution(user_solution)
+
+    # Objective types are graded against the answer key; the LLM only sees free text
+    result = local_grader.grade(exercise.task_type, exercise.parsed_task, user_solution_parsed)
+    if result is None:
+        result = ai_service.grade_submission(
+            user=user,
+            task_xml=exercise.ai_generated_task_xml,
+            user_solution=str(user_solution)
+        )
+    if 'error' in result:
+        MonitoringMetrics.record_ai_failure(
+            'grade_submission',
+            result.get('error', 'Unknown error'),
+            user.id
+        )
+        # Save error in history
+        exercise.user_submission_raw = str(user_solution)
+        exercise.user_submission_parsed = user_solution_parsed
+        exercise.parse_errors = exercise.parse_errors + [result['error']]
+        exercise.save()
+        return {'error': 'AI feedback generation failed', 'details': result['error'], 'raw_xml': result.get('raw_xml')}, status.HTTP_400_BAD_REQUEST
+    # Strict feedback parsing
+    parsed_feedback = result.get('parsed_feedback', {})
+    if not parsed_feedback:
+        try:
+            parsed_feedback = xml_parsers.parse_feedback_xml(result['feedback_xml'])
+        except xml_parsers.ParseError as e:
+            exercise.parse_errors = exercise.parse_errors + [str(e)]
+            MonitoringMetrics.record_xml_parse_error('feedback', result['feedback_xml'], str(e))
+    # Update history
+    exercise.user_submission_raw = str(user_solution)
+    exercise.user_submission_parsed = user_solution_parsed
+    exercise.ai_feedback_xml = result['feedback_xml']
+    exercise.parsed_feedback = parsed_feedback
+    exercise.result_score = result['score']
+    exercise.completion_status = completion_status_for(result['score'])
+    xp_gain = int(result['score'] * 50)  # Up to 50 XP per task
+
+    payload = {
+        'task_id': exercise.id,
+        'score': result['score'],
+        'status': exercise.completion_status,
+        'feedback_xml': result['feedback_xml'],
+        'parsed_feedback': parsed_feedback,
+        'parse_errors': exercise.parse_errors,
+        'xp_gained': xp_gain,
+        'message': 'Submission graded successfully' if parsed_feedback else 'Submission graded with parsing issues'
+    }
+
+    # History row, user statistics and the job's outcome commit together
+    with transaction.atomic():
+        # First statement: the conditional UPDATE row-locks the job, so a
+        # concurrent run of it waits here and then finds it finished
+        if job is not None and not finish_job(job, payload, status.HTTP_200_OK):
+            logger.info(f'Grading job {job.pk} was already finished, not applying it again')
+            stored = GradingJob.objects.values('result', 'http_status').get(pk=job.pk)
+            return stored['result'], stored['http_status']
+        exercise.save(update_fields=GRADED_FIELDS)
+        _, experience_updated = apply_submission_stats(
+            user.id, exercise.completion_status == CompletionStatus.COMPLETED, xp_gain
+        )
+    if not experience_updated:
+        logger.warning(f'Could not update experience: no ExperienceSummary for user {user.id}')
+    context_snapshot.record_attempt(exercise)
+
+    logger.info(f'Task {exercise.id} submitted by {user.username}, score: {result["score"]:.2f}')
+
+    log_audit('ai_submit_task', user.id, {
+        'task_id': exercise.id,
+        'score': result['score'],
+        'status': exercise.completion_status,
+        'parse_errors': exercise.parse_errors,
+    })
+    return payload, status.HTTP_200_OK
+
+
+def finish_job(job, payload, http_status):
+    """Store a job's outcome; only a job that is still running is changed."""
+    job.result = payload
+    job.http_status = http_status
+    job.status = GradingJobStatus.DONE if http_status == status.HTTP_200_OK else GradingJobStatus.FAILED
+    job.finished_at = timezone.now()
+    return GradingJob.objects.filter(pk=job.pk, status=GradingJobStatus.RUNNING).update(
+        result=job.result, http_status=job.http_status, status=job.status, finished_at=job.finished_at,
+    )
@@ -0,0 +1,93 @@
+"""
+DB-backed grading queue. Jobs are claimed in batches with SKIP LOCKED so
+several worker processes can drain the queue, and each batch is graded in
+parallel threads so provider calls overlap. At most one job per exercise is
+queued or running at a time (grading_job_active_exercise).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GradingJob, GradingJobStatus
+from . import grading
+
+logger = logging.getLogger('learning')
+
+
+ACTIVE = (GradingJobStatus.QUEUED, GradingJobStatus.RUNNING)
+
+
+def enqueue(user, exercise, user_solution):
+    """Queue a submission; returns (job, created), the active job if the exercise already has one."""
+    try:
+        with transaction.atomic():
+            return GradingJob.objects.create(user=user, exercise=exercise, user_solution=user_solution), True
+    except IntegrityError:
+        job = GradingJob.objects.filter(exercise=exercise, status__in=ACTIVE).first()
+        if job is not None:
+            return job, False
+    # The active job finished in between
+    return GradingJob.objects.create(user=user, exercise=exercise, user_solution=user_solution), True
+
+
+def claim_batch(batch_size):
+    with transaction.atomic():
+        jobs = list(
+            GradingJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=GradingJobStatus.QUEUED)
+            .order_by('created_at')[:batch_size]
+        )
+        if jobs:
+            GradingJob.objects.filter(id__in=[j.id for j in jobs]).update(
+                status=GradingJobStatus.RUNNING,
+                started_at=timezone.now(),
+                attempts=F('attempts') + 1,
+            )
+    return [j.id for j in jobs]
+
+
+def process_job(job_id):
+    try:
+        job = GradingJob.objects.select_related('user', 'exercise').get(pk=job_id)
+        try:
+            # A graded job is finished in the grade's own transaction
+            payload, http_status = grading.grade_exercise(job.user, job.exercise, job.user_solution, job=job)
+        except Exception as e:
+            logger.exception(f'Grading job {job_id} failed: {e}')
+            payload, http_status = {'error': 'Failed to grade submission', 'details': str(e)}, 500
+        grading.finish_job(job, payload, http_status)
+        return GradingJob.objects.values_list('status', flat=True).get(pk=job_id)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale(max_running_seconds, max_attempts):
+    """
+    Put back jobs whose worker died mid-flight; give up after max_attempts.
+    A job whose grade committed is already DONE, so it is never graded twice.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_running_seconds)
+    stale = GradingJob.objects.filter(status=GradingJobStatus.RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=GradingJobStatus.FAILED,
+        finished_at=timezone.now(),
+        result={'error': 'Grading timed out'},
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=GradingJobStatus.QUEUED)
+    return requeued, failed
+
+
+def drain_once(executor, batch_size):
+    job_ids = claim_batch(batch_size)
+    if job_ids:
+        list(executor.map(process_job, job_ids))
+    return len(job_ids)
+
+
+def make_executor(concurrency):
+    return ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='grading')
@@ -0,0 +1,162 @@
+"""
+Idempotency-Key support for the AI generate/submit endpoints.
+
+The first request with a given key claims it in the cache (cache.add, atomic
+on Redis and LocMem alike) together with a fingerprint of the request. A
+duplicate that arrives while the original is still running waits up to
+IDEMPOTENCY_WAIT seconds for its result; a duplicate that arrives later gets
+the stored response replayed (Idempotent-Replayed: true) without calling the
+provider or writing anything. Reusing a key for a different request is a 422.
+
+Only 2xx responses are kept for IDEMPOTENCY_TTL. On any other status or an
+exception the claim is dropped so the client's retry runs again: grading
+reports provider failures as 400, and a retry must not replay those. A pending claim
+expires after IDEMPOTENCY_LOCK_TTL in case its worker died. Claims live in
+the 'coordination' cache, which is never evicted under memory pressure.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+logger = logging.getLogger('learning')
+
+KEY_PREFIX = 'deutschlearner:idem'
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+PENDING, DONE = 'pending', 'done'
+
+
+def _cache():
+    return caches['coordination']
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class RequestInFlight(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_flight'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class Replay(Exception):
+    """Raised from APIView.initial to short-circuit with the stored response."""
+
+    def __init__(self, record):
+        super().__init__()
+        self.record = record
+
+
+def get_key(request):
+    key = request.META.get(HEADER)
+    if key is not None and not (0 < len(key) <= MAX_KEY_LENGTH):
+        raise ValidationError({'Idempotency-Key': f'must be 1-{MAX_KEY_LENGTH} characters'})
+    return key
+
+
+def fingerprint(path, data):
+    body = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f'{path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def cache_key(user_id, path, key):
+    digest = hashlib.sha256(f'{path}\n{key}'.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{user_id}:{digest}'
+
+
+def claim(ckey, fp, wait=None):
+    """
+    Claim ckey for this request. Returns None when the caller owns it (and must
+    call complete() or abandon()), or the stored record to replay.
+    """
+    wait = settings.IDEMPOTENCY_WAIT if wait is None else wait
+    until = time.monotonic() + wait
+    while True:
+        if _cache().add(ckey, {'state': PENDING, 'fingerprint': fp}, settings.IDEMPOTENCY_LOCK_TTL):
+            return None
+        record = _cache().get(ckey)
+        if record is None:
+            continue  # the owner abandoned it or it expired: claim again
+        if record['fingerprint'] != fp:
+            raise KeyReused()
+        if record['state'] == DONE:
+            return record
+        if time.monotonic() >= until:
+            raise RequestInFlight(max(1, round(settings.IDEMPOTENCY_WAIT)))
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+
+async def aclaim(ckey, fp, wait=None):
+    return await sync_to_async(claim, thread_sensitive=False)(ckey, fp, wait)
+
+
+def complete(ckey, fp, status_code, data):
+    if not 200 <= status_code < 300:
+        abandon(ckey)
+        return
+    _cache().set(ckey, {'state': DONE, 'fingerprint': fp, 'status': status_code, 'data': data}, settings.IDEMPOTENCY_TTL)
+
+
+def abandon(ckey):
+    _cache().delete(ckey)
+
+
+class IdempotencyMixin:
+    """
+    APIView side. Runs after authentication and throttling, before admission
+    control when listed after AdmissionControlMixin, so waiting or replayed
+    duplicates never hold an LLM slot.
+    """
+    _idempotency = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = get_key(request)
+        if key is None or request.method != 'POST':
+            return
+        ckey = cache_key(request.user.id, request.path, key)
+        fp = fingerprint(request.path, request.data)
+        record = claim(ckey, fp)
+        if record is not None:
+            logger.info(f'Replaying idempotent response for user {request.user.id} on {request.path}')
+            raise Replay(record)
+        self._idempotency = (ckey, fp)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Replay):
+            response = Response(exc.record['data'], status=exc.record['status'])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Uncaught errors skip finalize_response: let the retry run again
+            if self._idempotency is not None:
+                abandon(self._idempotency[0])
+                self._idempotency = None
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._idempotency is not None:
+            ckey, fp = self._idempotency
+            self._idempotency = None
+            if isinstance(response, Response):
+                complete(ckey, fp, response.status_code, response.data)
+            else:
+                abandon(ckey)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,139 @@
+"""
+Batch intake of ratings and task notes (RatingsBulkIntakeView,
+TaskFeedbackBulkView; TaskFeedbackView uses append_notes too).
+
+A batch costs a fixed number of queries regardless of its size: content
+types come from ContentType's per-process cache, ownership is checked with
+one IN query per rated model, ratings are inserted with bulk_create and
+notes are appended with a two-column SELECT ... FOR UPDATE plus one
+UPDATE of user_feedback_notes, so the XML columns are never read or rewritten.
+"""
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+
+from .models import Rating, ExerciseHistory
+from . import rating_stats, response_cache
+
+
+class IntakeError(Exception):
+    """Invalid batch; errors maps item index -> message."""
+
+    def __init__(self, errors, status_code=400):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+def _validate_rating(item):
+    if not isinstance(item, dict):
+        return None, 'item must be an object'
+    if item.get('rating_type') is None or item.get('value') is None:
+        return None, 'rating_type and value are required'
+    try:
+        value = int(item['value'])
+    except (TypeError, ValueError):
+        return None, 'value must be integer'
+    if not (1 <= value <= 5):
+        return None, 'value must be between 1 and 5'
+    return value, None
+
+
+def _owned_ids(content_type, ids, user):
+    """Subset of ids that exist and (for models with a user field) belong to user."""
+    model = content_type.model_class()
+    qs = model._default_manager.filter(pk__in=ids)
+    try:
+        model._meta.get_field('user')
+        qs = qs.filter(user=user)
+    except FieldDoesNotExist:
+        pass
+    return {str(pk) for pk in qs.values_list('pk', flat=True)}
+
+
+def create_ratings(user, items):
+    """Validate and store a batch of ratings atomically; returns the created Rating rows."""
+    errors, parsed = {}, []
+    by_model = {}
+    for index, item in enumerate(items):
+        value, error = _validate_rating(item)
+        if error:
+            errors[index] = error
+            continue
+        model, object_id = item.get('model'), item.get('object_id')
+        content_type = None
+        if model and object_id:
+            try:
+                content_type = ContentType.objects.get_by_natural_key('learning', str(model).lower())
+            except ContentType.DoesNotExist:
+                errors[index] = 'Unsupported model'
+                continue
+            by_model.setdefault(content_type, set()).add(str(object_id))
+        parsed.append((index, item, value, content_type))
+    if errors:
+        raise IntakeError(errors)
+
+    owned = {ct: _owned_ids(ct, ids, user) for ct, ids in by_model.items()}
+    forbidden = {
+        index: 'Object not found or does not belong to current user'
+        for index, item, _, ct in parsed
+        if ct is not None and str(item['object_id']) not in owned[ct]
+    }
+    if forbidden:
+        raise IntakeError(forbidden, status_code=403)
+
+    user_type = ContentType.objects.get_for_model(User)
+    ratings = [
+        Rating(
+            user=user,
+            content_type=ct or user_type,
+            object_id=item.get('object_id') if ct else user.id,
+            rating_type=item['rating_type'],
+            value=value,
+        )
+        for _, item, value, ct in parsed
+    ]
+    with transaction.atomic():
+        Rating.objects.bulk_create(ratings)
+        rating_stats.record_many((user.id, r.rating_type, r.value, 1) for r in ratings)
+        response_cache.bump_on_commit(user.id)
+    return ratings
+
+
+def append_notes(user, items):
+    """
+    Append notes ([{'task_id', 'note'}, ...]) to the user's exercises.
+    Returns {task_id: notes_count}.
+    """
+    errors, notes = {}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('task_id') or not item.get('note'):
+            errors[index] = 'task_id and note are required'
+            continue
+        try:
+            notes.setdefault(int(item['task_id']), []).append(str(item['note']))
+        except (TypeError, ValueError):
+            errors[index] = 'task_id must be integer'
+    if errors:
+        raise IntakeError(errors)
+
+    with transaction.atomic():
+        exercises = list(
+            ExerciseHistory.objects
+            .select_for_update()
+            .filter(user=user, pk__in=notes)
+            .only('id', 'user_feedback_notes')
+            .order_by('id')
+        )
+        missing = set(notes) - {e.id for e in exercises}
+        if missing:
+            raise IntakeError({
+                index: 'Task not found'
+                for index, item in enumerate(items) if int(item['task_id']) in missing
+            }, status_code=404)
+        for exercise in exercises:
+            exercise.user_feedback_notes = (exercise.user_feedback_notes or []) + notes[exercise.id]
+        ExerciseHistory.objects.bulk_update(exercises, ['user_feedback_notes'])
+        response_cache.bump_on_commit(user.id)
+    return {e.id: len(e.user_feedback_notes) for e in exercises}
@@ -0,0 +1,81 @@
+"""
+Bank of pre-generated level tests per test_type.
+
+manage.py build_level_test_bank fills it; LevelTestView assigns tests from it.
+Every test served from the bank records its entry (LevelTest.bank_entry), and
+pick() excludes the entries already served to the user, so a learner does not
+see a repeat until they have been through the whole bank; after that the entry
+they saw longest ago comes back first.
+"""
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+
+from django.db.models import Max, Q
+
+from .models import LevelTestBankEntry, LevelTest
+from . import ai_service, llm_cache
+
+logger = logging.getLogger('learning')
+
+QUESTION_TAGS = {'question', 'item'}
+
+
+class InvalidTestXML(ValueError):
+    pass
+
+
+def parse_test(test_xml):
+    """Validate the XML and extract the question index stored with the entry."""
+    try:
+        root = ET.fromstring(test_xml.strip())
+    except ET.ParseError as e:
+        raise InvalidTestXML(f'Malformed level test XML: {e}')
+    questions = [
+        {'id': q.get('id', str(i)), 'level': q.get('level')}
+        for i, q in enumerate(el for el in root.iter() if el.tag in QUESTION_TAGS)
+    ]
+    if not questions:
+        raise InvalidTestXML('Level test XML contains no questions')
+    return {'question_count': len(questions), 'questions': questions}
+
+
+def add_generated(test_type):
+    """Generate one test and store it if valid and not a duplicate. Returns the entry or None."""
+    # A cached response would only ever be a duplicate of the previous entry
+    with llm_cache.bypass():
+        result = ai_service.generate_level_test_xml(test_type)
+    test_xml = result.get('test_xml')
+    if not test_xml:
+        logger.warning(f'Level test bank: generation failed for {test_type}: {result.get("error")}')
+        return None
+    try:
+        parsed = parse_test(test_xml)
+    except InvalidTestXML as e:
+        logger.warning(f'Level test bank: discarded {test_type} test: {e}')
+        return None
+    content_hash = hashlib.sha256(test_xml.strip().encode('utf-8')).hexdigest()
+    entry, created = LevelTestBankEntry.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={
+            'test_type': test_type,
+            'test_xml': test_xml,
+            'ai_prompt': result.get('prompt_used', ''),
+            'parsed_test': parsed,
+        }
+    )
+    return entry if created else None
+
+
+def pick(user, test_type):
+    """Next bank entry for this user, or None if the bank has nothing for test_type."""
+    entries = LevelTestBankEntry.objects.filter(test_type=test_type).only('id', 'test_xml', 'ai_prompt')
+    served = LevelTest.objects.filter(user=user, bank_entry__isnull=False).values('bank_entry_id')
+    entry = entries.exclude(id__in=served).order_by('id').first()
+    if entry is not None:
+        return entry
+    # Everything was served already: repeat the one seen longest ago
+    return (
+        entries.annotate(last_served=Max('level_tests__started_at', filter=Q(level_tests__user=user)))
+        .order_by('last_served', 'id').first()
+    )
@@ -0,0 +1,111 @@
+"""
+Content-addressed cache for LLM responses.
+
+Keys are a hash of the normalized prompt, model and sampling parameters, so
+learners at the same level asking for the same task type share one provider
+call. Entries live in the default (Redis) cache with a per-call-type TTL from
+settings.LLM_CACHE_TTLS; call types without a TTL (personalized grading) are
+never cached. Overall size is bounded by Redis maxmemory + volatile-lru and
+by LLM_CACHE_MAX_ENTRY_BYTES per entry.
+
+Code that needs a fresh generation on every call (building the level test
+bank, refilling the task pool) runs inside bypass(): a cached response would
+just be a duplicate of an entry it already has.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('learning')
+monitoring_logger = logging.getLogger('monitoring')
+
+KEY_VERSION = 'v1'
+
+_bypass = contextvars.ContextVar('llm_cache_bypass', default=False)
+
+
+def ttl_for(call_type):
+    return settings.LLM_CACHE_TTLS.get(call_type, 0)
+
+
+def enabled(call_type):
+    return bool(ttl_for(call_type)) and not _bypass.get()
+
+
+@contextmanager
+def bypass():
+    """LLM calls made inside neither read nor write the cache."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _normalize_messages(messages):
+    # Whitespace-only differences in templated prompts should not split the cache
+    return [
+        {'role': m.get('role'), 'content': ' '.join(str(m.get('content', '')).split())}
+        for m in messages
+    ]
+
+
+def make_key(call_type, payload):
+    normalized = dict(payload)
+    normalized['messages'] = _normalize_messages(payload.get('messages', []))
+    digest = hashlib.sha256(
+        json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+    return f'llm:{KEY_VERSION}:{call_type}:{digest}'
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def lookup(key, call_type):
+    entry = cache.get(key)
+    if entry is None:
+        _incr(f'llm_cache:misses:{call_type}')
+        return None
+    saved_ms = int(entry.get('latency_ms', 0))
+    _incr(f'llm_cache:hits:{call_type}')
+    _incr(f'llm_cache:saved_ms:{call_type}', saved_ms)
+    monitoring_logger.info(json.dumps({
+        'event': 'llm_cache_hit',
+        'call_type': call_type,
+        'saved_latency_ms': saved_ms,
+    }))
+    return entry['content']
+
+
+def store(key, call_type, content, latency_seconds):
+    ttl = ttl_for(call_type)
+    if not ttl or len(content.encode('utf-8')) > settings.LLM_CACHE_MAX_ENTRY_BYTES:
+        return
+    cache.set(key, {'content': content, 'latency_ms': int(latency_seconds * 1000)}, timeout=ttl)
+
+
+def get_stats():
+    result = {}
+    for call_type in settings.LLM_CACHE_TTLS:
+        hits = cache.get(f'llm_cache:hits:{call_type}', 0)
+        misses = cache.get(f'llm_cache:misses:{call_type}', 0)
+        lookups = hits + misses
+        result[call_type] = {
+            'ttl': ttl_for(call_type),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': (hits / lookups) if lookups else None,
+            'saved_latency_ms': cache.get(f'llm_cache:saved_ms:{call_type}', 0),
+        }
+    return result
@@ -0,0 +1,370 @@
+"""
+Shared HTTP client for LLM provider calls.
+
+One pooled keep-alive client per process (sync and async), with connect/read
+timeouts, bounded retries with jittered backoff and a circuit breaker that
+fails fast while the provider is down. All AI entry points should go through
+chat_completion()/achat_completion() instead of calling requests.post directly.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import llm_cache, llm_router, prompt_budget
+
+logger = logging.getLogger('learning')
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Provider call failed after retries."""
+
+
+class LLMUnavailable(LLMError):
+    """Circuit breaker is open, the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures, half-open after reset_timeout."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'half_open':
+                # Let one probe through; re-arm the timer for everyone else.
+                self._opened_at = time.monotonic()
+                return True
+            return state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f'LLM circuit breaker opened after {self._failures} failures')
+                self._opened_at = time.monotonic()
+
+
+class _Stats:
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.window = window
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def incr(self, name, delta=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def record(self, call_type, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self.latencies.setdefault(call_type, deque(maxlen=self.window)).append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            per_type = {}
+            for call_type, values in self.latencies.items():
+                ordered = sorted(values)
+                per_type[call_type] = {
+                    'count': len(ordered),
+                    'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                    'last_ms': round(values[-1] * 1000, 1),
+                }
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'retries': self.retries,
+                'rejected_by_breaker': self.rejected,
+                'in_flight': self.in_flight,
+                'latency': per_type,
+            }
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+stats = _Stats()
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs(base_url=None, api_key=None):
+    api_key = settings.DEEPSEEK_API_KEY if api_key is None else api_key
+    headers = {'Content-Type': 'application/json'}
+    if api_key:
+        headers['Authorization'] = f'Bearer {api_key}'
+    return {
+        'base_url': base_url or settings.DEEPSEEK_API_URL,
+        'headers': headers,
+        'timeout': httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        'limits': httpx.Limits(
+            max_connections=settings.LLM_POOL_MAXSIZE,
+            max_keepalive_connections=settings.LLM_POOL_MAXSIZE,
+            keepalive_expiry=60,
+        ),
+    }
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**_client_kwargs())
+    return _client
+
+
+def get_async_client():
+    # AsyncClient is bound to the running loop; one per worker loop is enough.
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(**_client_kwargs())
+    return _async_client
+
+
+def _backoff(attempt):
+    base = settings.LLM_RETRY_BACKOFF * (2 ** attempt)
+    return random.uniform(0, base)  # full jitter
+
+
+def _is_retryable(exc):
+    """
+    Transport errors, timeouts, 429 and 5xx. Only these count against the
+    circuit breaker: a 4xx or an unparseable body means the provider answered.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+def _chat_payload(messages, model, temperature, max_tokens, extra):
+    payload = {
+        'model': model or settings.DEEPSEEK_MODEL,
+        'messages': messages,
+        'temperature': temperature,
+    }
+    if max_tokens:
+        payload['max_tokens'] = max_tokens
+    payload.update(extra)
+    return payload
+
+
+def _extract_content(data):
+    try:
+        return data['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError) as e:
+        raise LLMError(f'Unexpected provider response: {e}')
+
+
+def post_json(url, payload, call_type='generic'):
+    """POST a JSON payload with pooling, retries and the circuit breaker; returns decoded JSON."""
+    if not breaker.allow():
+        stats.incr('rejected')
+        raise LLMUnavailable('LLM provider circuit is open')
+    client = get_client()
+    last_exc = None
+    stats.incr('in_flight')
+    try:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                response = client.post(url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                stats.record(call_type, time.perf_counter() - started, ok=False)
+                last_exc = e
+                if attempt < settings.LLM_MAX_RETRIES and _is_retryable(e):
+                    stats.incr('retries')
+                    time.sleep(_backoff(attempt))
+                    continue
+                break
+            stats.record(call_type, time.perf_counter() - started, ok=True)
+            breaker.record_success()
+            return data
+    finally:
+        stats.incr('in_flight', -1)
+    if _is_retryable(last_exc):
+        breaker.record_failure()
+    raise LLMError(f'{call_type} failed: {last_exc}') from last_exc
+
+
+async def apost_json(url, payload, call_type='generic'):
+    """Async counterpart of post_json() for the ASGI views."""
+    if not breaker.allow():
+        stats.incr('rejected')
+        raise LLMUnavailable('LLM provider circuit is open')
+    client = get_async_client()
+    last_exc = None
+    stats.incr('in_flight')
+    try:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                stats.record(call_type, time.perf_counter() - started, ok=False)
+                last_exc = e
+                if attempt < settings.LLM_MAX_RETRIES and _is_retryable(e):
+                    stats.incr('retries')
+                    await asyncio.sleep(_backoff(attempt))
+                    continue
+                break
+            stats.record(call_type, time.perf_counter() - started, ok=True)
+            breaker.record_success()
+            return data
+    finally:
+        stats.incr('in_flight', -1)
+    if _is_retryable(last_exc):
+        breaker.record_failure()
+    raise LLMError(f'{call_type} failed: {last_exc}') from last_exc
+
+
+def chat_completion(messages, call_type='generic', model=None, temperature=0.7, max_tokens=None, use_cache=True,
+                    validate=None, **extra):
+    """
+    Send a chat completion request and return the message content.
+
+    Responses are served from llm_cache when the call type has a TTL; pass
+    use_cache=False (or run inside llm_cache.bypass()) for prompts that must
+    always hit the provider. The request is routed (and, for hedged call
+    types, hedged) by llm_router; validate decides which hedged response is
+    acceptable.
+    """
+    payload = _chat_payload(messages, model, temperature, max_tokens, extra)
+    prompt_budget.record(call_type, messages)
+    cache_key = llm_cache.make_key(call_type, payload) if use_cache and llm_cache.enabled(call_type) else None
+    if cache_key:
+        cached = llm_cache.lookup(cache_key, call_type)
+        if cached is not None:
+            return cached
+    started = time.perf_counter()
+    content = llm_router.complete(payload, call_type, validate)
+    if cache_key:
+        llm_cache.store(cache_key, call_type, content, time.perf_counter() - started)
+    return content
+
+
+async def achat_completion(messages, call_type='generic', model=None, temperature=0.7, max_tokens=None, use_cache=True,
+                           validate=None, **extra):
+    payload = _chat_payload(messages, model, temperature, max_tokens, extra)
+    prompt_budget.record(call_type, messages)
+    cache_key = llm_cache.make_key(call_type, payload) if use_cache and llm_cache.enabled(call_type) else None
+    if cache_key:
+        cached = await sync_to_async(llm_cache.lookup)(cache_key, call_type)
+        if cached is not None:
+            return cached
+    started = time.perf_counter()
+    content = await llm_router.acomplete(payload, call_type, validate)
+    if cache_key:
+        await sync_to_async(llm_cache.store)(cache_key, call_type, content, time.perf_counter() - started)
+    return content
+
+
+async def astream_chat_completion(messages, call_type='generic', model=None, temperature=0.7, max_tokens=None, **extra):
+    """
+    Stream a chat completion, yielding content deltas as they arrive.
+
+    Not retried and not cached: tokens may already have been forwarded to the
+    client when a failure happens.
+    """
+    if not breaker.allow():
+        stats.incr('rejected')
+        raise LLMUnavailable('LLM provider circuit is open')
+    payload = _chat_payload(messages, model, temperature, max_tokens, extra)
+    payload['stream'] = True
+    prompt_budget.record(call_type, messages)
+    client = get_async_client()
+    started = time.perf_counter()
+    stats.incr('in_flight')
+    try:
+        async with client.stream('POST', '/chat/completions', json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                except (ValueError, KeyError, IndexError) as e:
+                    raise LLMError(f'Unexpected stream chunk: {e}')
+                if delta:
+                    yield delta
+    except httpx.HTTPError as e:
+        stats.record(call_type, time.perf_counter() - started, ok=False)
+        if _is_retryable(e):
+            breaker.record_failure()  # a rejected request says nothing about provider health
+        raise LLMError(f'{call_type} stream failed: {e}') from e
+    finally:
+        stats.incr('in_flight', -1)
+    stats.record(call_type, time.perf_counter() - started, ok=True)
+    breaker.record_success()
+
+
+def pool_stats():
+    """
+    Connection pool occupancy of the router backends' AsyncClients, which carry
+    every LLM call (best effort; max_connections applies per client).
+    """
+    backends = {b.name: b.pool_stats() for b in llm_router.backends()}
+    return {
+        'max_connections': settings.LLM_POOL_MAXSIZE,
+        'open_connections': sum(b['open_connections'] for b in backends.values()),
+        'idle_connections': sum(b['idle_connections'] for b in backends.values()),
+        'backends': backends,
+    }
+
+
+def get_stats():
+    data = stats.snapshot()
+    data['circuit'] = breaker.state
+    data['pool'] = pool_stats()
+    data['cache'] = llm_cache.get_stats()
+    data['backends'] = llm_router.get_stats()
+    data['prompts'] = prompt_budget.get_stats()
+    return data
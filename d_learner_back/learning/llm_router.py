@@ -0,0 +1,299 @@
+"""
+Routing and hedging of chat completions across several LLM backends.
+
+LLM_BACKENDS lists the backends in order of preference (by default only the
+DEEPSEEK_* provider). Each has its own connection pool, circuit breaker and a
+rolling window of latencies per call type and of outcomes. A call goes to the
+first healthy backend (breaker not open, recent error rate at most
+LLM_BACKEND_MAX_ERROR_RATE) and fails over down the list.
+
+For call types in LLM_HEDGE_CALL_TYPES, if that backend has not answered
+within its observed LLM_HEDGE_PERCENTILE latency, a duplicate goes to the
+next backend (or the same one when only one is configured). The first
+response that passes validation wins; the other request is cancelled.
+Invalid responses (malformed XML by default) do not win while another
+request is pending.
+
+Everything runs on asyncio so losers are really cancelled: async callers use
+their own loop, sync callers (views, grading workers) share a background loop.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from xml.etree import ElementTree
+
+import httpx
+from django.conf import settings
+
+from . import llm_client
+
+logger = logging.getLogger('learning')
+
+
+def well_formed_xml(content):
+    """Default validator: content (optionally in a ``` fence) parses as XML."""
+    text = (content or '').strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    try:
+        ElementTree.fromstring(text.strip())
+    except ElementTree.ParseError:
+        return False
+    return True
+
+
+class Backend:
+    def __init__(self, name, url, api_key, model=None):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.breaker = llm_client.CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_RESET_SECONDS)
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.outcomes = deque(maxlen=settings.LLM_ROUTER_WINDOW)
+        self.counters = {'calls': 0, 'failures': 0, 'hedges': 0, 'wins': 0, 'cancelled': 0}
+
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = httpx.AsyncClient(**llm_client._client_kwargs(self.url, self.api_key))
+        return client
+
+    def incr(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def record(self, call_type, seconds, ok):
+        with self._lock:
+            self.counters['calls'] += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.setdefault(call_type, deque(maxlen=settings.LLM_ROUTER_WINDOW)).append(seconds)
+            else:
+                self.counters['failures'] += 1
+
+    def percentile(self, call_type, pct):
+        """Observed latency percentile in seconds, None until LLM_HEDGE_MIN_SAMPLES calls."""
+        with self._lock:
+            values = sorted(self.latencies.get(call_type, ()))
+        if len(values) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * pct))]
+
+    def error_rate(self):
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self):
+        return self.breaker.state != 'open' and self.error_rate() <= settings.LLM_BACKEND_MAX_ERROR_RATE
+
+    def pool_stats(self):
+        """Occupancy of this backend's AsyncClient pools (one per event loop), best effort."""
+        result = {'clients': 0, 'open_connections': 0, 'idle_connections': 0}
+        for client in list(self._clients.values()):
+            if client.is_closed:
+                continue
+            connections = getattr(getattr(getattr(client, '_transport', None), '_pool', None), 'connections', None)
+            if connections is None:
+                continue
+            connections = list(connections)
+            result['clients'] += 1
+            result['open_connections'] += len(connections)
+            result['idle_connections'] += sum(1 for c in connections if c.is_idle())
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            latency = {}
+            for call_type, values in self.latencies.items():
+                ordered = sorted(values)
+                latency[call_type] = {
+                    'count': len(ordered),
+                    'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                }
+            data = dict(self.counters)
+        data.update({'url': self.url, 'circuit': self.breaker.state, 'error_rate': round(self.error_rate(), 4),
+                     'latency': latency})
+        return data
+
+
+_backends = []
+_config = None
+_backends_lock = threading.Lock()
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def backends():
+    """Configured backends; rebuilt when settings.LLM_BACKENDS changes."""
+    global _backends, _config
+    with _backends_lock:
+        if _config is not settings.LLM_BACKENDS:
+            configured = settings.LLM_BACKENDS or [{
+                'name': 'primary',
+                'url': settings.DEEPSEEK_API_URL,
+                'api_key': settings.DEEPSEEK_API_KEY,
+            }]
+            _backends = [
+                Backend(b.get('name') or f'backend-{i}', b['url'], b.get('api_key', ''), b.get('model'))
+                for i, b in enumerate(configured)
+            ]
+            _config = settings.LLM_BACKENDS
+        return _backends
+
+
+def ranked():
+    """Backends to try, in order: healthy ones in configured order, then the rest."""
+    configured = backends()
+    return [b for b in configured if b.healthy()] + [b for b in configured if not b.healthy()]
+
+
+def hedge_delay(backend, call_type):
+    observed = backend.percentile(call_type, settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_DELAY
+    return max(settings.LLM_HEDGE_MIN_DELAY, observed)
+
+
+async def _attempt(backend, payload, call_type):
+    """One backend, with the usual bounded retries; returns the message content."""
+    if not backend.breaker.allow():
+        llm_client.stats.incr('rejected')
+        raise llm_client.LLMUnavailable(f'LLM backend {backend.name} circuit is open')
+    if backend.model:
+        payload = {**payload, 'model': backend.model}
+    client = backend.client()
+    last_exc = None
+    llm_client.stats.incr('in_flight')
+    try:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                response = await client.post('/chat/completions', json=payload)
+                response.raise_for_status()
+                content = llm_client._extract_content(response.json())
+            except (httpx.HTTPError, ValueError, llm_client.LLMError) as e:
+                elapsed = time.perf_counter() - started
+                backend.record(call_type, elapsed, ok=False)
+                llm_client.stats.record(call_type, elapsed, ok=False)
+                last_exc = e
+                if attempt < settings.LLM_MAX_RETRIES and llm_client._is_retryable(e):
+                    llm_client.stats.incr('retries')
+                    await asyncio.sleep(llm_client._backoff(attempt))
+                    continue
+                break
+            elapsed = time.perf_counter() - started
+            backend.record(call_type, elapsed, ok=True)
+            llm_client.stats.record(call_type, elapsed, ok=True)
+            backend.breaker.record_success()
+            return content
+    except asyncio.CancelledError:
+        backend.incr('cancelled')
+        raise
+    finally:
+        llm_client.stats.incr('in_flight', -1)
+    if llm_client._is_retryable(last_exc):
+        backend.breaker.record_failure()
+    raise llm_client.LLMError(f'{call_type} failed on {backend.name}: {last_exc}') from last_exc
+
+
+async def acomplete(payload, call_type='generic', validate=None):
+    """Route a chat payload; returns the content of the winning response."""
+    candidates = ranked()
+    hedged = call_type in settings.LLM_HEDGE_CALL_TYPES
+    if hedged and validate is None:
+        validate = well_formed_xml
+    if hedged and len(candidates) == 1:
+        candidates = candidates * 2  # hedge against the same backend
+    queue = list(candidates)
+    pending = {}
+    invalid, last_exc = None, None
+
+    def launch():
+        backend = queue.pop(0)
+        pending[asyncio.ensure_future(_attempt(backend, payload, call_type))] = backend
+        return backend
+
+    launch()
+    try:
+        while pending:
+            timeout = None
+            if hedged and queue and len(pending) == 1:
+                timeout = hedge_delay(next(iter(pending.values())), call_type)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                backend = launch()
+                backend.incr('hedges')
+                logger.info(f'Hedging {call_type} to {backend.name} after {timeout:.2f}s')
+                continue
+            for task in done:
+                backend = pending.pop(task)
+                if task.exception() is not None:
+                    last_exc = task.exception()
+                    logger.warning(f'LLM backend {backend.name} failed for {call_type}: {last_exc}')
+                    continue
+                content = task.result()
+                if validate is None or validate(content):
+                    backend.incr('wins')
+                    return content
+                invalid = content
+            if not pending and queue:
+                launch()  # fail over to the next backend
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    if invalid is not None:
+        return invalid  # let the caller's parser report what is wrong with it
+    if isinstance(last_exc, llm_client.LLMError):
+        raise last_exc
+    raise llm_client.LLMError(f'{call_type} failed on every backend: {last_exc}') from last_exc
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='llm-router', daemon=True).start()
+        return _loop
+
+
+def deadline():
+    """
+    Upper bound in seconds for one routed call: every backend tried in turn
+    with all its retries and backoffs, each attempt bounded by the connect
+    and read timeouts. Hedged duplicates run in parallel and add nothing.
+    """
+    attempts = settings.LLM_MAX_RETRIES + 1
+    per_backend = (
+        attempts * (settings.LLM_CONNECT_TIMEOUT + settings.LLM_READ_TIMEOUT)
+        + settings.LLM_RETRY_BACKOFF * (2 ** settings.LLM_MAX_RETRIES - 1)
+    )
+    return len(backends()) * per_backend
+
+
+def complete(payload, call_type='generic', validate=None):
+    """Blocking counterpart of acomplete() for sync callers."""
+    future = asyncio.run_coroutine_threadsafe(acomplete(payload, call_type, validate), _background_loop())
+    timeout = deadline()
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        # httpx read timeouts are per read; a trickling response must not pin the caller's thread
+        future.cancel()
+        raise llm_client.LLMError(f'{call_type} did not finish within {timeout:.0f}s')
+
+
+def get_stats():
+    return {b.name: b.snapshot() for b in backends()}
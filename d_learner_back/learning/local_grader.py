@@ -0,0 +1,151 @@
+"""
+Rule-based grading for objective task types (multiple choice, fill in the
+blank, matching) using the answer key already present in parsed_task.
+
+Comparison is German-aware: case-insensitive, umlauts equal their ae/oe/ue
+spellings, ß equals ss, and an answer that is right except for the article
+gets partial credit. grade() returns None when the task has no usable key,
+in which case the caller falls back to the LLM.
+"""
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+OBJECTIVE_TYPES = {'multiple_choice', 'fill_blank', 'matching'}
+
+ARTICLES = {
+    'der', 'die', 'das', 'den', 'dem', 'des',
+    'ein', 'eine', 'einen', 'einem', 'einer', 'eines',
+}
+ARTICLE_CREDIT = 0.5
+
+_UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+_PUNCT = re.compile(r"[^\w\s]", re.UNICODE)
+_KEY_FIELDS = ('correct_answer', 'answer', 'correct', 'solution')
+_UNMAPPED = object()  # no answer in the submission maps to the question
+
+
+def normalize(text):
+    text = str(text).lower().translate(_UMLAUTS)
+    text = _PUNCT.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def strip_article(normalized):
+    words = normalized.split(' ')
+    if len(words) > 1 and words[0] in ARTICLES:
+        return ' '.join(words[1:])
+    return normalized
+
+
+def compare(expected, given):
+    """Return (credit, note) for one answer."""
+    if given is None or str(given).strip() == '':
+        return 0.0, 'missing'
+    alternatives = expected if isinstance(expected, (list, tuple)) else [expected]
+    given_n = normalize(given)
+    best = (0.0, 'wrong')
+    for alt in alternatives:
+        alt_n = normalize(alt)
+        if given_n == alt_n:
+            return 1.0, 'correct'
+        # Not equal as given, equal without articles: a wrong, missing or extra article
+        if strip_article(given_n) == strip_article(alt_n):
+            best = (ARTICLE_CREDIT, 'article')
+    return best
+
+
+def _expected_answer(question):
+    for field in _KEY_FIELDS:
+        value = question.get(field)
+        if value not in (None, '', [], {}) and not isinstance(value, bool):
+            return value
+    # multiple choice: options flagged as correct
+    options = question.get('options') or []
+    correct = [o.get('text', o.get('value')) for o in options if isinstance(o, dict) and o.get('correct')]
+    if correct:
+        return correct
+    return None
+
+
+def _given_answer(submission, question, index):
+    if isinstance(submission, dict):
+        qid = question.get('id')
+        for key in (qid, str(qid) if qid is not None else None, str(index), index):
+            if key is not None and key in submission:
+                return submission[key]
+        answers = submission.get('answers')
+        if answers is not None:
+            return _given_answer(answers, question, index)
+        return _UNMAPPED
+    if isinstance(submission, list) and index < len(submission):
+        return submission[index]
+    return _UNMAPPED
+
+
+def _grade_matching(expected, given):
+    if not isinstance(expected, dict) or not isinstance(given, dict):
+        return compare(expected, given)
+    if not expected:
+        return 0.0, 'wrong'
+    hits = sum(compare(v, given.get(k))[0] for k, v in expected.items())
+    credit = hits / len(expected)
+    return credit, 'correct' if credit == 1.0 else 'partial'
+
+
+def grade(task_type, parsed_task, submission):
+    """
+    Grade an objective task locally. Returns a dict shaped like
+    ai_service.grade_submission's result (score, feedback_xml) plus
+    parsed_feedback, or None if the task cannot be graded without the LLM
+    (no answer key, or a submission none of whose answers map to a question,
+    e.g. plain text parsed as {'raw': ...}).
+    """
+    if task_type not in OBJECTIVE_TYPES or not isinstance(parsed_task, dict):
+        return None
+    questions = parsed_task.get('questions') or parsed_task.get('items')
+    if not questions:
+        return None
+
+    items, mapped = [], False
+    for index, question in enumerate(questions):
+        expected = _expected_answer(question)
+        if expected is None:
+            return None
+        given = _given_answer(submission, question, index)
+        if given is _UNMAPPED:
+            given = None
+        else:
+            mapped = True
+        if task_type == 'matching':
+            credit, note = _grade_matching(expected, given)
+        else:
+            credit, note = compare(expected, given)
+        items.append({
+            'id': question.get('id', index),
+            'credit': credit,
+            'result': note,
+            'expected': expected,
+            'given': given,
+        })
+    if not mapped:
+        return None
+
+    score = round(sum(i['credit'] for i in items) / len(items), 4)
+    return {
+        'score': score,
+        'feedback_xml': _feedback_xml(score, items),
+        'parsed_feedback': {'score': score, 'items': items, 'graded_by': 'local'},
+    }
+
+
+def _feedback_xml(score, items):
+    parts = [f'<feedback graded_by="local"><score>{score:.2f}</score><items>']
+    for i in items:
+        parts.append(
+            f'<item id={quoteattr(str(i["id"]))} result="{i["result"]}" credit="{i["credit"]:.2f}">'
+            f'<expected>{escape(str(i["expected"]))}</expected>'
+            f'<given>{escape(str(i["given"] if i["given"] is not None else ""))}</given>'
+            f'</item>'
+        )
+    parts.append('</items></feedback>')
+    return ''.join(parts)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learning import archive
+
+
+class Command(BaseCommand):
+    """
+    Move the bulky columns of old attempts to the cold tier. Safe to stop and
+    rerun at any time: each batch commits on its own and skips archived rows.
+
+    python manage.py archive_exercises --days 90 --batch-size 500 --backend segments
+    """
+    help = 'Archive exercise history older than N days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--backend', choices=['table', 'segments'], default=settings.ARCHIVE_BACKEND)
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **opts):
+        total = 0
+        started = time.perf_counter()
+        for archived in archive.archive_older_than(
+            opts['days'], opts['batch_size'], opts['backend'], opts['max_batches']
+        ):
+            total += archived
+            self.stdout.write(f'Archived {total} attempts ({total / (time.perf_counter() - started):.0f}/s)')
+            if opts['pause']:
+                time.sleep(opts['pause'])
+        self.stdout.write(f'Done: {total} attempts archived to {opts["backend"]}')
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from learning import compression
+from learning.management.commands.train_compression_dictionary import sample_values
+
+TABLES = ['learning_exercisehistory', 'learning_recommendation', 'learning_leveltest',
+          'learning_pregeneratedtask', 'learning_leveltestbankentry']
+
+
+class Command(BaseCommand):
+    """
+    Compression ratio and per-value compress/decompress latency of each codec
+    on real column values, plus on-disk table sizes (PostgreSQL). Run once
+    before and once after migration 0003 to compare table sizes.
+
+    python manage.py bench_compression --table learning_exercisehistory --column ai_generated_task_xml
+    """
+    help = 'Benchmark compressed text column codecs and table sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', default='learning_exercisehistory')
+        parser.add_argument('--column', default='ai_generated_task_xml')
+        parser.add_argument('--samples', type=int, default=2000)
+
+    def _codecs(self):
+        codecs = [('zlib', compression.ZLIB, 0)]
+        if compression.zstandard is not None:
+            codecs.append(('zstd', compression.ZSTD, 0))
+            if settings.COMPRESSION_DICTIONARY_ID:
+                codecs.append((f'zstd+dict {settings.COMPRESSION_DICTIONARY_ID}', compression.ZSTD,
+                               settings.COMPRESSION_DICTIONARY_ID))
+        return codecs
+
+    def handle(self, *args, **opts):
+        values = sample_values(opts['table'], opts['column'], opts['samples'])
+        if not values:
+            raise CommandError(f'No values in {opts["table"]}.{opts["column"]}')
+        raw_bytes = sum(len(v.encode('utf-8')) for v in values)
+        self.stdout.write(f'{len(values)} values, {raw_bytes:,} raw bytes (avg {raw_bytes // len(values):,})')
+        self.stdout.write(f'{"codec":<14} {"ratio":>7} {"compress us":>12} {"decompress us":>14}')
+
+        for name, codec, dict_id in self._codecs():
+            started = time.perf_counter()
+            packed = [compression.compress(v, use_codec=codec, dict_id=dict_id) for v in values]
+            compress_us = (time.perf_counter() - started) / len(values) * 1e6
+            started = time.perf_counter()
+            for p in packed:
+                compression.decompress(p)
+            decompress_us = (time.perf_counter() - started) / len(values) * 1e6
+            ratio = raw_bytes / sum(len(p) for p in packed)
+            self.stdout.write(f'{name:<14} {ratio:>6.2f}x {compress_us:>12.1f} {decompress_us:>14.1f}')
+
+        if connection.vendor == 'postgresql':
+            existing = set(connection.introspection.table_names())
+            with connection.cursor() as cursor:
+                for table in TABLES:
+                    if table in existing:
+                        cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+                        self.stdout.write(f'{table}: {cursor.fetchone()[0] / 1024 / 1024:.1f} MiB on disk')
@@ -0,0 +1,81 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from learning import context_snapshot
+from learning.models import ExerciseHistory, CompletionStatus
+from learning.user_context import build_user_context
+
+TASK_TYPES = ['multiple_choice', 'fill_blank', 'matching', 'translation', 'essay']
+
+
+class Command(BaseCommand):
+    """
+    Context read latency: build_user_context (per-type history queries)
+    versus the maintained snapshot, for one user with a large history.
+    Run against a scratch database.
+
+    python manage.py bench_context_snapshot --rows 100000 --reads 200
+    """
+    help = 'Benchmark user context reads: query-based vs snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='History rows for the benchmark user')
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--username', default='bench-context')
+
+    def _seed(self, user, rows):
+        now = timezone.now()
+        batch = []
+        for i in range(rows):
+            score = round(random.random(), 2)
+            batch.append(ExerciseHistory(
+                user=user,
+                task_type=random.choice(TASK_TYPES),
+                ai_generated_task_xml='<task/>',
+                parsed_task={},
+                parse_errors=[],
+                result_score=score,
+                completion_status=CompletionStatus.COMPLETED if score >= 0.6 else CompletionStatus.FAILED,
+                attempt_timestamp=now - timedelta(minutes=rows - i),
+            ))
+            if len(batch) == 5000:
+                ExerciseHistory.objects.bulk_create(batch)
+                batch = []
+        ExerciseHistory.objects.bulk_create(batch)
+
+    def _time(self, func, reads):
+        samples = []
+        for _ in range(reads):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+    def handle(self, *args, **opts):
+        random.seed(0)
+        user, created = User.objects.get_or_create(username=opts['username'])
+        existing = ExerciseHistory.objects.filter(user=user).count()
+        if existing < opts['rows']:
+            self.stdout.write(f'Seeding {opts["rows"] - existing} history rows...')
+            self._seed(user, opts['rows'] - existing)
+
+        started = time.perf_counter()
+        context_snapshot.rebuild(user.id)
+        self.stdout.write(f'Full snapshot rebuild: {time.perf_counter() - started:.2f}s')
+
+        p50, p95 = self._time(lambda: build_user_context(user, n_per_type=3), opts['reads'])
+        self.stdout.write(f'build_user_context: p50 {p50:.2f} ms, p95 {p95:.2f} ms')
+        p50, p95 = self._time(lambda: context_snapshot.get(user.id), opts['reads'])
+        self.stdout.write(f'snapshot (cache):   p50 {p50:.2f} ms, p95 {p95:.2f} ms')
+        p50, p95 = self._time(
+            lambda: (context_snapshot.cache.delete(context_snapshot._cache_key(user.id)),
+                     context_snapshot.get(user.id)),
+            opts['reads'],
+        )
+        self.stdout.write(f'snapshot (DB row):  p50 {p50:.2f} ms, p95 {p95:.2f} ms')
@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import path
+from django.utils import timezone
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.test import APIClient
+
+from learning.models import ExerciseHistory, CompletionStatus
+from learning.pagination import KeysetPagination
+from learning.views import TaskListView
+
+TASK_TYPES = ['multiple_choice', 'fill_blank', 'matching', 'translation', 'essay']
+
+# Served through the test client with this module as ROOT_URLCONF: the real
+# TaskListView, and the same view paginated with LIMIT/OFFSET for comparison.
+# Throttling is off so repeated requests are not rejected.
+urlpatterns = [
+    path('tasks/', TaskListView.as_view(throttle_classes=[]), name='bench-keyset'),
+    path('tasks-offset/', TaskListView.as_view(throttle_classes=[], pagination_class=LimitOffsetPagination),
+         name='bench-offset'),
+]
+
+
+class Command(BaseCommand):
+    """
+    Latency of GET /tasks/ pages at increasing depth through the full request
+    path (authentication, query, serialization, rendering): keyset cursor
+    versus LIMIT/OFFSET. Run against a scratch database after migrating (the
+    composite indexes must exist).
+
+    python manage.py bench_history_pagination --rows 1000000 --page-size 50
+    """
+    help = 'Benchmark keyset vs offset pagination of TaskListView'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeats', type=int, default=20)
+        parser.add_argument('--username', default='bench-history')
+
+    def _seed(self, user, rows):
+        now = timezone.now()
+        batch = []
+        for i in range(rows):
+            batch.append(ExerciseHistory(
+                user=user,
+                task_type=random.choice(TASK_TYPES),
+                ai_generated_task_xml='<task>' + 'x' * 2000 + '</task>',
+                parsed_task={},
+                parse_errors=[],
+                result_score=round(random.random(), 2),
+                completion_status=random.choice([CompletionStatus.COMPLETED, CompletionStatus.FAILED]),
+                attempt_timestamp=now - timedelta(seconds=rows - i),
+            ))
+            if len(batch) == 5000:
+                ExerciseHistory.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f'  {i + 1} rows', ending='\r')
+        ExerciseHistory.objects.bulk_create(batch)
+
+    def _median_ms(self, client, url, params, expected, repeats):
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            response = client.get(url, params)
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200 or len(response.data['results']) != expected:
+                raise RuntimeError(f'{url} {params} returned {response.status_code}')
+        samples.sort()
+        return samples[len(samples) // 2]
+
+    def handle(self, *args, **opts):
+        random.seed(0)
+        user, _ = User.objects.get_or_create(username=opts['username'])
+        existing = ExerciseHistory.objects.filter(user=user).count()
+        if existing < opts['rows']:
+            self.stdout.write(f'Seeding {opts["rows"] - existing} history rows...')
+            self._seed(user, opts['rows'] - existing)
+
+        size = opts['page_size']
+        base = ExerciseHistory.objects.filter(user=user).order_by('-attempt_timestamp', '-id')
+        total = base.count()
+        client = APIClient()
+        client.force_authenticate(user)
+        self.stdout.write(f'{total} rows, page size {size}')
+        self.stdout.write(f'{"depth (rows)":>14} {"keyset ms":>10} {"offset ms":>10}')
+
+        with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver']):
+            depth = 0
+            while depth < total:
+                keyset = {'page_size': size}
+                if depth:
+                    # Cursor of the row just before the page (setup, not timed)
+                    ts, pk = base.values_list('attempt_timestamp', 'id')[depth - 1]
+                    keyset['cursor'] = KeysetPagination().encode_cursor(ts, pk)
+                expected = min(size, total - depth)
+                keyset_ms = self._median_ms(client, '/tasks/', keyset, expected, opts['repeats'])
+                offset_ms = self._median_ms(client, '/tasks-offset/', {'limit': size, 'offset': depth},
+                                            expected, opts['repeats'])
+                self.stdout.write(f'{depth:>14} {keyset_ms:>10.2f} {offset_ms:>10.2f}')
+                depth = depth * 10 if depth else size * 10
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning import local_grader
+
+WORDS = ['der Hund', 'die Straße', 'das Mädchen', 'der Bäcker', 'die Tür', 'das Frühstück', 'groß', 'schön']
+
+
+def _task(n_questions):
+    questions = [{'id': i, 'correct_answer': random.choice(WORDS)} for i in range(n_questions)]
+    return {'questions': questions}
+
+
+def _submission(task):
+    answers = {}
+    for q in task['questions']:
+        answer = q['correct_answer']
+        roll = random.random()
+        if roll < 0.3:
+            answer = answer.replace('ß', 'ss').replace('ä', 'ae').replace('ü', 'ue').upper()
+        elif roll < 0.4:
+            answer = answer.split(' ')[-1]
+        elif roll < 0.5:
+            answer = 'falsch'
+        answers[str(q['id'])] = answer
+    return answers
+
+
+class Command(BaseCommand):
+    """
+    Grading throughput of the local rule-based grader on a single core.
+
+    python manage.py bench_local_grader --tasks 20000 --questions 10
+    """
+    help = 'Benchmark local grading throughput per core'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=20000)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--task-type', default='fill_blank')
+
+    def handle(self, *args, **opts):
+        random.seed(0)
+        cases = []
+        for _ in range(opts['tasks']):
+            task = _task(opts['questions'])
+            cases.append((task, _submission(task)))
+
+        started = time.perf_counter()
+        for task, submission in cases:
+            local_grader.grade(opts['task_type'], task, submission)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{opts["tasks"]} tasks x {opts["questions"]} questions in {elapsed:.3f}s: '
+            f'{opts["tasks"] / elapsed:,.0f} submissions/s, '
+            f'{elapsed / opts["tasks"] * 1e6:.1f} us per submission (single core)'
+        )
@@ -0,0 +1,78 @@
+import json
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from learning import context_snapshot, prompt_budget
+from learning.models import CompletionStatus
+
+TASK_TYPES = ['multiple_choice', 'fill_blank', 'matching', 'translation', 'essay']
+ERRORS = ['articles', 'cases', 'word_order', 'verb_conjugation', 'spelling', 'prepositions']
+INSTRUCTIONS = (
+    'You are a German teacher. Create one fill_blank exercise for the learner described below. '
+    'Answer with a single <task> XML element and nothing else.'
+)
+
+
+def synthetic_history(attempts):
+    """Snapshot and naive per-attempt history lines for one learner, no database needed."""
+    snapshot = context_snapshot.empty()
+    lines = []
+    started = timezone.now() - timedelta(days=attempts // 20 + 1)
+    for i in range(attempts):
+        score = round(random.random(), 2)
+        exercise = SimpleNamespace(
+            id=i + 1,
+            user_id=1,
+            task_type=random.choice(TASK_TYPES),
+            completion_status=CompletionStatus.COMPLETED if score >= 0.5 else CompletionStatus.FAILED,
+            result_score=score,
+            attempt_timestamp=started + timedelta(minutes=72 * i),
+            parsed_feedback={'errors': [{'category': random.choice(ERRORS)}] if score < 0.8 else []},
+        )
+        context_snapshot.apply(snapshot, exercise, created=True)
+        lines.append(json.dumps({'type': exercise.task_type, 'score': score, 'status': exercise.completion_status,
+                                 'errors': exercise.parsed_feedback['errors']}))
+    return snapshot, lines
+
+
+class Command(BaseCommand):
+    """
+    Prompt size versus history length: the full history serialized into the
+    prompt vs the budgeted context (summary + ranked items) of prompt_budget.
+    Runs in memory, no database rows are created.
+
+    python manage.py bench_prompt_budget --attempts 10 100 1000 10000
+    """
+    help = 'Benchmark prompt tokens per history size: unbounded vs budgeted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, nargs='+', default=[10, 100, 1000, 10000])
+        parser.add_argument('--call-type', default='generate_task')
+        parser.add_argument('--task-type', default='fill_blank')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **opts):
+        random.seed(42)
+        call_type = opts['call_type']
+        budget = prompt_budget.budget_for(call_type)
+        reserved = prompt_budget.estimate_tokens(INSTRUCTIONS)
+        self.stdout.write(f'{call_type}: budget {budget} tokens, instructions ~{reserved} tokens, '
+                          f'{settings.CONTEXT_SNAPSHOT_RECENT_PER_TYPE} recent attempts kept per type')
+        self.stdout.write(f'{"attempts":>9} {"full history":>13} {"budgeted":>9} {"assembly":>10}')
+        for attempts in opts['attempts']:
+            snapshot, lines = synthetic_history(attempts)
+            full = prompt_budget.estimate_tokens(INSTRUCTIONS + '\n' + '\n'.join(lines))
+            summary = prompt_budget.summarize(snapshot)
+            started = time.perf_counter()
+            for _ in range(opts['repeat']):
+                context = prompt_budget.render(snapshot, summary, call_type, budget - reserved, opts['task_type'],
+                                               {'language_level': 'B1'})
+            elapsed_ms = (time.perf_counter() - started) / opts['repeat'] * 1000
+            budgeted = reserved + prompt_budget.estimate_tokens(context)
+            self.stdout.write(f'{attempts:>9} {full:>13} {budgeted:>9} {elapsed_ms:>8.2f}ms')
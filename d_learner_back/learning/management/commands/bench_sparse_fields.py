@@ -0,0 +1,91 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from learning.models import ExerciseHistory, CompletionStatus
+from learning.serializers import ExerciseHistorySerializer
+from learning.views import TaskListView
+
+TASK_TYPES = ['multiple_choice', 'fill_blank', 'matching', 'translation', 'essay']
+
+
+class Command(BaseCommand):
+    """
+    Payload size and latency of one history page (query + serialization +
+    JSON rendering) with all columns versus the compact TaskListView default.
+
+    python manage.py bench_sparse_fields --rows 2000 --page-size 50
+    """
+    help = 'Benchmark full vs sparse exercise history payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeats', type=int, default=50)
+        parser.add_argument('--username', default='bench-sparse')
+
+    def _seed(self, user, rows):
+        now = timezone.now()
+        xml = '<task><question>' + 'Wie heißt das auf Deutsch? ' * 60 + '</question></task>'
+        ExerciseHistory.objects.bulk_create([
+            ExerciseHistory(
+                user=user,
+                task_type=random.choice(TASK_TYPES),
+                ai_prompt='Generate a task for level B1. ' * 40,
+                ai_generated_task_xml=xml,
+                ai_feedback_xml='<feedback>' + 'Gut gemacht. ' * 80 + '</feedback>',
+                parsed_task={'questions': [{'id': i, 'text': 'Frage ' * 20} for i in range(10)]},
+                parsed_feedback={'items': [{'id': i, 'result': 'correct'} for i in range(10)]},
+                parse_errors=[],
+                result_score=round(random.random(), 2),
+                completion_status=CompletionStatus.COMPLETED,
+                attempt_timestamp=now - timedelta(seconds=rows - i),
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def _measure(self, view, user, query, repeats):
+        factory = APIRequestFactory()
+        size, samples = 0, []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            request = Request(factory.get('/learning/tasks/', query))
+            request.user = user
+            view.request = request
+            view.format_kwarg = None
+            rows = view.paginator.paginate_queryset(view.filter_queryset(view.get_queryset()), request, view=view)
+            data = ExerciseHistorySerializer(rows, many=True, context=view.get_serializer_context()).data
+            body = JSONRenderer().render(data)
+            samples.append((time.perf_counter() - started) * 1000)
+            size = len(body)
+        samples.sort()
+        return size, samples[len(samples) // 2]
+
+    def handle(self, *args, **opts):
+        random.seed(0)
+        user, _ = User.objects.get_or_create(username=opts['username'])
+        existing = ExerciseHistory.objects.filter(user=user).count()
+        if existing < opts['rows']:
+            self._seed(user, opts['rows'] - existing)
+
+        view = TaskListView()
+        view.kwargs = {}
+        view.args = ()
+        query = {'page_size': opts['page_size']}
+        full_fields = ','.join(ExerciseHistorySerializer.Meta.fields)
+        full_bytes, full_ms = self._measure(view, user, {**query, 'fields': full_fields}, opts['repeats'])
+        sparse_bytes, sparse_ms = self._measure(view, user, query, opts['repeats'])
+
+        self.stdout.write(f'full page:    {full_bytes:>10,} bytes  {full_ms:8.2f} ms')
+        self.stdout.write(f'compact page: {sparse_bytes:>10,} bytes  {sparse_ms:8.2f} ms')
+        self.stdout.write(
+            f'reduction: {100 * (1 - sparse_bytes / full_bytes):.1f}% bytes, '
+            f'{100 * (1 - sparse_ms / full_ms):.1f}% latency'
+        )
@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from learning import grading
+from learning.models import ExerciseHistory, ExperienceSummary, UserProfile, CompletionStatus
+
+
+def legacy_stats(user, exercise, xp_gain):
+    """The previous write path: full-row saves with read-modify-write counters."""
+    exercise.save()
+    profile = UserProfile.objects.get(user=user)
+    if exercise.completion_status == CompletionStatus.COMPLETED:
+        profile.progress += 10
+    else:
+        profile.errors += 1
+    profile.save()
+    exp = ExperienceSummary.objects.get(user=user)
+    exp.total_xp += xp_gain
+    exp.completed_exercises += 1
+    exp.save()
+
+
+def atomic_stats(user, exercise, xp_gain):
+    from django.db import transaction
+    with transaction.atomic():
+        exercise.save(update_fields=grading.GRADED_FIELDS)
+        grading.apply_submission_stats(user.id, exercise.completion_status == CompletionStatus.COMPLETED, xp_gain)
+
+
+class Command(BaseCommand):
+    """
+    Queries and latency of the post-grading write path (history row, profile
+    and experience counters): legacy full-row saves vs the atomic F() update.
+    Run against a scratch database.
+
+    python manage.py bench_submit_queries --submits 500
+    """
+    help = 'Benchmark queries per graded submission'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submits', type=int, default=500)
+        parser.add_argument('--username', default='bench-submit')
+
+    def _run(self, func, user, exercise, submits):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(submits):
+                func(user, exercise, 25)
+            elapsed = time.perf_counter() - started
+        return len(queries) / submits, elapsed / submits * 1000
+
+    def handle(self, *args, **opts):
+        user, _ = User.objects.get_or_create(username=opts['username'])
+        UserProfile.objects.get_or_create(user=user)
+        ExperienceSummary.objects.get_or_create(user=user)
+        exercise = ExerciseHistory.objects.create(
+            user=user, task_type='fill_blank', ai_generated_task_xml='<task>' + 'x' * 4000 + '</task>',
+            parsed_task={}, parse_errors=[], result_score=0.8, completion_status=CompletionStatus.COMPLETED,
+            ai_feedback_xml='<feedback/>', parsed_feedback={'score': 0.8},
+        )
+
+        for name, func in (('legacy', legacy_stats), ('atomic F()', atomic_stats)):
+            per_submit, ms = self._run(func, user, exercise, opts['submits'])
+            self.stdout.write(f'{name:<12} {per_submit:.1f} queries/submit  {ms:.2f} ms/submit')
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.throttling import ScopedRateThrottle
+
+from learning.throttling import TokenBucketThrottle
+
+
+class _Request:
+    def __init__(self, user_id):
+        self.user = type('User', (), {'pk': user_id, 'is_authenticated': True})()
+        self.META = {'REMOTE_ADDR': '127.0.0.1'}
+
+
+class _View:
+    throttle_scope = 'bench-throttle'
+
+
+class Command(BaseCommand):
+    """
+    Throughput of throttle checks: stock ScopedRateThrottle (cache-backed
+    timestamp list, read + write per request) vs TokenBucketThrottle (one
+    Lua call). Run against the Redis used in production for meaningful numbers.
+
+    python manage.py bench_throttle --requests 20000 --users 50 --threads 8
+    """
+    help = 'Benchmark ScopedRateThrottle vs TokenBucketThrottle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--rate', default='1000/min')
+
+    def _run(self, throttle_class, requests, threads):
+        def check(request):
+            return throttle_class().allow_request(request, _View())
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            allowed = sum(pool.map(check, requests))
+        return time.perf_counter() - start, allowed
+
+    def handle(self, *args, **options):
+        rates = {'bench-throttle': options['rate']}
+        ScopedRateThrottle.THROTTLE_RATES = rates
+        TokenBucketThrottle.THROTTLE_RATES = rates
+        requests = [_Request(i % options['users']) for i in range(options['requests'])]
+        self.stdout.write(f"Cache backend: {cache.__class__.__name__}, rate {options['rate']} per user")
+        for name, throttle_class in (('ScopedRateThrottle', ScopedRateThrottle), ('TokenBucketThrottle', TokenBucketThrottle)):
+            elapsed, allowed = self._run(throttle_class, requests, options['threads'])
+            self.stdout.write(
+                f'{name:20s} {len(requests) / elapsed:10.0f} checks/s  '
+                f'{elapsed / len(requests) * 1e6:7.1f} us/check  allowed={allowed}'
+            )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from learning import level_test_bank
+from learning.models import LevelTestBankEntry
+
+
+class Command(BaseCommand):
+    """
+    Pre-generate and validate level tests so starting a test needs no LLM call.
+
+    python manage.py build_level_test_bank --per-type 30 --test-types initial periodic
+    """
+    help = 'Fill the level test bank up to N validated tests per test_type'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-type', type=int, default=30)
+        parser.add_argument('--test-types', nargs='+', default=['initial', 'periodic'])
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='Give up on a test_type after this many generations (default: 3x per-type)')
+
+    def handle(self, *args, **opts):
+        for test_type in opts['test_types']:
+            have = LevelTestBankEntry.objects.filter(test_type=test_type).count()
+            attempts = 0
+            max_attempts = opts['max_attempts'] or opts['per_type'] * 3
+            while have < opts['per_type'] and attempts < max_attempts:
+                attempts += 1
+                try:
+                    if level_test_bank.add_generated(test_type):
+                        have += 1
+                except Exception as e:
+                    self.stderr.write(f'{test_type}: generation error: {e}')
+            self.stdout.write(f'{test_type}: {have} tests in bank ({attempts} generations)')
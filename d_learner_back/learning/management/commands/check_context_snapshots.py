@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from learning import context_snapshot
+from learning.models import UserContextSnapshot
+
+
+class Command(BaseCommand):
+    """
+    Compare stored snapshots against a rebuild from history (consistency check).
+
+    python manage.py check_context_snapshots [--user 42] [--fix]
+    """
+    help = 'Verify user context snapshots against the exercise history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='User id (repeatable); default all snapshots')
+        parser.add_argument('--fix', action='store_true', help='Rebuild snapshots that differ')
+
+    def handle(self, *args, **opts):
+        user_ids = opts['user'] or UserContextSnapshot.objects.order_by('user_id').values_list('user_id', flat=True)
+        checked = mismatched = 0
+        for user_id in user_ids:
+            checked += 1
+            diffs = context_snapshot.check(user_id)
+            if not diffs:
+                continue
+            mismatched += 1
+            self.stdout.write(f'User {user_id}: {json.dumps(diffs, default=str)}')
+            if opts['fix']:
+                context_snapshot.rebuild(user_id)
+        self.stdout.write(f'Checked {checked} snapshots, {mismatched} inconsistent')
@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from learning.models import AdaptiveTestItem
+
+
+class Command(BaseCommand):
+    """
+    Load calibrated items for the adaptive placement test.
+
+    The file is a JSON list of objects with level, question, options,
+    correct_answer, discrimination (a) and difficulty (b).
+    """
+    help = 'Load calibrated 2PL item parameters into the adaptive test bank'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace', action='store_true', help='Deactivate the existing bank first')
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts['path'], encoding='utf-8') as fh:
+                items = json.load(fh)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read item bank: {e}')
+
+        with transaction.atomic():
+            if opts['replace']:
+                AdaptiveTestItem.objects.update(active=False)
+            AdaptiveTestItem.objects.bulk_create([
+                AdaptiveTestItem(
+                    level=item['level'],
+                    question=item['question'],
+                    options=item.get('options', []),
+                    correct_answer=item['correct_answer'],
+                    discrimination=float(item.get('discrimination', 1.0)),
+                    difficulty=float(item['difficulty']),
+                )
+                for item in items
+            ])
+        self.stdout.write(f'Loaded {len(items)} items')
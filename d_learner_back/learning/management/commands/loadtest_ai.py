@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+class Command(BaseCommand):
+    """
+    Load test: keep N AI calls in flight and sample latency of a cheap endpoint.
+
+    Example:
+        python manage.py loadtest_ai --base-url http://localhost:8000 --token <JWT> --concurrency 60
+    """
+    help = 'Measure non-AI endpoint latency while many AI calls are in flight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--token', required=True, help='JWT access token')
+        parser.add_argument('--ai-path', default='/learning/ai/async/generate-task/')
+        parser.add_argument('--probe-path', default='/learning/profile/')
+        parser.add_argument('--task-type', default='multiple_choice')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--probe-interval', type=float, default=0.1)
+        parser.add_argument('--baseline-samples', type=int, default=30)
+
+    def handle(self, *args, **opts):
+        asyncio.run(self._run(opts))
+
+    async def _probe(self, client, path, samples, stop=None, count=None, interval=0.1):
+        n = 0
+        while (stop is None or not stop.is_set()) and (count is None or n < count):
+            started = time.perf_counter()
+            await client.get(path)
+            samples.append((time.perf_counter() - started) * 1000)
+            n += 1
+            await asyncio.sleep(interval)
+
+    async def _ai_call(self, client, path, task_type, results):
+        started = time.perf_counter()
+        try:
+            resp = await client.post(path, json={'task_type': task_type})
+            results.append((resp.status_code, time.perf_counter() - started))
+        except httpx.HTTPError as e:
+            results.append((type(e).__name__, time.perf_counter() - started))
+
+    async def _run(self, opts):
+        headers = {'Authorization': f'Bearer {opts["token"]}'}
+        limits = httpx.Limits(max_connections=opts['concurrency'] + 10)
+        timeout = httpx.Timeout(300.0)
+        async with httpx.AsyncClient(base_url=opts['base_url'], headers=headers, limits=limits, timeout=timeout) as client:
+            baseline = []
+            await self._probe(client, opts['probe_path'], baseline, count=opts['baseline_samples'], interval=opts['probe_interval'])
+
+            under_load = []
+            ai_results = []
+            stop = asyncio.Event()
+            probe = asyncio.create_task(
+                self._probe(client, opts['probe_path'], under_load, stop=stop, interval=opts['probe_interval'])
+            )
+            await asyncio.gather(*[
+                self._ai_call(client, opts['ai_path'], opts['task_type'], ai_results)
+                for _ in range(opts['concurrency'])
+            ])
+            stop.set()
+            await probe
+
+        self.stdout.write(f'AI calls: {len(ai_results)} in flight, statuses: {sorted({str(s) for s, _ in ai_results})}')
+        self.stdout.write(f'AI call latency p50={statistics.median(t for _, t in ai_results):.2f}s')
+        for name, samples in (('baseline', baseline), ('under load', under_load)):
+            self.stdout.write(
+                f'{opts["probe_path"]} {name}: n={len(samples)} '
+                f'p50={_percentile(samples, 50):.1f}ms p95={_percentile(samples, 95):.1f}ms p99={_percentile(samples, 99):.1f}ms'
+            )
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from learning import context_snapshot
+
+
+class Command(BaseCommand):
+    """
+    Recompute user context snapshots from the full exercise history.
+
+    python manage.py rebuild_context_snapshots [--user 42]
+    """
+    help = 'Rebuild incrementally maintained user context snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='User id (repeatable); default all users')
+
+    def handle(self, *args, **opts):
+        user_ids = opts['user'] or User.objects.order_by('id').values_list('id', flat=True)
+        rebuilt = 0
+        for user_id in user_ids:
+            context_snapshot.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(f'Rebuilt {rebuilt} snapshots')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from learning import rating_stats
+
+
+class Command(BaseCommand):
+    """
+    Recompute RatingAggregate rows from the Rating table (initial backfill or repair).
+
+    python manage.py rebuild_rating_stats
+    """
+    help = 'Rebuild rolling rating statistics'
+
+    def handle(self, *args, **opts):
+        rows = rating_stats.rebuild()
+        self.stdout.write(f'Rebuilt {rows} rating aggregate rows')
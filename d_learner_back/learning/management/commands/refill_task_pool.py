@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning import task_pool
+
+
+class Command(BaseCommand):
+    """
+    Keep the pre-generated task pool between its low- and high-water marks.
+
+    One-shot:  python manage.py refill_task_pool
+    Worker:    python manage.py refill_task_pool --loop --interval 30
+    """
+    help = 'Refill the pre-generated AI task pool and drop expired entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Run forever as a background worker')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between refill passes')
+        parser.add_argument('--max-per-bucket', type=int, default=None,
+                            help='Cap generated tasks per bucket per pass (spreads provider load)')
+
+    def handle(self, *args, **opts):
+        while True:
+            expired = task_pool.expire_stale()
+            added = task_pool.refill(max_per_bucket=opts['max_per_bucket'])
+            self.stdout.write(f'Task pool: added {added}, expired {expired}')
+            if not opts['loop']:
+                break
+            time.sleep(opts['interval'])
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning import grading_jobs
+
+
+class Command(BaseCommand):
+    """
+    Drain the grading queue filled by AISubmitTaskView (mode=async).
+
+    python manage.py run_grading_workers --concurrency 8 --batch-size 16
+    """
+    help = 'Run the background grading worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel provider calls per process')
+        parser.add_argument('--batch-size', type=int, default=16, help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--max-running-seconds', type=int, default=300,
+                            help='Running jobs older than this are considered orphaned')
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--once', action='store_true', help='Drain what is queued and exit')
+
+    def handle(self, *args, **opts):
+        executor = grading_jobs.make_executor(opts['concurrency'])
+        try:
+            while True:
+                requeued, failed = grading_jobs.requeue_stale(opts['max_running_seconds'], opts['max_attempts'])
+                if requeued or failed:
+                    self.stdout.write(f'Requeued {requeued} stale jobs, failed {failed}')
+                processed = grading_jobs.drain_once(executor, opts['batch_size'])
+                if processed:
+                    self.stdout.write(f'Graded {processed} jobs')
+                    continue
+                if opts['once']:
+                    break
+                time.sleep(opts['poll_interval'])
+        finally:
+            executor.shutdown(wait=True)
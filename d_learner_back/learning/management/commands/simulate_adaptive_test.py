@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from learning import adaptive_test
+
+
+class Command(BaseCommand):
+    """
+    Simulate learners against the adaptive engine and a fixed-form test.
+
+    The fixed-form baseline scores the whole answer sheet by proportion
+    correct, which is what the LLM evaluation of a full level test sees.
+    """
+    help = 'Simulation benchmark: adaptive (IRT) placement vs fixed-form scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--learners', type=int, default=2000)
+        parser.add_argument('--bank-size', type=int, default=300)
+        parser.add_argument('--fixed-length', type=int, default=40)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts['seed'])
+        a = rng.lognormal(0.0, 0.3, opts['bank_size'])
+        b = rng.uniform(-3.0, 3.5, opts['bank_size'])
+        true_theta = rng.normal(0.3, 1.3, opts['learners'])
+        true_levels = [adaptive_test.level_for(t) for t in true_theta]
+
+        started = time.perf_counter()
+        cat_levels, cat_items, cat_theta = [], [], []
+        for theta in true_theta:
+            administered, responses = [], []
+            est, se = 0.0, float('inf')
+            while not adaptive_test.should_stop(len(administered), se):
+                index = adaptive_test.select_next(est, a, b, administered)
+                if index is None:
+                    break
+                administered.append(index)
+                responses.append(float(rng.random() < adaptive_test.probability(theta, a[index], b[index])))
+                est, se = adaptive_test.estimate_ability(a[administered], b[administered], responses)
+            cat_levels.append(adaptive_test.level_for(est))
+            cat_items.append(len(administered))
+            cat_theta.append(est)
+        cat_seconds = time.perf_counter() - started
+
+        # Fixed form: evenly spread difficulties, level from proportion correct
+        form = np.argsort(b)[np.linspace(0, opts['bank_size'] - 1, opts['fixed_length']).astype(int)]
+        p = adaptive_test.probability(true_theta[:, None], a[form][None, :], b[form][None, :])
+        share = (rng.random(p.shape) < p).mean(axis=1)
+        bands = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+        fixed_levels = [bands[min(5, int(s * 6))] for s in share]
+
+        def exact(levels):
+            return np.mean([x == y for x, y in zip(levels, true_levels)])
+
+        def within_one(levels):
+            return np.mean([abs(bands.index(x) - bands.index(y)) <= 1 for x, y in zip(levels, true_levels)])
+
+        rmse = float(np.sqrt(np.mean((np.array(cat_theta) - true_theta) ** 2)))
+        self.stdout.write(f'Learners: {opts["learners"]}, bank: {opts["bank_size"]} items')
+        self.stdout.write(
+            f'Adaptive:   {np.mean(cat_items):.1f} items avg (max {max(cat_items)}), '
+            f'exact level {exact(cat_levels):.1%}, within one {within_one(cat_levels):.1%}, '
+            f'theta RMSE {rmse:.2f}, {cat_seconds / opts["learners"] * 1000:.2f} ms per learner'
+        )
+        self.stdout.write(
+            f'Fixed form: {opts["fixed_length"]} items, '
+            f'exact level {exact(fixed_levels):.1%}, within one {within_one(fixed_levels):.1%}'
+        )
@@ -0,0 +1,72 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from learning import compression
+
+SOURCES = [
+    ('learning_exercisehistory', 'ai_generated_task_xml'),
+    ('learning_exercisehistory', 'ai_feedback_xml'),
+    ('learning_recommendation', 'generated_recommendations_xml'),
+    ('learning_leveltest', 'ai_generated_test_xml'),
+]
+
+
+def sample_values(table, column, limit):
+    """Most recent non-empty values of a (possibly compressed) text column."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {qn(column)} FROM {qn(table)} WHERE {qn(column)} IS NOT NULL ORDER BY id DESC LIMIT %s',
+            [limit],
+        )
+        values = []
+        for (value,) in cursor.fetchall():
+            text = value if isinstance(value, str) else compression.decompress(value)
+            if text:
+                values.append(text)
+    return values
+
+
+class Command(BaseCommand):
+    """
+    Train a zstd dictionary on recent AI XML and store it as
+    COMPRESSION_DICTIONARY_DIR/<id>.zdict. Activate it by setting
+    COMPRESSION_DICTIONARY_ID=<id>; values written earlier keep decoding
+    with the dictionary id recorded in their header.
+
+    python manage.py train_compression_dictionary --samples 5000 --size 112640
+    """
+    help = 'Train a shared zstd dictionary for compressed text columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=5000, help='Values per source column')
+        parser.add_argument('--size', type=int, default=112640, help='Dictionary size in bytes')
+        parser.add_argument('--dict-id', type=int, help='Defaults to the highest existing id + 1')
+
+    def handle(self, *args, **opts):
+        if compression.zstandard is None:
+            raise CommandError('zstandard is not installed')
+        tables = set(connection.introspection.table_names())
+        samples = []
+        for table, column in SOURCES:
+            if table in tables:
+                samples += [v.encode('utf-8') for v in sample_values(table, column, opts['samples'])]
+        if len(samples) < 100:
+            raise CommandError(f'Only {len(samples)} samples available, need at least 100')
+
+        directory = settings.COMPRESSION_DICTIONARY_DIR
+        os.makedirs(directory, exist_ok=True)
+        dict_id = opts['dict_id']
+        if dict_id is None:
+            existing = [int(name.split('.')[0]) for name in os.listdir(directory) if name.endswith('.zdict')]
+            dict_id = max(existing, default=0) + 1
+
+        dictionary = compression.zstandard.train_dictionary(opts['size'], samples)
+        path = os.path.join(directory, f'{dict_id}.zdict')
+        with open(path, 'wb') as f:
+            f.write(dictionary.as_bytes())
+        self.stdout.write(f'Trained dictionary {dict_id} on {len(samples)} samples -> {path}')
+        self.stdout.write(f'Set COMPRESSION_DICTIONARY_ID={dict_id} to use it for new values')
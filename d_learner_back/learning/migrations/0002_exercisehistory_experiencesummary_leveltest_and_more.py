@@ -0,0 +1,99 @@
+# Attempt history, recommendations, ratings, experience and level tests.
+# The exercise history indexes back keyset pagination (learning/pagination.py).
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('learning', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('multiple_choice', 'Multiple Choice'), ('dialogue', 'Dialogue'), ('free_text', 'Free Text'), ('matching', 'Matching'), ('fill_blank', 'Fill in the Blank')], max_length=50)),
+                ('ai_prompt', models.TextField(blank=True)),
+                ('ai_generated_task_xml', models.TextField(blank=True)),
+                ('user_submission_raw', models.TextField(blank=True)),
+                ('user_submission_parsed', models.JSONField(blank=True, default=dict)),
+                ('ai_feedback_xml', models.TextField(blank=True)),
+                ('result_score', models.FloatField(blank=True, null=True)),
+                ('attempt_timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completion_status', models.CharField(choices=[('completed', 'Completed'), ('failed', 'Failed'), ('partial', 'Partial'), ('in_progress', 'In Progress')], default='in_progress', max_length=20)),
+                ('parsed_task', models.JSONField(blank=True, default=dict)),
+                ('parsed_feedback', models.JSONField(blank=True, default=dict)),
+                ('parse_errors', models.JSONField(blank=True, default=list)),
+                ('user_feedback_notes', models.JSONField(blank=True, default=list)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user', 'attempt_timestamp', 'id'], name='exhist_user_ts_idx'),
+                    models.Index(fields=['user', 'task_type', 'attempt_timestamp', 'id'], name='exhist_user_type_ts_idx'),
+                    models.Index(fields=['user', 'completion_status', 'attempt_timestamp', 'id'], name='exhist_user_status_ts_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExperienceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_xp', models.IntegerField(default=0)),
+                ('completed_exercises', models.IntegerField(default=0)),
+                ('session_logs', models.JSONField(blank=True, default=list)),
+                ('skill_tree_json', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='experience', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LevelTest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_type', models.CharField(default='initial', max_length=50)),
+                ('ai_prompt', models.TextField(blank=True)),
+                ('ai_generated_test_xml', models.TextField(blank=True)),
+                ('user_answers', models.JSONField(blank=True, default=dict)),
+                ('ai_evaluation_xml', models.TextField(blank=True)),
+                ('determined_level', models.CharField(blank=True, max_length=10)),
+                ('total_score', models.FloatField(blank=True, null=True)),
+                ('completed', models.BooleanField(default=False)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='level_tests', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Rating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('rating_type', models.CharField(max_length=50)),
+                ('value', models.IntegerField()),
+                ('ai_feedback_xml', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ai_prompt', models.TextField(blank=True)),
+                ('generated_recommendations_xml', models.TextField(blank=True)),
+                ('rating', models.IntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
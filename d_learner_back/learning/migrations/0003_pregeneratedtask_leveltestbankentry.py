@@ -0,0 +1,48 @@
+# Task pool (learning/task_pool.py) and level test bank
+# (learning/level_test_bank.py) tables; their XML/prompt columns are
+# CompressedTextField (learning/fields.py, bytea) from the start.
+
+from django.db import migrations, models
+
+import learning.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0002_exercisehistory_experiencesummary_leveltest_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PregeneratedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(max_length=50)),
+                ('level', models.CharField(max_length=10)),
+                ('ai_prompt', learning.fields.CompressedTextField(blank=True)),
+                ('ai_generated_task_xml', learning.fields.CompressedTextField()),
+                ('parsed_task', models.JSONField(default=dict)),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['task_type', 'level', 'created_at'], name='learning_pr_task_ty_cc2d12_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LevelTestBankEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_type', models.CharField(max_length=50)),
+                ('test_xml', learning.fields.CompressedTextField()),
+                ('ai_prompt', learning.fields.CompressedTextField(blank=True)),
+                ('parsed_test', models.JSONField(default=dict)),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['test_type', 'id'], name='learning_le_test_ty_7aa055_idx')],
+            },
+        ),
+    ]
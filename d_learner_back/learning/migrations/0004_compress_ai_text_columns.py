@@ -0,0 +1,175 @@
+# Switches the AI prompt/XML columns of ExerciseHistory, Recommendation and
+# LevelTest to CompressedTextField (learning/fields.py, bytea) and compresses
+# the rows already stored. The task pool and level test bank tables (0003)
+# are created compressed.
+#
+# The codec is frozen here (zlib with the header of learning/compression.py)
+# so later changes to that module cannot change what this migration does.
+# Rows are compressed in primary-key batches, all columns of a table in one
+# pass, each batch committed on its own; compressed values are skipped, so an
+# interrupted run resumes. On PostgreSQL the type change rewrites each table
+# once under an exclusive lock.
+
+import struct
+import zlib
+
+from django.db import migrations, transaction
+
+import learning.fields
+
+MAGIC = b'\x00Z'
+ZLIB = b'z'
+HEADER = struct.Struct('>2scI')
+MIN_BYTES = 128
+LEVEL = 6
+BATCH_SIZE = 500
+
+COLUMNS = [
+    ('exercisehistory', ['ai_prompt', 'ai_generated_task_xml', 'ai_feedback_xml']),
+    ('recommendation', ['ai_prompt', 'generated_recommendations_xml']),
+    ('leveltest', ['ai_prompt', 'ai_generated_test_xml', 'ai_evaluation_xml']),
+]
+
+
+class AlterTextToCompressed(migrations.AlterField):
+    """
+    AlterField that casts with convert_to/convert_from on PostgreSQL: the
+    default text::bytea cast would treat backslashes as escapes.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._alter(app_label, schema_editor, to_state, "bytea USING convert_to({column}, 'UTF8')")
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        self._alter(app_label, schema_editor, to_state, "text USING convert_from({column}, 'UTF8')")
+
+    def _alter(self, app_label, schema_editor, state, type_sql):
+        model = state.apps.get_model(app_label, self.model_name)
+        qn = schema_editor.quote_name
+        column = qn(model._meta.get_field(self.name).column)
+        schema_editor.execute(
+            f'ALTER TABLE {qn(model._meta.db_table)} ALTER COLUMN {column} TYPE {type_sql.format(column=column)}'
+        )
+
+
+def _pack(raw):
+    return HEADER.pack(MAGIC, ZLIB, 0) + zlib.compress(raw, LEVEL)
+
+
+def _unpack(data):
+    _, codec, _ = HEADER.unpack_from(data)
+    if codec != ZLIB:
+        raise RuntimeError('zstd-compressed value: only zlib values can be restored by this migration')
+    return zlib.decompress(data[HEADER.size:])
+
+
+def _convert(apps, schema_editor, convert):
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    for model_name, fields in COLUMNS:
+        model = apps.get_model('learning', model_name)
+        table = qn(model._meta.db_table)
+        columns = [qn(model._meta.get_field(field).column) for field in fields]
+        last_id = 0
+        while True:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT id, {", ".join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s',
+                    [last_id, BATCH_SIZE],
+                )
+                rows = cursor.fetchall()
+                for pk, *values in rows:
+                    changes = {}
+                    for column, value in zip(columns, values):
+                        if value is None:
+                            continue
+                        data = value.encode('utf-8') if isinstance(value, str) else bytes(value)
+                        converted = convert(connection, data)
+                        if converted is not None:
+                            changes[column] = converted
+                    if changes:
+                        assignments = ', '.join(f'{column} = %s' for column in changes)
+                        cursor.execute(f'UPDATE {table} SET {assignments} WHERE id = %s', [*changes.values(), pk])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+
+def _compress(connection, data):
+    if len(data) < MIN_BYTES or data[:2] == MAGIC:
+        return None
+    return connection.Database.Binary(_pack(data))
+
+
+def _decompress(connection, data):
+    if data[:2] != MAGIC:
+        return None
+    raw = _unpack(data)
+    # The column is still bytea on PostgreSQL here; elsewhere it goes back to text
+    return connection.Database.Binary(raw) if connection.vendor == 'postgresql' else raw.decode('utf-8')
+
+
+def compress_rows(apps, schema_editor):
+    _convert(apps, schema_editor, _compress)
+
+
+def decompress_rows(apps, schema_editor):
+    _convert(apps, schema_editor, _decompress)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('learning', '0003_pregeneratedtask_leveltestbankentry'),
+    ]
+
+    operations = [
+        AlterTextToCompressed(
+            model_name='exercisehistory',
+            name='ai_prompt',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='exercisehistory',
+            name='ai_generated_task_xml',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='exercisehistory',
+            name='ai_feedback_xml',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='recommendation',
+            name='ai_prompt',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='recommendation',
+            name='generated_recommendations_xml',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='leveltest',
+            name='ai_prompt',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='leveltest',
+            name='ai_generated_test_xml',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        AlterTextToCompressed(
+            model_name='leveltest',
+            name='ai_evaluation_xml',
+            field=learning.fields.CompressedTextField(blank=True),
+        ),
+        # Reversed first on the way back, so convert_from sees plain UTF-8
+        migrations.RunPython(compress_rows, decompress_rows),
+    ]
@@ -0,0 +1,30 @@
+# Cold storage of archived exercise history columns (learning/archive.py).
+
+import django.db.models.deletion
+import learning.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0004_compress_ai_text_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', learning.fields.CompressedTextField(blank=True)),
+                ('segment', models.CharField(blank=True, max_length=255)),
+                ('offset', models.BigIntegerField(blank=True, null=True)),
+                ('length', models.IntegerField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('exercise', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='learning.exercisehistory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Calibrated item bank for the adaptive (IRT) placement test (learning/adaptive_test.py).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0006_gradingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdaptiveTestItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(max_length=10)),
+                ('question', models.TextField()),
+                ('options', models.JSONField(blank=True, default=list)),
+                ('correct_answer', models.CharField(max_length=500)),
+                ('discrimination', models.FloatField(default=1.0)),
+                ('difficulty', models.FloatField(default=0.0)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Maintained rating counters (learning/rating_stats.py): one row per user and
+# rating type, plus one global row per type (user is NULL).
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0008_usercontextsnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_type', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('value_1', models.IntegerField(default=0)),
+                ('value_2', models.IntegerField(default=0)),
+                ('value_3', models.IntegerField(default=0)),
+                ('value_4', models.IntegerField(default=0)),
+                ('value_5', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rating_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'rating_type'), name='rating_aggregate_user_type'), models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('rating_type',), name='rating_aggregate_global_type')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Records which bank entry a level test was served from, so the bank can skip
+# entries a learner has already seen (learning/level_test_bank.py).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0009_ratingaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leveltest',
+            name='bank_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='level_tests', to='learning.leveltestbankentry'),
+        ),
+    ]
@@ -1,6 +1,11 @@
 # language: python
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from .fields import CompressedTextField
 
 class LessonStatus(models.TextChoices):
     COMPLETED = 'completed', 'Completed'
@@ -54,4 +59,259 @@ class Progress(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.lesson.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.lesson.title}"
+
+class TaskType(models.TextChoices):
+    MULTIPLE_CHOICE = 'multiple_choice', 'Multiple Choice'
+    DIALOGUE = 'dialogue', 'Dialogue'
+    FREE_TEXT = 'free_text', 'Free Text'
+    MATCHING = 'matching', 'Matching'
+    FILL_BLANK = 'fill_blank', 'Fill in the Blank'
+
+class CompletionStatus(models.TextChoices):
+    COMPLETED = 'completed', 'Completed'
+    FAILED = 'failed', 'Failed'
+    PARTIAL = 'partial', 'Partial'
+    IN_PROGRESS = 'in_progress', 'In Progress'
+
+class ExerciseHistory(models.Model):
+    """
+    One attempt at an AI-generated task: the task XML, the user's submission and the AI feedback.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="exercise_history")
+    task_type = models.CharField(max_length=50, choices=TaskType.choices)
+    ai_prompt = CompressedTextField(blank=True)
+    ai_generated_task_xml = CompressedTextField(blank=True)
+    user_submission_raw = models.TextField(blank=True)
+    user_submission_parsed = models.JSONField(default=dict, blank=True)
+    ai_feedback_xml = CompressedTextField(blank=True)
+    result_score = models.FloatField(null=True, blank=True)
+    attempt_timestamp = models.DateTimeField(default=timezone.now)
+    completion_status = models.CharField(max_length=20, choices=CompletionStatus.choices, default=CompletionStatus.IN_PROGRESS)
+    parsed_task = models.JSONField(default=dict, blank=True)
+    parsed_feedback = models.JSONField(default=dict, blank=True)
+    parse_errors = models.JSONField(default=list, blank=True)
+    user_feedback_notes = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        # Keyset pagination (learning/pagination.py) seeks on (attempt_timestamp, id)
+        # within a user, optionally filtered by task type or status
+        indexes = [
+            models.Index(fields=['user', 'attempt_timestamp', 'id'], name='exhist_user_ts_idx'),
+            models.Index(fields=['user', 'task_type', 'attempt_timestamp', 'id'], name='exhist_user_type_ts_idx'),
+            models.Index(fields=['user', 'completion_status', 'attempt_timestamp', 'id'], name='exhist_user_status_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.task_type} #{self.id}"
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recommendations")
+    ai_prompt = CompressedTextField(blank=True)
+    generated_recommendations_xml = CompressedTextField(blank=True)
+    rating = models.IntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Recommendation {self.id} for {self.user.username}"
+
+class Rating(models.Model):
+    """
+    User rating (1-5) of a task, a recommendation or the overall experience.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ratings")
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    rating_type = models.CharField(max_length=50)
+    value = models.IntegerField()
+    ai_feedback_xml = models.TextField(blank=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.rating_type}={self.value} by {self.user.username}"
+
+class ExperienceSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="experience")
+    total_xp = models.IntegerField(default=0)
+    completed_exercises = models.IntegerField(default=0)
+    session_logs = models.JSONField(default=list, blank=True)
+    skill_tree_json = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Experience of {self.user.username}: {self.total_xp} XP"
+
+class LevelTest(models.Model):
+    """
+    AI-generated placement test and its evaluation.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="level_tests")
+    test_type = models.CharField(max_length=50, default='initial')
+    ai_prompt = CompressedTextField(blank=True)
+    ai_generated_test_xml = CompressedTextField(blank=True)
+    user_answers = models.JSONField(default=dict, blank=True)
+    ai_evaluation_xml = CompressedTextField(blank=True)
+    determined_level = models.CharField(max_length=10, blank=True)
+    total_score = models.FloatField(null=True, blank=True)
+    completed = models.BooleanField(default=False)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # Set when the test was served from the bank (learning/level_test_bank.py)
+    bank_entry = models.ForeignKey('LevelTestBankEntry', on_delete=models.SET_NULL, null=True, blank=True, related_name="level_tests")
+
+    def __str__(self):
+        return f"{self.test_type} test of {self.user.username} #{self.id}"
+
+class PregeneratedTask(models.Model):
+    """
+    Validated AI task waiting in the pool for a (task_type, level) bucket.
+    """
+    task_type = models.CharField(max_length=50)
+    level = models.CharField(max_length=10)
+    ai_prompt = CompressedTextField(blank=True)
+    ai_generated_task_xml = CompressedTextField()
+    parsed_task = models.JSONField(default=dict)
+    content_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task_type', 'level', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_type}/{self.level} #{self.id}"
+
+class GradingJobStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+class GradingJob(models.Model):
+    """
+    Queued submission grading, drained by manage.py run_grading_workers.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="grading_jobs")
+    exercise = models.ForeignKey('ExerciseHistory', on_delete=models.CASCADE, related_name="grading_jobs")
+    user_solution = models.TextField()
+    status = models.CharField(max_length=20, choices=GradingJobStatus.choices, default=GradingJobStatus.QUEUED)
+    attempts = models.IntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    http_status = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # One submission per exercise in the queue: a second one would grade (and award XP) twice
+            models.UniqueConstraint(
+                fields=['exercise'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='grading_job_active_exercise',
+            ),
+        ]
+
+    def __str__(self):
+        return f"GradingJob {self.id} ({self.status})"
+
+class LevelTestBankEntry(models.Model):
+    """
+    Pre-generated, validated level test handed out by LevelTestView instead of a live LLM call.
+    """
+    test_type = models.CharField(max_length=50)
+    test_xml = CompressedTextField()
+    ai_prompt = CompressedTextField(blank=True)
+    parsed_test = models.JSONField(default=dict)
+    content_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['test_type', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.test_type} test #{self.id}"
+
+class AdaptiveTestItem(models.Model):
+    """
+    Calibrated placement-test item (2PL IRT): discrimination a, difficulty b on the ability scale.
+    """
+    level = models.CharField(max_length=10)
+    question = models.TextField()
+    options = models.JSONField(default=list, blank=True)
+    correct_answer = models.CharField(max_length=500)
+    discrimination = models.FloatField(default=1.0)
+    difficulty = models.FloatField(default=0.0)
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.level} item #{self.id} (a={self.discrimination:.2f}, b={self.difficulty:.2f})"
+
+class UserContextSnapshot(models.Model):
+    """
+    Denormalized learner context (recent attempts per type, rolling scores,
+    error categories, streak), maintained incrementally on the task write path.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="context_snapshot")
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Context snapshot for {self.user.username}"
+
+class ExerciseArchive(models.Model):
+    """
+    Cold copy of an archived attempt's bulky columns (learning/archive.py):
+    either a compressed JSON payload or the location of its record in an NDJSON segment file.
+    """
+    exercise = models.OneToOneField('ExerciseHistory', on_delete=models.CASCADE, related_name="archive")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="exercise_archives")
+    payload = CompressedTextField(blank=True)
+    segment = models.CharField(max_length=255, blank=True)
+    offset = models.BigIntegerField(null=True, blank=True)
+    length = models.IntegerField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive of exercise {self.exercise_id}"
+
+class RatingAggregate(models.Model):
+    """
+    Rolling rating statistics per (user, rating_type); user NULL is the global row.
+    Maintained with F() updates on every rating write (learning/rating_stats.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="rating_aggregates")
+    rating_type = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    value_1 = models.IntegerField(default=0)
+    value_2 = models.IntegerField(default=0)
+    value_3 = models.IntegerField(default=0)
+    value_4 = models.IntegerField(default=0)
+    value_5 = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rating_type'], name='rating_aggregate_user_type'),
+            models.UniqueConstraint(fields=['rating_type'], condition=models.Q(user__isnull=True), name='rating_aggregate_global_type'),
+        ]
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        return {value: getattr(self, f'value_{value}') for value in range(1, 6)}
+
+    def __str__(self):
+        return f"{self.rating_type} ratings of {self.user_id or 'all users'}: {self.count}"
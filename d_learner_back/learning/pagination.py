@@ -0,0 +1,92 @@
+"""
+Keyset (seek) pagination for exercise history listings.
+
+Pages are ordered by (attempt_timestamp, id) descending and the cursor is
+the key of the last row returned, so fetching page N is an index range scan
+starting at that key instead of an OFFSET over all previous rows; latency
+stays flat no matter how deep a learner's history goes. The seek is written
+as a row-value comparison, (attempt_timestamp, id) < (%s, %s), which the
+planner turns into one range scan of the composite (user, attempt_timestamp,
+id) index; the equivalent OR of two predicates is not used as an index bound.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    timestamp_field = 'attempt_timestamp'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, settings.HISTORY_PAGE_SIZE))
+        except ValueError:
+            size = settings.HISTORY_PAGE_SIZE
+        return max(1, min(size, settings.HISTORY_MAX_PAGE_SIZE))
+
+    def encode_cursor(self, timestamp, pk):
+        raw = f'{timestamp.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, TypeError):
+            raise NotFound('Invalid cursor')
+
+    def seek(self, queryset, timestamp, pk):
+        """Condition (timestamp_field, pk) < (timestamp, pk) as a row-value comparison."""
+        opts = queryset.model._meta
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        field = opts.get_field(self.timestamp_field)
+        sql = f'({table}.{qn(field.column)}, {table}.{qn(opts.pk.column)}) < (%s, %s)'
+        params = (field.get_db_prep_value(timestamp, connection), pk)
+        return RawSQL(sql, params, output_field=BooleanField())
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.timestamp_field
+        queryset = queryset.order_by(f'-{field}', '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.seek(queryset, timestamp, pk))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = self.encode_cursor(getattr(rows[-1], field), rows[-1].pk) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,219 @@
+"""
+Prompt assembly under a per-call-type token budget.
+
+Learner context no longer grows with history: the per-user snapshot
+(learning/context_snapshot.py) is turned into small context items (profile
+header, per-type history summary, frequent errors, recent attempts), each
+ranked by how relevant it is to the call type and task type, and the best
+items are packed greedily into PROMPT_TOKEN_BUDGETS[call_type] minus what the
+instructions already use. Tokens are estimated locally (no tokenizer
+dependency): ~4 characters per word piece, punctuation counted separately,
+which over-estimates BPE counts slightly for German text.
+
+History beyond the recent window is covered by a rolling summary kept in
+ExperienceSummary.skill_tree_json['history_summary'] and refreshed every
+PROMPT_SUMMARY_REFRESH_EVERY attempts; session_logs entries older than the
+last PROMPT_SESSION_LOGS_KEEP are folded into one summary entry at the head.
+The summary is computed locally from the snapshot aggregates, not by an LLM
+call. Prompt sizes per call type are recorded by llm_client (get_stats()).
+"""
+import logging
+import re
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import context_snapshot, response_cache
+from .models import ExperienceSummary
+
+logger = logging.getLogger('learning')
+
+_TOKEN_RE = re.compile(r'\w{1,4}|[^\w\s]')
+
+# Relevance of each kind of context item per call type (0 = never included)
+RELEVANCE = {
+    'generate_task': {'summary_same': 0.9, 'summary_other': 0.3, 'errors': 0.8, 'recent_same': 1.0, 'recent_other': 0.2},
+    'grade_submission': {'summary_same': 0.6, 'summary_other': 0.1, 'errors': 1.0, 'recent_same': 0.7, 'recent_other': 0.0},
+    'generate_recommendations': {'summary_same': 0.8, 'summary_other': 0.8, 'errors': 1.0, 'recent_same': 0.4, 'recent_other': 0.4},
+    'generate_level_test': {'summary_same': 0.8, 'summary_other': 0.8, 'errors': 0.6, 'recent_same': 0.0, 'recent_other': 0.0},
+}
+DEFAULT_RELEVANCE = RELEVANCE['generate_task']
+
+# Rendering order of the selected items
+SECTIONS = ('header', 'summary', 'errors', 'recent')
+
+
+def estimate_tokens(text):
+    return len(_TOKEN_RE.findall(text or ''))
+
+
+def budget_for(call_type):
+    return settings.PROMPT_TOKEN_BUDGETS.get(call_type, settings.PROMPT_TOKEN_BUDGET_DEFAULT)
+
+
+def summarize(snapshot):
+    """Rolling summary of the whole history from the snapshot aggregates."""
+    by_type = {}
+    for task_type, scores in snapshot['scores'].items():
+        avg, ema = scores.get('avg'), scores.get('ema')
+        trend = 'steady'
+        if avg is not None and ema is not None and abs(ema - avg) >= 0.05:
+            trend = 'improving' if ema > avg else 'declining'
+        by_type[task_type] = {'graded': scores['count'], 'avg': avg, 'recent': ema, 'trend': trend}
+    errors = sorted(snapshot['error_categories'].items(), key=lambda item: (-item[1], item[0]))
+    return {
+        'attempts': snapshot['totals']['attempts'],
+        'graded': snapshot['totals']['graded'],
+        'completed': snapshot['totals']['completed'],
+        'by_type': by_type,
+        'weak_areas': [{'category': category, 'count': count} for category, count in errors[:10]],
+        'best_streak': snapshot['streak']['best'],
+        'updated_at': timezone.now().isoformat(),
+    }
+
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.2f}'
+
+
+def context_items(snapshot, summary, call_type, task_type=None, profile=None):
+    """[(relevance, section, text)] for this call; the header is always included."""
+    weights = RELEVANCE.get(call_type, DEFAULT_RELEVANCE)
+    totals = snapshot['totals']
+    header = f'Learner: {totals["attempts"]} attempts, {totals["graded"]} graded, {totals["completed"]} completed'
+    if profile:
+        header = f'Level {profile["language_level"]}. ' + header
+    header += f'; streak {snapshot["streak"]["current"]} days (best {snapshot["streak"]["best"]}).'
+    items = [(float('inf'), 'header', header)]
+
+    for stats_type, stats in summary['by_type'].items():
+        weight = weights['summary_same' if stats_type == task_type else 'summary_other']
+        text = (f'{stats_type}: {stats["graded"]} graded, avg {_fmt(stats["avg"])}, '
+                f'recent {_fmt(stats["recent"])} ({stats["trend"]}).')
+        items.append((weight, 'summary', text))
+
+    weak = summary['weak_areas']
+    top = weak[0]['count'] if weak else 1
+    for area in weak:
+        items.append((weights['errors'] * (0.5 + 0.5 * area['count'] / top), 'errors',
+                      f'Frequent error: {area["category"]} ({area["count"]}x).'))
+
+    for attempt_type, attempts in snapshot['recent_by_type'].items():
+        weight = weights['recent_same' if attempt_type == task_type else 'recent_other']
+        for rank, attempt in enumerate(attempts):
+            items.append((weight * (1 - 0.1 * rank), 'recent',
+                          f'{attempt_type} #{attempt["id"]}: {attempt["status"]}, score {_fmt(attempt["score"])}, '
+                          f'{(attempt["at"] or "")[:10]}.'))
+    return [item for item in items if item[0] > 0]
+
+
+def fit(items, budget):
+    """Greedily keep the most relevant items whose estimated tokens fit the budget."""
+    selected, used = [], 0
+    for index, (relevance, section, text) in sorted(enumerate(items), key=lambda pair: -pair[1][0]):
+        cost = estimate_tokens(text) + 1
+        if used + cost <= budget or relevance == float('inf'):
+            selected.append((SECTIONS.index(section), index, text))
+            used += cost
+    return [text for _, _, text in sorted(selected)]
+
+
+def render(snapshot, summary, call_type, budget, task_type=None, profile=None):
+    return '\n'.join(fit(context_items(snapshot, summary, call_type, task_type, profile), budget))
+
+
+def _fold_session_logs(logs):
+    keep = settings.PROMPT_SESSION_LOGS_KEEP
+    if not isinstance(logs, list) or len(logs) <= keep + 1:
+        return logs
+    head, older, recent = None, logs[:-keep], logs[-keep:]
+    if isinstance(older[0], dict) and older[0].get('type') == 'summary':
+        head, older = older[0], older[1:]
+    folded = {'type': 'summary', 'sessions': (head or {}).get('sessions', 0) + len(older)}
+    stamps = [e.get('timestamp') or e.get('date') or e.get('at') for e in older if isinstance(e, dict)]
+    stamps = [s for s in stamps if s]
+    folded['until'] = max(stamps) if stamps else (head or {}).get('until')
+    return [folded] + recent
+
+
+def refresh_summary(user_id, snapshot):
+    """
+    Stored rolling summary, recomputed when PROMPT_SUMMARY_REFRESH_EVERY new
+    attempts arrived. No row lock: the refresh is a conditional UPDATE keyed
+    on updated_at, so when another writer changed the row in between, this
+    refresh is dropped (the summary is still returned for this prompt) and
+    the next stale read recomputes it.
+    """
+    exp = (
+        ExperienceSummary.objects
+        .only('id', 'session_logs', 'skill_tree_json', 'updated_at')
+        .filter(user_id=user_id).first()
+    )
+    if exp is None:
+        return summarize(snapshot)
+    tree = exp.skill_tree_json if isinstance(exp.skill_tree_json, dict) else {}
+    current = tree.get('history_summary')
+    if current and snapshot['totals']['attempts'] - current.get('attempts', 0) < settings.PROMPT_SUMMARY_REFRESH_EVERY:
+        return current
+    tree['history_summary'] = summary = summarize(snapshot)
+    refreshed = ExperienceSummary.objects.filter(pk=exp.pk, updated_at=exp.updated_at).update(
+        skill_tree_json=tree,
+        session_logs=_fold_session_logs(exp.session_logs),
+        updated_at=timezone.now(),
+    )
+    if refreshed:
+        # QuerySet.update() sends no post_save, invalidate cached responses explicitly
+        response_cache.bump_on_commit(user_id)
+    return summary
+
+
+def build_context(user, call_type, task_type=None, reserved=0):
+    """Learner context text for a prompt whose fixed parts already use `reserved` tokens."""
+    snapshot = context_snapshot.get(user.id)
+    summary = refresh_summary(user.id, snapshot)
+    profile = {'language_level': user.profile.language_level}
+    return render(snapshot, summary, call_type, max(0, budget_for(call_type) - reserved), task_type, profile)
+
+
+class _PromptStats:
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self.window = window
+        self.tokens = {}
+
+    def record(self, call_type, tokens):
+        with self._lock:
+            self.tokens.setdefault(call_type, deque(maxlen=self.window)).append(tokens)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for call_type, values in self.tokens.items():
+                ordered = sorted(values)
+                result[call_type] = {
+                    'count': len(ordered),
+                    'budget': budget_for(call_type),
+                    'p50_tokens': ordered[len(ordered) // 2],
+                    'p95_tokens': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    'max_tokens': ordered[-1],
+                    'last_tokens': values[-1],
+                }
+            return result
+
+
+stats = _PromptStats()
+
+
+def record(call_type, messages):
+    """Record the estimated prompt size of a chat call."""
+    tokens = sum(estimate_tokens(m.get('content') if isinstance(m, dict) else str(m)) for m in messages)
+    stats.record(call_type, tokens)
+    if tokens > budget_for(call_type):
+        logger.info(f'{call_type} prompt ~{tokens} tokens exceeds its budget of {budget_for(call_type)}')
+    return tokens
+
+
+def get_stats():
+    return stats.snapshot()
@@ -0,0 +1,105 @@
+"""
+Rolling rating statistics (count, sum, 1-5 histogram) per user and rating
+type plus a global row per type, kept in RatingAggregate so overview
+endpoints read one row instead of scanning Rating.
+
+Call record()/record_many() in the same transaction as the Rating writes.
+A missing aggregate row is seeded from one aggregate query over the
+existing ratings (which already include the rows just written), so
+history from before the table existed is never lost.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Rating, RatingAggregate
+
+VALUES = range(1, 6)
+
+
+def aggregate(rating_type, user_id=None):
+    """count/total/histogram of a user's (or everyone's) ratings in a single query."""
+    qs = Rating.objects.filter(rating_type=rating_type)
+    if user_id is not None:
+        qs = qs.filter(user_id=user_id)
+    return qs.aggregate(
+        count=Count('id'),
+        total=Coalesce(Sum('value'), 0),
+        **{f'value_{v}': Count('id', filter=Q(value=v)) for v in VALUES},
+    )
+
+
+def _row(rating_type, user_id):
+    """(row, created); a created row already reflects the current ratings."""
+    lookup = {'rating_type': rating_type, 'user_id': user_id}
+    row = RatingAggregate.objects.filter(**lookup).first()
+    if row is not None:
+        return row, False
+    try:
+        with transaction.atomic():
+            return RatingAggregate.objects.create(**lookup, **aggregate(rating_type, user_id)), True
+    except IntegrityError:
+        # Created concurrently
+        return RatingAggregate.objects.get(**lookup), False
+
+
+def _apply(rating_type, user_id, changes):
+    """changes: Counter of value -> delta (+1 per new rating, -1 per removed one)."""
+    row, created = _row(rating_type, user_id)
+    if created:
+        return
+    updates = {
+        'count': F('count') + sum(changes.values()),
+        'total': F('total') + sum(value * delta for value, delta in changes.items()),
+    }
+    for value, delta in changes.items():
+        if value in VALUES and delta:
+            updates[f'value_{value}'] = F(f'value_{value}') + delta
+    RatingAggregate.objects.filter(pk=row.pk).update(**updates)
+
+
+def record_many(changes):
+    """changes: iterable of (user_id, rating_type, value, delta)."""
+    grouped = {}
+    for user_id, rating_type, value, delta in changes:
+        for key in ((rating_type, user_id), (rating_type, None)):
+            grouped.setdefault(key, Counter())[int(value)] += delta
+    # Fixed order keeps concurrent writers from deadlocking on the rows
+    for (rating_type, user_id), counter in sorted(grouped.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        _apply(rating_type, user_id, counter)
+
+
+def record(user_id, rating_type, value, delta=1):
+    record_many([(user_id, rating_type, value, delta)])
+
+
+def get(rating_type, user_id=None):
+    """dict with count, average and histogram (O(1): one indexed row)."""
+    row = RatingAggregate.objects.filter(rating_type=rating_type, user_id=user_id).first()
+    if row is None:
+        data = aggregate(rating_type, user_id)
+        count, total = data['count'], data['total']
+        histogram = {v: data[f'value_{v}'] for v in VALUES}
+    else:
+        count, total, histogram = row.count, row.total, row.histogram
+    return {'count': count, 'average': total / count if count else None, 'histogram': histogram}
+
+
+def rebuild():
+    """Recompute every aggregate row from Rating (repair / initial backfill)."""
+    with transaction.atomic():
+        RatingAggregate.objects.all().delete()
+        rating_types = Rating.objects.values_list('rating_type', flat=True).distinct()
+        rows = []
+        for rating_type in rating_types:
+            rows.append(RatingAggregate(rating_type=rating_type, user_id=None, **aggregate(rating_type)))
+            per_user = (
+                Rating.objects.filter(rating_type=rating_type).values('user_id')
+                .annotate(count=Count('id'), total=Coalesce(Sum('value'), 0),
+                          **{f'value_{v}': Count('id', filter=Q(value=v)) for v in VALUES})
+            )
+            rows += [RatingAggregate(rating_type=rating_type, **data) for data in per_user]
+        RatingAggregate.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,54 @@
+"""
+Redis connection for cross-worker coordination (throttling, admission
+control, single-flight locks).
+
+COORDINATION_REDIS_URL points at a dedicated, non-evicting Redis (the cache
+Redis runs volatile-lru and may drop keys under memory pressure); without it the
+django_redis cache connection is reused. Returns None when neither is
+available (DEBUG with LocMemCache); the throttle then keeps its buckets in the
+Django cache and admission control falls back to per-process state.
+check_configuration() logs which of these applies at startup.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger('learning')
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_connection():
+    global _client
+    if settings.COORDINATION_REDIS_URL:
+        with _lock:
+            if _client is None:
+                import redis
+                _client = redis.Redis.from_url(
+                    settings.COORDINATION_REDIS_URL,
+                    socket_timeout=settings.COORDINATION_REDIS_TIMEOUT,
+                    socket_connect_timeout=settings.COORDINATION_REDIS_TIMEOUT,
+                )
+        return _client
+    if settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    return None
+
+
+def check_configuration():
+    """Warn at startup when coordination is not on a dedicated Redis."""
+    if settings.COORDINATION_REDIS_URL:
+        return
+    if settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        logger.warning(
+            'COORDINATION_REDIS_URL is not set: throttle buckets and admission slots use the cache Redis, '
+            'whose keys may be evicted under memory pressure'
+        )
+    else:
+        logger.warning(
+            'COORDINATION_REDIS_URL is not set and the cache is not Redis: throttle buckets fall back to the '
+            'Django cache (not atomic) and admission control is enforced per process'
+        )
@@ -0,0 +1,145 @@
+"""
+Per-user response cache for read-heavy endpoints polled by the frontend.
+
+Every user has a generation counter in the shared cache; writes to any of
+the user's learning data bump it (learning/signals.py), which orphans all
+cached responses of that user at once - no key scanning or pattern deletes.
+Responses are stored under (endpoint, user, generation, variant).
+
+In front of the shared cache sits a small in-process L1 with a short TTL,
+so a polling client mostly costs no network round trip at all. Another
+process may serve an L1 entry up to RESPONSE_CACHE_L1_TTL seconds after a
+write; bumps made in this process drop the user's L1 entries immediately.
+Entries remember the generation they were built under (cached_entry), so
+validators such as ETags describe the body actually served.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger('learning')
+
+_l1 = {}
+_l1_lock = threading.Lock()
+_stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'bumps': 0}
+
+
+def _generation_key(user_id):
+    return f'respcache:gen:{user_id}'
+
+
+def _response_key(endpoint, user_id, generation, variant):
+    return f'respcache:{endpoint}:{user_id}:{generation}:{variant}'
+
+
+def _count(name):
+    with _l1_lock:
+        _stats[name] += 1
+
+
+def generation(user_id):
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        # Seed with a timestamp rather than 1: if the counter is ever evicted,
+        # the new generation still cannot collide with responses cached under an old one.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump(user_id):
+    """Invalidate every cached response of the user (O(1))."""
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+    with _l1_lock:
+        for l1_key in [k for k in _l1 if k[1] == user_id]:
+            del _l1[l1_key]
+        _stats['bumps'] += 1
+
+
+def bump_on_commit(user_id):
+    """Bump after the surrounding transaction commits, so readers never cache pre-commit data under the new generation."""
+    if user_id is not None:
+        transaction.on_commit(lambda: bump(user_id))
+
+
+def _l1_get(l1_key):
+    entry = _l1.get(l1_key)
+    if entry is None:
+        return None
+    expires, built_under, data = entry
+    if expires < time.monotonic():
+        _l1.pop(l1_key, None)
+        return None
+    return built_under, data
+
+
+def _l1_set(l1_key, built_under, data):
+    with _l1_lock:
+        if len(_l1) >= settings.RESPONSE_CACHE_L1_MAX_ENTRIES:
+            now = time.monotonic()
+            for k in [k for k, (expires, _, _) in _l1.items() if expires < now]:
+                del _l1[k]
+            if len(_l1) >= settings.RESPONSE_CACHE_L1_MAX_ENTRIES:
+                _l1.clear()
+        _l1[l1_key] = (time.monotonic() + settings.RESPONSE_CACHE_L1_TTL, built_under, data)
+
+
+def cached(endpoint, user_id, build, variant=''):
+    """
+    Return build() for (endpoint, user, variant), served from L1, then the
+    shared cache, computing and storing it on a miss. build must return
+    plain serializable data (serializer.data, dicts, lists).
+    """
+    return cached_entry(endpoint, user_id, build, variant)[0]
+
+
+def cached_entry(endpoint, user_id, build, variant=''):
+    """
+    Like cached(), but return (data, generation) where generation is the one
+    the data was stored under - older than the current one for an L1 entry
+    that outlived a bump in another process. None if the cache is unavailable.
+    """
+    l1_key = (endpoint, user_id, variant)
+    entry = _l1_get(l1_key)
+    if entry is not None:
+        _count('l1_hits')
+        built_under, data = entry
+        return data, built_under
+
+    try:
+        built_under = generation(user_id)
+        key = _response_key(endpoint, user_id, built_under, variant)
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning(f'Response cache unavailable for {endpoint}: {e}')
+        return build(), None
+
+    if data is not None:
+        _count('l2_hits')
+    else:
+        _count('misses')
+        data = build()
+        try:
+            cache.set(key, data, timeout=settings.RESPONSE_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f'Response cache store failed for {endpoint}: {e}')
+    _l1_set(l1_key, built_under, data)
+    return data, built_under
+
+
+def get_stats():
+    with _l1_lock:
+        stats = dict(_stats)
+        stats['l1_entries'] = len(_l1)
+    lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else None
+    return stats
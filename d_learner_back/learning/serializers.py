@@ -5,6 +5,7 @@ from .models import (
     UserProfile, Lesson, Progress, Assignment,
     ExerciseHistory, Recommendation, Rating, ExperienceSummary, LevelTest
 )
+from .sparse_fields import SparseFieldsetSerializerMixin
 
 # class RegistrationSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -110,8 +111,8 @@ class ProgressSerializer(serializers.ModelSerializer):
         fields = ['id', 'lesson', 'lesson_title', 'completed', 'errors_count', 'updated_at']
         read_only_fields = ['id', 'updated_at']
 
-class ExerciseHistorySerializer(serializers.ModelSerializer):
-    """Serializer for ExerciseHistory with validation."""
+class ExerciseHistorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Serializer for ExerciseHistory with validation; supports ?fields= / ?omit= on reads."""
 
     class Meta:
         model = ExerciseHistory
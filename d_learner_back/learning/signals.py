@@ -0,0 +1,41 @@
+"""
+Cache invalidation hooks: any write to a user's learning data bumps the
+user's response cache generation (see learning/response_cache.py).
+Note that QuerySet.update()/bulk_create() do not send these signals; code
+using them must call response_cache.bump_on_commit itself.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
+
+from . import response_cache
+
+# Models whose rows carry a direct user FK
+USER_MODELS = [
+    'learning.UserProfile',
+    'learning.Lesson',
+    'learning.ExerciseHistory',
+    'learning.Recommendation',
+    'learning.Rating',
+    'learning.ExperienceSummary',
+    'learning.LevelTest',
+]
+
+
+def _invalidate_user(sender, instance, **kwargs):
+    response_cache.bump_on_commit(getattr(instance, 'user_id', None))
+
+
+def _invalidate_lesson_owner(sender, instance, **kwargs):
+    # Assignments are listed inside LessonListCreateView
+    try:
+        response_cache.bump_on_commit(instance.lesson.user_id)
+    except ObjectDoesNotExist:
+        pass  # lesson deleted in the same cascade; its own signal bumps
+
+
+def connect():
+    for model in USER_MODELS:
+        post_save.connect(_invalidate_user, sender=model, dispatch_uid=f'respcache_save_{model}')
+        post_delete.connect(_invalidate_user, sender=model, dispatch_uid=f'respcache_delete_{model}')
+    post_save.connect(_invalidate_lesson_owner, sender='learning.Assignment', dispatch_uid='respcache_save_assignment')
+    post_delete.connect(_invalidate_lesson_owner, sender='learning.Assignment', dispatch_uid='respcache_delete_assignment')
@@ -0,0 +1,123 @@
+"""
+Single-flight coalescing of identical AI calls across workers.
+
+The first caller for a key takes a Redis lock and performs the call; the
+others subscribe to a per-key channel and wait (up to a deadline) for the
+leader's result instead of sending their own duplicate request. If the
+leader fails or the deadline passes, followers fall back to calling the
+provider themselves. The lock lives in the coordination Redis
+(learning/redis_conn.py); without one (DEBUG/LocMem) the coalescing is done
+in-process only.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from . import redis_conn
+
+logger = logging.getLogger('learning')
+
+KEY_PREFIX = 'deutschlearner:sf'
+
+# Deletes the lock only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def run(key, func, deadline=None):
+    """Return func() for this key, sharing one in-flight call among concurrent callers."""
+    deadline = deadline if deadline is not None else settings.SINGLE_FLIGHT_DEADLINE
+    conn = redis_conn.get_connection()
+    if conn is None:
+        return _local_run(key, func, deadline)
+    return _redis_run(conn, key, func, deadline)
+
+
+def _redis_run(conn, key, func, deadline):
+    lock_key = f'{KEY_PREFIX}:lock:{key}'
+    result_key = f'{KEY_PREFIX}:result:{key}'
+    channel = f'{KEY_PREFIX}:chan:{key}'
+    token = uuid.uuid4().hex
+    lock_ms = int(deadline * 1000)
+
+    if conn.set(lock_key, token, nx=True, px=lock_ms):
+        try:
+            result = func()
+        except Exception:
+            conn.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            conn.publish(channel, json.dumps({'failed': True}))
+            raise
+        payload = json.dumps({'result': result})
+        # Short-lived copy for followers that subscribe after the publish;
+        # written before the lock is released so they never see neither.
+        conn.set(result_key, payload, px=settings.SINGLE_FLIGHT_RESULT_TTL_MS)
+        conn.publish(channel, payload)
+        conn.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        return result
+
+    pubsub = conn.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    try:
+        stored = conn.get(result_key)
+        if stored is not None:
+            return json.loads(stored)['result']
+        until = time.monotonic() + deadline
+        while time.monotonic() < until:
+            message = pubsub.get_message(timeout=min(1.0, max(0.0, until - time.monotonic())))
+            if message is None:
+                if not conn.exists(lock_key):
+                    # Leader is gone; pick up its result if it just landed
+                    stored = conn.get(result_key)
+                    if stored is not None:
+                        return json.loads(stored)['result']
+                    break
+                continue
+            data = json.loads(message['data'])
+            if data.get('failed'):
+                break
+            return data['result']
+    finally:
+        pubsub.close()
+    logger.warning(f'Single-flight follower for {key} fell back to its own call')
+    return func()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _local_run(key, func, deadline):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if leader:
+        try:
+            flight.result = func()
+            return flight.result
+        except Exception:
+            flight.failed = True
+            raise
+        finally:
+            with _flights_lock:
+                _flights.pop(key, None)
+            flight.done.set()
+    if flight.done.wait(deadline) and not flight.failed:
+        return flight.result
+    return func()
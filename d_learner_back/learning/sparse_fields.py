@@ -0,0 +1,65 @@
+"""
+Sparse fieldsets: ?fields=a,b returns only those fields, ?omit=c,d drops
+fields. The view mixin builds the queryset with the matching .only(), so
+omitted columns (raw XML, prompts, parsed JSON) are never read from the
+database, not just left out of the JSON.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+def resolve(request, available, default=None):
+    """Field names to serialize for this request, in declaration order."""
+    available = list(available)
+    if request is None or request.method not in SAFE_METHODS:
+        return available
+    fields = _split(request.query_params.get('fields'))
+    omit = _split(request.query_params.get('omit'))
+    unknown = [name for name in fields + omit if name not in available]
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}'})
+    if fields:
+        selected = set(fields)
+    elif default and not omit:
+        selected = set(default)
+    else:
+        selected = set(available)
+    return [name for name in available if name in selected and name not in omit]
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer side: drops fields not selected by resolve()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = resolve(self.context.get('request'), self.fields.keys(), self.context.get('default_fields'))
+        for name in set(self.fields.keys()) - set(selected):
+            self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    View side: passes default_fields (compact representation when neither
+    ?fields nor ?omit is given) to the serializer and restricts the loaded
+    columns. always_load keeps the primary key and pagination keys.
+    """
+    default_fields = None
+    always_load = ('id', 'attempt_timestamp')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['default_fields'] = self.default_fields
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        selected = resolve(self.request, self.get_serializer_class().Meta.fields, self.default_fields)
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = [name for name in list(self.always_load) + selected if name in concrete]
+        return queryset.only(*dict.fromkeys(columns))
@@ -0,0 +1,181 @@
+"""
+Server-sent-event streaming of AI task generation.
+
+LLM tokens are forwarded as they arrive, and the task XML is parsed
+incrementally so every question element is emitted as soon as it closes.
+The complete XML is still validated with xml_parsers and persisted to
+ExerciseHistory when the stream ends.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+
+try:
+    from lxml.etree import XMLPullParser, XMLSyntaxError as XMLStreamError, tostring
+except ImportError:  # lxml is optional, fall back to stdlib
+    from xml.etree.ElementTree import XMLPullParser, ParseError as XMLStreamError, tostring
+
+from .async_views import AsyncAIView
+from .models import ExerciseHistory, TaskType, CompletionStatus, UserProfile
+from . import ai_service, xml_parsers, llm_client, context_snapshot
+from .audit import log_audit
+from .monitoring import MonitoringMetrics
+
+logger = logging.getLogger('learning')
+
+QUESTION_TAGS = {'question', 'item'}
+
+
+class IncrementalTaskParser:
+    """
+    Feeds XML chunks and returns question elements as soon as they are closed.
+    Only outermost ones are returned: items nested in a question arrive with it.
+    """
+
+    def __init__(self, question_tags=QUESTION_TAGS):
+        self.question_tags = question_tags
+        self.parser = XMLPullParser(events=('start', 'end'))
+        self.depth = 0  # open question elements
+        self.started = False
+        self.failed = None
+        self.chunks = []
+
+    def feed(self, chunk):
+        self.chunks.append(chunk)
+        if self.failed:
+            return []
+        if not self.started:
+            # Skip any preamble the model emits before the root element
+            buffered = ''.join(self.chunks)
+            start = buffered.find('<')
+            if start < 0:
+                return []
+            self.started = True
+            chunk = buffered[start:]
+        try:
+            self.parser.feed(chunk)
+            closed = []
+            for event, elem in self.parser.read_events():
+                if _local_name(elem.tag) not in self.question_tags:
+                    continue
+                if event == 'start':
+                    self.depth += 1
+                    continue
+                self.depth -= 1
+                if not self.depth:
+                    closed.append(tostring(elem, encoding='unicode'))
+            return closed
+        except XMLStreamError as e:
+            # Keep streaming tokens; strict parsing of the full XML reports the error
+            self.failed = str(e)
+            return []
+
+    @property
+    def text(self):
+        buffered = ''.join(self.chunks)
+        start = buffered.find('<')
+        return buffered[start:] if start > 0 else buffered
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class AIGenerateTaskStreamView(AsyncAIView):
+    """
+    POST /learning/ai/generate-task/stream/
+    Same input as AIGenerateTaskView; responds with text/event-stream events:
+    token, question, done (task_id, parsed_task) or error.
+    """
+    throttle_scope = 'ai-generate'
+
+    async def post(self, request):
+        task_type = request.data.get('task_type')
+        desired_difficulty = request.data.get('desired_difficulty')
+
+        if not task_type:
+            return JsonResponse({'error': 'task_type is required'}, status=400)
+        if task_type not in [t.value for t in TaskType]:
+            return JsonResponse({
+                'error': f'Invalid task_type. Must be one of: {[t.value for t in TaskType]}'
+            }, status=400)
+        if not desired_difficulty:
+            profile = await UserProfile.objects.only('language_level').aget(user=request.user)
+            desired_difficulty = profile.language_level
+
+        build_prompt = getattr(ai_service, 'build_task_prompt', None)
+        if build_prompt is None:
+            return JsonResponse({'error': 'Streaming task generation is not available'}, status=501)
+        try:
+            prompt = await sync_to_async(build_prompt)(
+                user=request.user,
+                task_type=task_type,
+                desired_difficulty=desired_difficulty
+            )
+        except Exception as e:
+            MonitoringMetrics.record_ai_failure('generate_task', str(e), request.user.id)
+            logger.exception(f'Error building streaming task prompt: {e}')
+            return JsonResponse({'error': 'AI task generation failed', 'details': str(e)}, status=503)
+        response = StreamingHttpResponse(
+            self._events(request.user, task_type, desired_difficulty, prompt),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+        return response
+
+    async def _events(self, user, task_type, difficulty, prompt):
+        parser = IncrementalTaskParser()
+        emitted = 0
+        try:
+            async for token in llm_client.astream_chat_completion(
+                [{'role': 'user', 'content': prompt}], call_type='generate_task'
+            ):
+                yield _sse('token', {'text': token})
+                for question_xml in parser.feed(token):
+                    yield _sse('question', {'index': emitted, 'xml': question_xml})
+                    emitted += 1
+        except llm_client.LLMError as e:
+            MonitoringMetrics.record_ai_failure('generate_task', str(e), user.id)
+            logger.warning(f'Streaming task generation failed for {user.username}: {e}')
+            yield _sse('error', {'error': 'AI task generation failed', 'details': str(e)})
+            return
+
+        task_xml = parser.text
+        parse_errors = []
+        try:
+            parsed_task = xml_parsers.parse_task_xml(task_type, task_xml)
+        except xml_parsers.ParseError as e:
+            parsed_task = {}
+            parse_errors.append(str(e))
+            MonitoringMetrics.record_xml_parse_error(task_type, task_xml, str(e))
+        exercise = await ExerciseHistory.objects.acreate(
+            user=user,
+            task_type=task_type,
+            ai_prompt=prompt,
+            ai_generated_task_xml=task_xml,
+            parsed_task=parsed_task,
+            parse_errors=parse_errors,
+            completion_status=CompletionStatus.IN_PROGRESS
+        )
+        await sync_to_async(context_snapshot.record_attempt)(exercise, created=True)
+        await sync_to_async(log_audit)('ai_generate_task', user.id, {
+            'task_type': task_type,
+            'exercise_id': exercise.id,
+            'parse_errors': parse_errors,
+            'streamed': True,
+        })
+        yield _sse('done', {
+            'task_id': exercise.id,
+            'task_type': task_type,
+            'difficulty': difficulty,
+            'questions': emitted,
+            'parsed_task': parsed_task,
+            'parse_errors': parse_errors,
+        })
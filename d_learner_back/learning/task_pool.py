@@ -0,0 +1,156 @@
+"""
+Pool of pre-generated, pre-parsed AI tasks per (task_type, CEFR level).
+
+A background refill worker (manage.py refill_task_pool) keeps every bucket
+between TASK_POOL_LOW_WATER and TASK_POOL_HIGH_WATER entries; the generate
+endpoints pop from the pool and only fall back to a live LLM call on a miss.
+Refills bypass the LLM cache and skip tasks whose XML is already pooled, so
+a bucket never holds the same task twice.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import PregeneratedTask, TaskType
+from . import ai_service, llm_cache, xml_parsers
+
+logger = logging.getLogger('learning')
+
+CEFR_LEVELS = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+
+
+def _metric_key(kind, task_type, level):
+    return f'task_pool:{kind}:{task_type}:{level}'
+
+
+def _incr(key):
+    # add() is a no-op if the key exists, so incr() never hits a missing key
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def _fresh(qs):
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_POOL_TTL_SECONDS)
+    return qs.filter(created_at__gte=cutoff)
+
+
+def pop_task(task_type, level):
+    """Claim the oldest fresh task of the bucket, or None if the pool is empty."""
+    level = (level or '').upper()
+    if level not in CEFR_LEVELS:
+        return None
+    with transaction.atomic():
+        task = (
+            _fresh(PregeneratedTask.objects.filter(task_type=task_type, level=level))
+            .select_for_update(skip_locked=True)
+            .order_by('created_at')
+            .first()
+        )
+        if task is not None:
+            task.delete()
+    _incr(_metric_key('hits' if task else 'misses', task_type, level))
+    return task
+
+
+def generate_one(task_type, level):
+    """Generate and validate one task for the pool. Returns the saved entry, or None if invalid or a duplicate."""
+    pool_user, _ = User.objects.get_or_create(username=settings.TASK_POOL_USERNAME)
+    # Same prompt for every task of a bucket: a cached response would be a duplicate
+    with llm_cache.bypass():
+        result = ai_service.generate_task_xml(user=pool_user, task_type=task_type, desired_difficulty=level)
+    if 'error' in result:
+        logger.warning(f'Task pool generation failed for {task_type}/{level}: {result["error"]}')
+        return None
+    try:
+        parsed_task = xml_parsers.parse_task_xml(task_type, result['xml'])
+    except xml_parsers.ParseError as e:
+        # Only tasks that parse cleanly go into the pool
+        logger.warning(f'Task pool discarded unparsable {task_type}/{level} task: {e}')
+        return None
+    content_hash = hashlib.sha256(result['xml'].strip().encode('utf-8')).hexdigest()
+    task, created = PregeneratedTask.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={
+            'task_type': task_type,
+            'level': level,
+            'ai_prompt': result.get('prompt_used', ''),
+            'ai_generated_task_xml': result['xml'],
+            'parsed_task': parsed_task,
+        }
+    )
+    if not created:
+        logger.info(f'Task pool discarded duplicate {task_type}/{level} task')
+        return None
+    return task
+
+
+def expire_stale():
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_POOL_TTL_SECONDS)
+    deleted, _ = PregeneratedTask.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def bucket_sizes():
+    rows = (
+        _fresh(PregeneratedTask.objects.all())
+        .values('task_type', 'level')
+        .annotate(n=Count('id'))
+    )
+    return {(r['task_type'], r['level']): r['n'] for r in rows}
+
+
+def refill(max_per_bucket=None):
+    """Top up every bucket that fell below the low-water mark. Returns number of tasks added."""
+    sizes = bucket_sizes()
+    added = 0
+    for task_type in [t.value for t in TaskType]:
+        for level in CEFR_LEVELS:
+            size = sizes.get((task_type, level), 0)
+            if size >= settings.TASK_POOL_LOW_WATER:
+                continue
+            wanted = settings.TASK_POOL_HIGH_WATER - size
+            if max_per_bucket:
+                wanted = min(wanted, max_per_bucket)
+            for _ in range(wanted):
+                try:
+                    if generate_one(task_type, level):
+                        added += 1
+                except Exception as e:
+                    logger.exception(f'Task pool refill error for {task_type}/{level}: {e}')
+                    break
+    return added
+
+
+def get_stats():
+    sizes = bucket_sizes()
+    buckets = {}
+    total_hits = total_misses = 0
+    for task_type in [t.value for t in TaskType]:
+        for level in CEFR_LEVELS:
+            hits = cache.get(_metric_key('hits', task_type, level), 0)
+            misses = cache.get(_metric_key('misses', task_type, level), 0)
+            total_hits += hits
+            total_misses += misses
+            buckets[f'{task_type}/{level}'] = {
+                'size': sizes.get((task_type, level), 0),
+                'hits': hits,
+                'misses': misses,
+            }
+    lookups = total_hits + total_misses
+    return {
+        'low_water': settings.TASK_POOL_LOW_WATER,
+        'high_water': settings.TASK_POOL_HIGH_WATER,
+        'ttl_seconds': settings.TASK_POOL_TTL_SECONDS,
+        'hit_ratio': (total_hits / lookups) if lookups else None,
+        'buckets': buckets,
+    }
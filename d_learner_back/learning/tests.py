@@ -1,9 +1,82 @@
 # language: python
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import skipUnless
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.views import APIView
 from rest_framework import status
 from django.contrib.auth.models import User
 
+from . import single_flight, streaming, grading, level_test_bank, llm_cache, task_pool, grading_jobs, local_grader, adaptive_test, context_snapshot, response_cache, sparse_fields, compression, archive, rating_stats, redis_conn, throttling, admission, idempotency, llm_client, llm_router, prompt_budget
+from .async_views import AIThreadPoolMixin
+from .models import UserProfile, Lesson, ExerciseHistory, ExperienceSummary, LevelTest, LevelTestBankEntry, GradingJob, GradingJobStatus, CompletionStatus
+
+
+def _take_tokens(key, attempts, results):
+    redis_conn._client = None  # never share the parent's socket after fork
+    results.put(sum(throttling.take(key, 50, 50 / 86400)[0] for _ in range(attempts)))
+
+
+class StubLLMServer:
+    """
+    Local chat-completions stub with injectable latency; counts requests.
+    statuses are returned by the first requests (then 200); raw replaces the JSON body.
+    """
+
+    def __init__(self, delay=0.0, content='<task/>', statuses=(), raw=None):
+        self.delay = delay
+        self.content = content
+        self.statuses = list(statuses)
+        self.raw = raw
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    code = stub.statuses.pop(0) if stub.statuses else 200
+                time.sleep(stub.delay)
+                if stub.raw is not None:
+                    body = stub.raw.encode()
+                else:
+                    body = json.dumps({'choices': [{'message': {'content': stub.content}}]}).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
 class RegistrationAPITest(APITestCase):
     def setUp(self):
         self.url = reverse('register')
@@ -25,4 +98,947 @@ class RegistrationAPITest(APITestCase):
         data = {"username": "newuser", "password": "secretpass", "email": "newuser@example.com"}
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn("token", response.data)
\ No newline at end of file
+        self.assertIn("token", response.data)
+
+class _ThreadNameView(AIThreadPoolMixin, APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response({'thread': threading.current_thread().name})
+
+
+class AIThreadPoolViewTest(SimpleTestCase):
+    def test_asgi_requests_run_in_the_ai_pool(self):
+        from django.test import AsyncRequestFactory
+        response = asyncio.run(_ThreadNameView.as_view()(AsyncRequestFactory().get('/')))
+        self.assertTrue(response.data['thread'].startswith('ai-call'))
+
+    def test_wsgi_requests_run_on_the_request_thread(self):
+        from asgiref.sync import async_to_sync
+        response = async_to_sync(_ThreadNameView.as_view())(APIRequestFactory().get('/'))
+        self.assertEqual(response.data['thread'], threading.current_thread().name)
+
+
+class AsyncAIEndpointsTest(APITestCase):
+    def test_async_generate_requires_auth(self):
+        response = self.client.post(reverse('ai-async-generate-task'), {'task_type': 'multiple_choice'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SingleFlightTest(SimpleTestCase):
+    def _run_concurrently(self, n=20):
+        with StubLLMServer(delay=0.5, content='<level_test/>') as stub:
+            results = []
+
+            def call():
+                return httpx.post(f'{stub.url}/chat/completions', json={}).json()['choices'][0]['message']['content']
+
+            def worker():
+                results.append(single_flight.run('level_test:initial', call, deadline=10))
+
+            threads = [threading.Thread(target=worker) for _ in range(n)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            return stub.requests, results
+
+    def test_identical_calls_are_coalesced(self):
+        requests, results = self._run_concurrently()
+        self.assertEqual(requests, 1)
+        self.assertEqual(results, ['<level_test/>'] * 20)
+
+    @skipUnless(os.environ.get('REDIS_URL'), 'needs a Redis server')
+    def test_identical_calls_are_coalesced_through_redis(self):
+        caches = {'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }}
+        with override_settings(CACHES=caches):
+            requests, results = self._run_concurrently()
+        self.assertEqual(requests, 1)
+        self.assertEqual(results, ['<level_test/>'] * 20)
+
+
+class IncrementalTaskParserTest(SimpleTestCase):
+    def _feed(self, chunks):
+        parser = streaming.IncrementalTaskParser()
+        emitted = []
+        for chunk in chunks:
+            emitted.append(parser.feed(chunk))
+        return parser, emitted
+
+    def test_tokens_split_mid_tag(self):
+        xml = 'Hier ist die Aufgabe:\n<task><question id="1">Wie heißt du?</question><question id="2">Woher kommst du?</question></task>'
+        chunks = [xml[i:i + 3] for i in range(0, len(xml), 3)]
+        parser, emitted = self._feed(chunks)
+        questions = [q for batch in emitted for q in batch]
+        self.assertEqual(questions, ['<question id="1">Wie heißt du?</question>',
+                                     '<question id="2">Woher kommst du?</question>'])
+        # The first question is emitted as soon as it closes, before the rest arrives
+        first = next(i for i, batch in enumerate(emitted) if batch)
+        self.assertLess(first * 3, xml.index('<question id="2">'))
+        self.assertTrue(parser.text.startswith('<task>'))
+        self.assertIsNone(parser.failed)
+
+    def test_nested_items_arrive_with_their_question(self):
+        xml = ('<task><question id="1"><item>der</item><item>die</item></question>'
+               '<items><item>das</item></items></task>')
+        _, emitted = self._feed([xml[:40], xml[40:75], xml[75:]])
+        questions = [q for batch in emitted for q in batch]
+        self.assertEqual(questions, ['<question id="1"><item>der</item><item>die</item></question>',
+                                     '<item>das</item>'])
+
+
+class GradingWorkerTest(TransactionTestCase):
+    def test_batch_is_graded_in_parallel(self):
+        user = User.objects.create_user(username='grader', password='secretpass')
+        UserProfile.objects.get_or_create(user=user)
+        jobs = [
+            GradingJob.objects.create(
+                user=user,
+                exercise=ExerciseHistory.objects.create(user=user, task_type='free_text', ai_generated_task_xml='<task/>', parse_errors=[]),
+                user_solution='Ich bin müde.'
+            )
+            for _ in range(8)
+        ]
+        with StubLLMServer(delay=0.5, content='<feedback/>') as stub:
+            def grade_via_stub(user, task_xml, user_solution):
+                feedback = httpx.post(f'{stub.url}/chat/completions', json={}).json()['choices'][0]['message']['content']
+                return {'feedback_xml': feedback, 'score': 0.8}
+
+            with patch.object(grading.ai_service, 'grade_submission', side_effect=grade_via_stub), \
+                    patch.object(grading.xml_parsers, 'parse_feedback_xml', return_value={'score': 0.8}):
+                executor = grading_jobs.make_executor(8)
+                started = time.monotonic()
+                processed = grading_jobs.drain_once(executor, batch_size=8)
+                elapsed = time.monotonic() - started
+                executor.shutdown()
+
+        self.assertEqual(processed, 8)
+        self.assertEqual(stub.requests, 8)
+        self.assertLess(elapsed, 8 * 0.5)  # calls overlapped instead of running back to back
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, GradingJobStatus.DONE)
+            self.assertEqual(job.result['score'], 0.8)
+
+    def test_finished_job_is_not_graded_twice(self):
+        user = User.objects.create_user(username='grader', password='secretpass')
+        UserProfile.objects.get_or_create(user=user)
+        ExperienceSummary.objects.get_or_create(user=user)
+        exercise = ExerciseHistory.objects.create(user=user, task_type='free_text', ai_generated_task_xml='<task/>', parse_errors=[])
+        job, created = grading_jobs.enqueue(user, exercise, 'Ich bin müde.')
+        again, created_again = grading_jobs.enqueue(user, exercise, 'Ich bin müde.')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+
+        with patch.object(grading.ai_service, 'grade_submission', return_value={'feedback_xml': '<feedback/>', 'score': 0.8}), \
+                patch.object(grading.xml_parsers, 'parse_feedback_xml', return_value={'score': 0.8}):
+            self.assertEqual(grading_jobs.claim_batch(1), [job.pk])
+            self.assertEqual(grading_jobs.process_job(job.pk), GradingJobStatus.DONE)
+            self.assertEqual(grading_jobs.requeue_stale(0, 3), (0, 0))
+            # A stalled worker finishing the same job later
+            self.assertEqual(grading_jobs.process_job(job.pk), GradingJobStatus.DONE)
+
+        experience = ExperienceSummary.objects.get(user=user)
+        self.assertEqual((experience.total_xp, experience.completed_exercises), (40, 1))
+        self.assertEqual(UserProfile.objects.get(user=user).progress, 10)
+
+
+class LocalGraderTest(SimpleTestCase):
+    def test_german_normalization(self):
+        self.assertEqual(local_grader.compare('die Straße', 'die STRASSE'), (1.0, 'correct'))
+        self.assertEqual(local_grader.compare('das Mädchen', 'das Maedchen.'), (1.0, 'correct'))
+        self.assertEqual(local_grader.compare('der Hund', 'den Hund'), (0.5, 'article'))
+        self.assertEqual(local_grader.compare('der Hund', 'Hund'), (0.5, 'article'))
+        self.assertEqual(local_grader.compare('Hund', 'der Hund'), (0.5, 'article'))
+        self.assertEqual(local_grader.compare('der', 'die'), (0.0, 'wrong'))
+
+    def test_grade_fill_blank(self):
+        task = {'questions': [{'id': 1, 'correct_answer': 'der Bäcker'}, {'id': 2, 'answer': 'groß'}]}
+        result = local_grader.grade('fill_blank', task, {'1': 'der Baecker', '2': 'klein'})
+        self.assertEqual(result['score'], 0.5)
+        self.assertIn('<feedback graded_by="local">', result['feedback_xml'])
+        self.assertEqual(result['parsed_feedback']['items'][1]['result'], 'wrong')
+
+    def test_free_text_goes_to_llm(self):
+        self.assertIsNone(local_grader.grade('free_text', {'questions': [{'id': 1}]}, {'1': 'Hallo'}))
+
+    def test_raw_text_submission_goes_to_llm(self):
+        task = {'questions': [{'id': 1, 'correct_answer': 'der Bäcker'}, {'id': 2, 'answer': 'groß'}]}
+        self.assertIsNone(local_grader.grade('fill_blank', task, grading.parse_user_solution('der Bäcker, groß')))
+        self.assertIsNone(local_grader.grade('fill_blank', task, {'raw': 'der Bäcker, groß'}))
+        self.assertEqual(local_grader.grade('fill_blank', task, {'1': 'der Bäcker'})['score'], 0.5)
+
+
+class AdaptiveTestEngineTest(SimpleTestCase):
+    def test_estimate_converges_with_fewer_items_than_bank(self):
+        import numpy as np
+        rng = np.random.default_rng(1)
+        a = np.full(200, 1.5)
+        b = np.linspace(-3, 3, 200)
+        true_theta = 1.0
+        administered, responses = [], []
+        theta, se = 0.0, float('inf')
+        while not adaptive_test.should_stop(len(administered), se):
+            index = adaptive_test.select_next(theta, a, b, administered)
+            administered.append(index)
+            responses.append(float(rng.random() < adaptive_test.probability(true_theta, a[index], b[index])))
+            theta, se = adaptive_test.estimate_ability(a[administered], b[administered], responses)
+        self.assertLessEqual(len(administered), adaptive_test.MAX_ITEMS)
+        self.assertLess(abs(theta - true_theta), 3 * se)
+        self.assertEqual(len(set(administered)), len(administered))
+
+    def test_level_bands(self):
+        self.assertEqual(adaptive_test.level_for(-2.0), 'A1')
+        self.assertEqual(adaptive_test.level_for(0.0), 'B1')
+        self.assertEqual(adaptive_test.level_for(3.0), 'C2')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'adaptive-view-test'}})
+class AdaptiveLevelTestViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='adaptive', password='password123')
+        self.client.force_authenticate(self.user)
+        self.test = LevelTest.objects.create(user=self.user, user_answers={'mode': 'adaptive', 'responses': [], 'pending_item_id': 999})
+
+    def _answer(self, item_id):
+        return self.client.post(reverse('level-test-adaptive'), {'action': 'answer', 'test_id': self.test.id, 'item_id': item_id, 'answer': 'x'}, format='json')
+
+    def test_bad_item_ids_are_client_errors(self):
+        self.assertEqual(self._answer('abc').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._answer(999).status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CONTEXT_SNAPSHOT_RECENT_PER_TYPE=2)
+class ContextSnapshotTest(SimpleTestCase):
+    def _exercise(self, pk, score=None, task_type='fill_blank'):
+        from types import SimpleNamespace
+        from django.utils import timezone
+        return SimpleNamespace(
+            id=pk, user_id=1, task_type=task_type, result_score=score,
+            completion_status='completed' if score and score >= 0.6 else 'in_progress',
+            attempt_timestamp=timezone.now(), parsed_feedback={},
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        data = context_snapshot.empty()
+        for pk in (1, 2, 3):
+            context_snapshot.apply(data, self._exercise(pk), created=True)
+        context_snapshot.apply(data, self._exercise(3, score=0.8))
+        context_snapshot.apply(data, self._exercise(3, score=0.8))  # re-save must not double count
+        context_snapshot.apply(data, self._exercise(1, score=0.2))  # graded after leaving the recent list
+
+        self.assertEqual([a['id'] for a in data['recent_by_type']['fill_blank']], [3, 2])
+        self.assertEqual(data['totals'], {'attempts': 3, 'graded': 2, 'completed': 1})
+        self.assertEqual(data['scores']['fill_blank']['count'], 2)
+        self.assertEqual(data['streak']['current'], 1)
+
+
+class ContextSnapshotRecordTest(TestCase):
+    def test_each_new_attempt_is_counted(self):
+        user = User.objects.create_user(username='snapshot', password='password123')
+        for _ in range(2):
+            exercise = ExerciseHistory.objects.create(user=user, task_type='fill_blank', ai_generated_task_xml='<task/>', parse_errors=[])
+            context_snapshot.record_attempt(exercise, created=True)
+        data = context_snapshot.UserContextSnapshot.objects.get(user=user).data
+        self.assertEqual(data['totals']['attempts'], 2)
+        self.assertEqual(len(data['recent_by_type']['fill_blank']), 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'snapshot-test'}})
+    def test_commit_invalidates_cached_snapshot(self):
+        user = User.objects.create_user(username='snapshot-cache', password='password123')
+        self.assertEqual(context_snapshot.get(user.id)['totals']['attempts'], 0)
+        exercise = ExerciseHistory.objects.create(user=user, task_type='fill_blank', ai_generated_task_xml='<task/>', parse_errors=[])
+        with self.captureOnCommitCallbacks(execute=True):
+            context_snapshot.record_attempt(exercise, created=True)
+        self.assertEqual(context_snapshot.get(user.id)['totals']['attempts'], 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'respcache-test'}},
+    RESPONSE_CACHE_L1_TTL=60,
+)
+class ResponseCacheTest(SimpleTestCase):
+    def test_bump_invalidates_only_that_user(self):
+        calls = []
+
+        def build(value):
+            def inner():
+                calls.append(value)
+                return {'value': value}
+            return inner
+
+        self.assertEqual(response_cache.cached('profile', 1, build('a')), {'value': 'a'})
+        self.assertEqual(response_cache.cached('profile', 1, build('b')), {'value': 'a'})
+        response_cache.cached('profile', 2, build('c'))
+        response_cache.bump(1)
+        self.assertEqual(response_cache.cached('profile', 1, build('d')), {'value': 'd'})
+        self.assertEqual(response_cache.cached('profile', 2, build('e')), {'value': 'c'})
+        self.assertEqual(calls, ['a', 'c', 'd'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'conditional-test'}})
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='password123')
+        self.client.force_authenticate(self.user)
+        response_cache._l1.clear()  # user ids are reused across tests
+
+    def test_unchanged_list_returns_304(self):
+        url = reverse('lesson-list-create')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        etag = first['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(user=self.user, title='Neu')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_stale_l1_body_keeps_its_own_etag(self):
+        url = reverse('lesson-list-create')
+        first = self.client.get(url)
+        # A write handled by another process: the shared generation moves, this L1 does not
+        response_cache.cache.incr(response_cache._generation_key(self.user.id))
+        stale = self.client.get(url)
+        self.assertEqual(stale.data, first.data)
+        self.assertEqual(stale['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, status.HTTP_200_OK)
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pageuser', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walk_returns_each_row_once(self):
+        from django.utils import timezone
+        now = timezone.now()
+        # Identical timestamps exercise the id tie-breaker
+        ExerciseHistory.objects.bulk_create([
+            ExerciseHistory(user=self.user, task_type='fill_blank', attempt_timestamp=now, parsed_task={}, parse_errors=[])
+            for _ in range(7)
+        ])
+        seen, url = [], reverse('tasks-list') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('tasks-list') + '?cursor=bogus').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsTest(SimpleTestCase):
+    available = ['id', 'task_type', 'ai_generated_task_xml', 'result_score']
+
+    def _resolve(self, query, default=None, method='get'):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        request = Request(getattr(APIRequestFactory(), method)('/learning/tasks/', query))
+        return sparse_fields.resolve(request, self.available, default)
+
+    def test_fields_omit_and_default(self):
+        self.assertEqual(self._resolve({'fields': 'result_score,id'}), ['id', 'result_score'])
+        self.assertEqual(self._resolve({'omit': 'ai_generated_task_xml'}), ['id', 'task_type', 'result_score'])
+        self.assertEqual(self._resolve({}, default=('id', 'task_type')), ['id', 'task_type'])
+        self.assertEqual(self._resolve({}, default=('id',), method='post'), self.available)
+
+    def test_unknown_field_rejected(self):
+        from rest_framework.exceptions import ValidationError
+        with self.assertRaises(ValidationError):
+            self._resolve({'fields': 'password'})
+
+
+@override_settings(COMPRESSION_MIN_BYTES=16, COMPRESSION_DICTIONARY_ID=0)
+class CompressionTest(SimpleTestCase):
+    def test_round_trip_and_legacy_values(self):
+        text = '<task><question>Wie heißt das?</question></task>' * 20
+        for codec in (compression.ZLIB, compression.ZSTD if compression.zstandard else compression.ZLIB):
+            packed = compression.compress(text, use_codec=codec)
+            self.assertTrue(compression.is_compressed(packed))
+            self.assertLess(len(packed), len(text.encode('utf-8')) // 4)
+            self.assertEqual(compression.decompress(packed), text)
+        # Rows written before the column was converted are plain UTF-8
+        self.assertEqual(compression.decompress('<kurz/>'.encode('utf-8')), '<kurz/>')
+        self.assertEqual(compression.compress('<kurz/>'), b'<kurz/>')
+
+
+class ArchiveSegmentTest(SimpleTestCase):
+    def test_records_are_read_back_individually(self):
+        import tempfile
+        payloads = [{'ai_generated_task_xml': f'<task id="{i}">Übung</task>', 'parsed_task': {'i': i}} for i in range(5)]
+        with tempfile.TemporaryDirectory() as directory, override_settings(ARCHIVE_DIR=directory):
+            locations = archive.write_segment(payloads)
+            self.assertEqual(len({segment for segment, _, _ in locations}), 1)
+            for payload, location in reversed(list(zip(payloads, locations))):
+                self.assertEqual(archive.read_segment(*location), payload)
+
+
+class ArchiveHydrationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='archivist', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def _attempt(self, i, days_ago=0):
+        exercise = ExerciseHistory.objects.create(
+            user=self.user, task_type='free_text', ai_prompt=f'Aufgabe {i}',
+            ai_generated_task_xml=f'<task id="{i}">Übung</task>', parsed_task={'i': i}, parse_errors=[],
+            completion_status=CompletionStatus.COMPLETED,
+        )
+        ExerciseHistory.objects.filter(pk=exercise.pk).update(attempt_timestamp=timezone.now() - timedelta(days=days_ago))
+        return exercise
+
+    def test_archived_attempts_read_like_hot_ones(self):
+        import tempfile
+        cutoff = timezone.now() - timedelta(days=365)
+        with tempfile.TemporaryDirectory() as directory, override_settings(ARCHIVE_DIR=directory):
+            in_table = self._attempt(1, days_ago=400)
+            self.assertEqual(archive.archive_batch(cutoff, backend='table'), 1)
+            in_segment = self._attempt(2, days_ago=400)
+            self.assertEqual(archive.archive_batch(cutoff, backend='segments'), 1)
+            hot = self._attempt(3)
+            self.assertEqual(archive.archive_batch(cutoff), 0)
+
+            blanked = ExerciseHistory.objects.get(pk=in_segment.pk)
+            self.assertEqual((blanked.ai_generated_task_xml, blanked.parsed_task), ('', {}))
+            self.assertEqual(archive.hydrate(blanked).ai_generated_task_xml, '<task id="2">Übung</task>')
+
+            listing = self.client.get(reverse('exercise-history-list')).data['results']
+            self.assertEqual(
+                {row['id']: (row['ai_prompt'], row['parsed_task']) for row in listing},
+                {in_table.pk: ('Aufgabe 1', {'i': 1}), in_segment.pk: ('Aufgabe 2', {'i': 2}), hot.pk: ('Aufgabe 3', {'i': 3})},
+            )
+            detail = self.client.get(reverse('exercise-history-detail', args=[in_table.pk]))
+            self.assertEqual(detail.data['ai_generated_task_xml'], '<task id="1">Übung</task>')
+
+
+class SubmissionStatsConcurrencyTest(TransactionTestCase):
+    def test_concurrent_submits_lose_no_xp(self):
+        from django.db import connection
+        user = User.objects.create_user(username='racer', password='secretpass')
+        UserProfile.objects.get_or_create(user=user)
+        ExperienceSummary.objects.get_or_create(user=user)
+        threads_n, per_thread = 8, 10
+
+        def submit():
+            try:
+                for _ in range(per_thread):
+                    grading.apply_submission_stats(user.id, completed=True, xp_gain=5)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(threads_n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        experience = ExperienceSummary.objects.get(user=user)
+        self.assertEqual(experience.total_xp, threads_n * per_thread * 5)
+        self.assertEqual(experience.completed_exercises, threads_n * per_thread)
+        self.assertEqual(UserProfile.objects.get(user=user).progress, threads_n * per_thread * 10)
+
+
+class RatingStatsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rater', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_rolling_aggregates_follow_writes(self):
+        for value in (5, 3, 4):
+            response = self.client.post(reverse('ratings-intake'), {'rating_type': 'recommendation', 'value': value}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        stats = rating_stats.get('recommendation', self.user.id)
+        self.assertEqual((stats['count'], stats['average']), (3, 4.0))
+        self.assertEqual(stats['histogram'][5], 1)
+        self.assertEqual(rating_stats.get('recommendation')['count'], 3)
+        expected = rating_stats.aggregate('recommendation', self.user.id)
+        self.assertEqual(expected['count'], 3)
+        self.assertEqual(expected['total'], 12)
+
+    def _rating(self, value):
+        from django.contrib.contenttypes.models import ContentType
+        from .models import Rating
+        return Rating.objects.create(
+            user=self.user, content_type=ContentType.objects.get_for_model(User), object_id=self.user.id,
+            rating_type='task', value=value,
+        )
+
+    def test_destroy_without_aggregate_row_is_subtracted(self):
+        first, _ = self._rating(5), self._rating(3)  # written before the aggregate row exists
+        response = self.client.delete(reverse('ratings-detail', args=[first.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        stats = rating_stats.get('task', self.user.id)
+        self.assertEqual((stats['count'], stats['average'], stats['histogram'][5]), (1, 3.0, 0))
+        self.assertEqual(rating_stats.get('task')['count'], 1)
+
+    def test_update_moves_the_value_between_buckets(self):
+        rating = self._rating(4)
+        rating_stats.rebuild()
+        response = self.client.patch(reverse('ratings-detail', args=[rating.id]), {'value': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = rating_stats.get('task', self.user.id)
+        self.assertEqual((stats['count'], stats['average']), (1, 2.0))
+        self.assertEqual((stats['histogram'][4], stats['histogram'][2]), (0, 1))
+
+        self.client.delete(reverse('ratings-detail', args=[rating.id]))
+        stats = rating_stats.get('task', self.user.id)
+        self.assertEqual((stats['count'], stats['histogram'][2]), (0, 0))
+
+
+class BulkIntakeTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        self.client.force_authenticate(self.user)
+        self.mine = ExerciseHistory.objects.create(user=self.user, task_type='fill_blank', ai_generated_task_xml='<task/>', parse_errors=[])
+        self.theirs = ExerciseHistory.objects.create(user=self.other, task_type='fill_blank', ai_generated_task_xml='<task/>', parse_errors=[])
+
+    def test_ratings_batch_is_all_or_nothing(self):
+        from .models import Rating
+        ratings = [
+            {'rating_type': 'task', 'value': 4, 'model': 'ExerciseHistory', 'object_id': self.mine.id},
+            {'rating_type': 'experience', 'value': 5},
+        ]
+        response = self.client.post(reverse('ratings-bulk-intake'), {'ratings': ratings}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['ids']), 2)
+
+        ratings.append({'rating_type': 'task', 'value': 1, 'model': 'ExerciseHistory', 'object_id': self.theirs.id})
+        response = self.client.post(reverse('ratings-bulk-intake'), {'ratings': ratings}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn(2, response.data['items'])
+        self.assertEqual(Rating.objects.filter(user=self.user).count(), 2)
+
+    def test_notes_are_appended_in_one_update(self):
+        notes = [{'task_id': self.mine.id, 'note': 'zu leicht'}, {'task_id': self.mine.id, 'note': 'Tippfehler'}]
+        response = self.client.post(reverse('tasks-feedback-bulk'), {'notes': notes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.mine.refresh_from_db()
+        self.assertEqual(self.mine.user_feedback_notes, ['zu leicht', 'Tippfehler'])
+        self.assertEqual(self.mine.ai_generated_task_xml, '<task/>')
+
+
+class TokenBucketThrottleTest(SimpleTestCase):
+    @override_settings(COORDINATION_REDIS_URL='',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-test'}})
+    def test_without_redis_the_bucket_lives_in_the_cache(self):
+        key = f'cached-{time.monotonic()}'
+        allowed = [throttling.take(key, 3, 3 / 60) for _ in range(4)]
+        self.assertEqual([a for a, _ in allowed], [True, True, True, False])
+        self.assertAlmostEqual(allowed[-1][1], 20, delta=0.5)
+        self.assertEqual(throttling._local_buckets.get(key), None)
+        tokens, _ = throttling.cache.get(f'{throttling.KEY_PREFIX}:{key}')
+        self.assertLess(tokens, 1)
+
+    def test_missing_coordination_redis_is_reported(self):
+        with override_settings(COORDINATION_REDIS_URL=''), self.assertLogs('learning', 'WARNING') as logs:
+            redis_conn.check_configuration()
+        self.assertIn('COORDINATION_REDIS_URL is not set', logs.output[0])
+
+    @skipUnless(os.environ.get('REDIS_URL'), 'needs a Redis server')
+    def test_bucket_is_shared_across_processes(self):
+        key = f'mp-{time.time()}'
+        ctx = multiprocessing.get_context('fork')
+        results = ctx.Queue()
+        with override_settings(COORDINATION_REDIS_URL=os.environ['REDIS_URL']):
+            workers = [ctx.Process(target=_take_tokens, args=(key, 20, results)) for _ in range(8)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            allowed = sum(results.get(timeout=5) for _ in workers)
+            self.assertEqual(allowed, 50)
+            ok, wait = throttling.take(key, 50, 50 / 86400)
+        self.assertFalse(ok)
+        self.assertGreater(wait, 0)
+
+
+@override_settings(ADMISSION_MAX_CONCURRENT=1, ADMISSION_MAX_QUEUE=1, ADMISSION_MAX_WAIT=2.0, COORDINATION_REDIS_URL='',
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AdmissionControlTest(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(admission, '_local', admission._LocalAdmission())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _acquire_in_thread(self, scope):
+        outcome = {}
+
+        def run():
+            try:
+                outcome['ticket'] = admission.acquire(scope)
+            except admission.Overloaded as e:
+                outcome['reason'] = e.reason
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while admission.get_stats()['queue_depth'] == 0:
+            time.sleep(0.01)
+        return thread, outcome
+
+    def test_submit_displaces_queued_generation(self):
+        held = admission.acquire('ai-generate')
+        generate, generate_outcome = self._acquire_in_thread('ai-generate')
+        submit, submit_outcome = self._acquire_in_thread('ai-submit')
+        generate.join()
+        self.assertEqual(generate_outcome, {'reason': 'shed'})
+
+        with self.assertRaises(admission.Overloaded) as rejected:
+            admission.acquire('ai-generate')
+        self.assertEqual(rejected.exception.reason, 'queue_full')
+        self.assertEqual(rejected.exception.status_code, 503)
+        self.assertGreaterEqual(rejected.exception.wait, 1)
+
+        admission.release(held)
+        submit.join()
+        self.assertIn('ticket', submit_outcome)
+        stats = admission.get_stats()
+        self.assertEqual((stats['in_flight'], stats['queue_depth'], stats['shed']), (1, 0, 1))
+
+    @override_settings(ADMISSION_MAX_WAIT=0.1)
+    def test_wait_is_bounded_by_deadline(self):
+        admission.acquire('ai-submit')
+        with self.assertRaises(admission.Overloaded) as rejected:
+            admission.acquire('ai-submit')
+        self.assertEqual(rejected.exception.reason, 'timeout')
+        self.assertEqual(admission.get_stats()['rejected_timeout'], 1)
+
+
+class _CountingSubmitView(idempotency.IdempotencyMixin, APIView):
+    calls = 0
+
+    def post(self, request):
+        type(self).calls += 1
+        return Response({'task_id': request.data['task_id'], 'call': self.calls}, status=status.HTTP_201_CREATED)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'coordination': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'idempotency'},
+})
+class IdempotencyTest(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['coordination'].clear()
+        _CountingSubmitView.calls = 0
+        self.user = User(id=1, username='idem')
+
+    def _post(self, data, key):
+        request = APIRequestFactory().post('/learning/tasks/submit/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        force_authenticate(request, self.user)
+        return _CountingSubmitView.as_view()(request)
+
+    def test_retry_replays_first_response(self):
+        first = self._post({'task_id': 7}, 'k-1')
+        retry = self._post({'task_id': 7}, 'k-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(_CountingSubmitView.calls, 1)
+
+        self.assertEqual(self._post({'task_id': 8}, 'k-1').status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self._post({'task_id': 7}, 'k-2')
+        self.assertEqual(_CountingSubmitView.calls, 2)
+
+    def test_in_flight_duplicate_waits_for_original(self):
+        ckey, fp = idempotency.cache_key(1, '/x/', 'k'), idempotency.fingerprint('/x/', {'a': 1})
+        self.assertIsNone(idempotency.claim(ckey, fp))
+        result = {}
+        duplicate = threading.Thread(target=lambda: result.update(record=idempotency.claim(ckey, fp, wait=2)))
+        duplicate.start()
+        time.sleep(0.2)
+        idempotency.complete(ckey, fp, 201, {'ok': True})
+        duplicate.join()
+        self.assertEqual(result['record']['data'], {'ok': True})
+
+    def test_error_responses_release_the_key(self):
+        ckey, fp = idempotency.cache_key(1, '/x/', 'k'), idempotency.fingerprint('/x/', {})
+        for status_code in (502, 400):
+            self.assertIsNone(idempotency.claim(ckey, fp))
+            idempotency.complete(ckey, fp, status_code, {'error': 'AI feedback generation failed'})
+        self.assertIsNone(idempotency.claim(ckey, fp))
+
+
+@override_settings(LLM_MAX_RETRIES=2, LLM_RETRY_BACKOFF=0, LLM_HEDGE_CALL_TYPES=[])
+class LLMClientRetryTest(SimpleTestCase):
+    payload = {'model': 'stub', 'messages': [{'role': 'user', 'content': 'Hallo'}]}
+
+    def setUp(self):
+        breaker = patch.object(llm_client, 'breaker', llm_client.CircuitBreaker(1, 30))
+        self.breaker = breaker.start()
+        self.addCleanup(breaker.stop)
+
+    def test_retryable_status_is_retried(self):
+        with StubLLMServer(statuses=[503, 429]) as stub:
+            data = llm_client.post_json(f'{stub.url}/chat/completions', self.payload)
+        self.assertEqual(data['choices'][0]['message']['content'], '<task/>')
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_client_errors_do_not_trip_the_breaker(self):
+        for stub_kwargs in ({'statuses': [400]}, {'raw': 'kein JSON'}):
+            with StubLLMServer(**stub_kwargs) as stub:
+                with self.assertRaises(llm_client.LLMError):
+                    llm_client.post_json(f'{stub.url}/chat/completions', self.payload)
+            self.assertEqual(stub.requests, 1)
+            self.assertEqual(self.breaker.state, 'closed')
+
+    def test_exhausted_retries_open_the_breaker(self):
+        async def call_twice(url):
+            with self.assertRaises(llm_client.LLMError):
+                await llm_client.apost_json(url, self.payload)
+            with self.assertRaises(llm_client.LLMUnavailable):
+                await llm_client.apost_json(url, self.payload)
+
+        with patch.object(llm_client, '_async_client', None), StubLLMServer(statuses=[502] * 3) as stub:
+            asyncio.run(call_twice(f'{stub.url}/chat/completions'))
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(self.breaker.state, 'open')
+
+    def test_router_breaker_ignores_client_errors(self):
+        with StubLLMServer(statuses=[422]) as stub:
+            with override_settings(LLM_BACKENDS=[{'name': 'strict', 'url': stub.url}], LLM_BREAKER_THRESHOLD=1):
+                with self.assertRaises(llm_client.LLMError):
+                    llm_client.chat_completion([{'role': 'user', 'content': 'Hallo'}], use_cache=False)
+                self.assertEqual(llm_router.get_stats()['strict']['circuit'], 'closed')
+        self.assertEqual(stub.requests, 1)
+
+    def test_stream_client_error_does_not_trip_the_breaker(self):
+        async def consume():
+            with self.assertRaises(llm_client.LLMError):
+                async for _ in llm_client.astream_chat_completion([{'role': 'user', 'content': 'Hallo'}]):
+                    pass
+
+        with StubLLMServer(statuses=[400]) as stub, override_settings(DEEPSEEK_API_URL=stub.url), \
+                patch.object(llm_client, '_async_client', None):
+            asyncio.run(consume())
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'llm-cache-test'}},
+    LLM_CACHE_TTLS={'generate_level_test': 3600},
+)
+class LLMCacheBypassTest(TestCase):
+    messages = [{'role': 'user', 'content': 'Erstelle einen Einstufungstest.'}]
+
+    def test_bypass_skips_the_cache(self):
+        with StubLLMServer(content='<level_test/>') as stub, override_settings(LLM_BACKENDS=[{'name': 'stub', 'url': stub.url}]):
+            for _ in range(2):
+                llm_client.chat_completion(self.messages, call_type='generate_level_test')
+            self.assertEqual(stub.requests, 1)
+            with llm_cache.bypass():
+                llm_client.chat_completion(self.messages, call_type='generate_level_test')
+            self.assertEqual(stub.requests, 2)
+
+    def test_bank_generation_bypasses_the_cache(self):
+        calls = []
+
+        def generate(test_type):
+            calls.append(llm_cache.enabled('generate_level_test'))
+            return {'test_xml': f'<test><question id="{len(calls)}"/></test>', 'prompt_used': 'p'}
+
+        with patch.object(level_test_bank.ai_service, 'generate_level_test_xml', generate, create=True):
+            self.assertIsNotNone(level_test_bank.add_generated('initial'))
+            self.assertIsNotNone(level_test_bank.add_generated('initial'))
+        self.assertEqual(calls, [False, False])
+        self.assertTrue(llm_cache.enabled('generate_level_test'))
+
+
+class LevelTestBankPickTest(TestCase):
+    def test_served_entries_are_skipped_until_the_bank_is_exhausted(self):
+        user = User.objects.create_user(username='banked', password='password123')
+        entries = [
+            LevelTestBankEntry.objects.create(test_type='initial', test_xml=f'<test id="{i}"/>', content_hash=str(i))
+            for i in range(3)
+        ]
+        served = []
+        for day in range(4):
+            entry = level_test_bank.pick(user, 'initial')
+            served.append(entry.id)
+            test = LevelTest.objects.create(user=user, test_type='initial', bank_entry=entry, completed=True)
+            LevelTest.objects.filter(pk=test.pk).update(started_at=timezone.now() + timedelta(days=day))
+        self.assertEqual(sorted(served[:3]), [e.id for e in entries])
+        self.assertEqual(served[3], served[0])
+        self.assertIsNone(level_test_bank.pick(user, 'placement'))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'task-pool-test'}},
+    LLM_CACHE_TTLS={'generate_task': 3600},
+    TASK_POOL_LOW_WATER=2,
+    TASK_POOL_HIGH_WATER=3,
+)
+class TaskPoolTest(TestCase):
+    def setUp(self):
+        self.cache_enabled = []
+        self.repeated_xml = None  # set to make the provider return the same task every time
+        for patcher in (
+            patch.object(task_pool.ai_service, 'generate_task_xml', self._generate, create=True),
+            patch.object(task_pool.xml_parsers, 'parse_task_xml', lambda task_type, xml: {'questions': 1}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _generate(self, user, task_type, desired_difficulty):
+        self.cache_enabled.append(llm_cache.enabled('generate_task'))
+        xml = self.repeated_xml or f'<task><question id="{len(self.cache_enabled)}"/></task>'
+        return {'xml': xml, 'prompt_used': f'{task_type} {desired_difficulty}'}
+
+    def test_refill_tops_up_buckets_without_the_cache(self):
+        added = task_pool.refill()
+        sizes = task_pool.bucket_sizes()
+        self.assertEqual(added, len(sizes) * 3)
+        self.assertEqual(set(sizes.values()), {3})
+        self.assertEqual(set(self.cache_enabled), {False})
+        self.assertEqual(task_pool.refill(), 0)
+
+    def test_duplicate_task_is_not_pooled(self):
+        self.repeated_xml = '<task><question id="1"/></task>'
+        self.assertIsNotNone(task_pool.generate_one('multiple_choice', 'B1'))
+        self.assertIsNone(task_pool.generate_one('multiple_choice', 'B1'))
+        self.assertEqual(task_pool.bucket_sizes(), {('multiple_choice', 'B1'): 1})
+
+    def test_pop_claims_each_task_once_oldest_first(self):
+        first = task_pool.generate_one('multiple_choice', 'B1')
+        second = task_pool.generate_one('multiple_choice', 'B1')
+        self.assertEqual(task_pool.pop_task('multiple_choice', 'b1').ai_generated_task_xml, first.ai_generated_task_xml)
+        self.assertEqual(task_pool.pop_task('multiple_choice', 'B1').ai_generated_task_xml, second.ai_generated_task_xml)
+        self.assertIsNone(task_pool.pop_task('multiple_choice', 'B1'))
+        bucket = task_pool.get_stats()['buckets']['multiple_choice/B1']
+        self.assertEqual((bucket['size'], bucket['hits'], bucket['misses']), (0, 2, 1))
+
+
+@override_settings(LLM_MAX_RETRIES=0, LLM_HEDGE_CALL_TYPES=['grade_submission'], LLM_HEDGE_DEFAULT_DELAY=0.2)
+class LLMRouterTest(SimpleTestCase):
+    messages = [{'role': 'user', 'content': 'Bewerte: Ich bin müde.'}]
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        with StubLLMServer(delay=3.0, content='<feedback score="0.1"/>') as slow, \
+                StubLLMServer(delay=0.05, content='<feedback score="0.9"/>') as fast:
+            with override_settings(LLM_BACKENDS=[{'name': 'primary', 'url': slow.url}, {'name': 'fallback', 'url': fast.url}]):
+                started = time.monotonic()
+                content = llm_client.chat_completion(self.messages, call_type='grade_submission', use_cache=False)
+                elapsed = time.monotonic() - started
+                stats = llm_router.get_stats()
+        self.assertEqual(content, '<feedback score="0.9"/>')
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual((slow.requests, fast.requests), (1, 1))
+        self.assertEqual(stats['primary']['cancelled'], 1)
+        self.assertEqual((stats['fallback']['hedges'], stats['fallback']['wins']), (1, 1))
+
+    def test_invalid_xml_does_not_win(self):
+        with StubLLMServer(content='Leider kann ich das nicht.') as broken, \
+                StubLLMServer(delay=0.1, content='<feedback score="0.9"/>') as good:
+            with override_settings(LLM_BACKENDS=[{'name': 'primary', 'url': broken.url}, {'name': 'fallback', 'url': good.url}]):
+                content = asyncio.run(llm_client.achat_completion(self.messages, call_type='grade_submission', use_cache=False))
+        self.assertEqual(content, '<feedback score="0.9"/>')
+
+    def test_unhedged_call_fails_over(self):
+        with StubLLMServer(content='<task/>') as healthy:
+            backends = [{'name': 'down', 'url': 'http://127.0.0.1:9'}, {'name': 'up', 'url': healthy.url}]
+            with override_settings(LLM_BACKENDS=backends):
+                content = llm_client.chat_completion(self.messages, call_type='generic', use_cache=False)
+                stats = llm_router.get_stats()
+        self.assertEqual(content, '<task/>')
+        self.assertEqual(stats['down']['failures'], 1)
+
+    def test_sync_call_is_bounded_by_the_timeouts(self):
+        with StubLLMServer(delay=2.0) as slow:
+            with override_settings(LLM_BACKENDS=[{'name': 'slow', 'url': slow.url}], LLM_CONNECT_TIMEOUT=0.1, LLM_READ_TIMEOUT=5.0):
+                with patch.object(llm_router, 'deadline', return_value=0.3):
+                    started = time.monotonic()
+                    with self.assertRaises(llm_client.LLMError):
+                        llm_client.chat_completion(self.messages, call_type='generic', use_cache=False)
+                self.assertLess(time.monotonic() - started, 1.0)
+                time.sleep(0.1)  # let the background loop finish cancelling
+                pool = llm_client.pool_stats()
+                stats = llm_router.get_stats()
+        self.assertEqual(pool['backends']['slow']['clients'], 1)
+        self.assertEqual(stats['slow']['cancelled'], 1)
+
+
+def _history_snapshot(attempts):
+    snapshot = context_snapshot.empty()
+    types = ['fill_blank', 'translation', 'essay']
+    for i in range(attempts):
+        exercise = SimpleNamespace(
+            id=i + 1, user_id=1, task_type=types[i % 3], result_score=(i % 10) / 10,
+            completion_status=CompletionStatus.COMPLETED if i % 10 >= 5 else CompletionStatus.FAILED,
+            attempt_timestamp=timezone.now(), parsed_feedback={'errors': [{'category': f'err{i % 7}'}]},
+        )
+        context_snapshot.apply(snapshot, exercise, created=True)
+    return snapshot
+
+
+class PromptBudgetTest(SimpleTestCase):
+
+    def test_prompt_size_stays_within_budget(self):
+        sizes = []
+        for attempts in (100, 10000):
+            snapshot = _history_snapshot(attempts)
+            context = prompt_budget.render(snapshot, prompt_budget.summarize(snapshot), 'generate_task', 400, 'fill_blank')
+            sizes.append(prompt_budget.estimate_tokens(context))
+        self.assertLessEqual(max(sizes), 400)
+        self.assertLess(sizes[1] - sizes[0], 20)
+
+    def test_items_for_the_requested_task_type_win(self):
+        snapshot = _history_snapshot(300)
+        context = prompt_budget.render(snapshot, prompt_budget.summarize(snapshot), 'generate_task', 150, 'fill_blank')
+        self.assertIn('fill_blank #', context)
+        self.assertNotIn('essay #', context)
+        self.assertTrue(context.startswith('Learner: 300 attempts'))
+
+    @override_settings(PROMPT_SESSION_LOGS_KEEP=2)
+    def test_old_session_logs_are_folded(self):
+        logs = [{'date': f'2026-01-0{day}'} for day in range(1, 6)]
+        folded = prompt_budget._fold_session_logs(logs)
+        self.assertEqual(folded[0], {'type': 'summary', 'sessions': 3, 'until': '2026-01-03'})
+        self.assertEqual(folded[1:], logs[-2:])
+
+
+@override_settings(PROMPT_SUMMARY_REFRESH_EVERY=20)
+class PromptSummaryRefreshTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summary', password='password123')
+        ExperienceSummary.objects.get_or_create(user=self.user)
+        self.snapshot = _history_snapshot(30)
+
+    def _stored(self):
+        return ExperienceSummary.objects.get(user=self.user).skill_tree_json.get('history_summary')
+
+    def test_summary_is_stored_and_reused_until_stale(self):
+        summary = prompt_budget.refresh_summary(self.user.id, self.snapshot)
+        self.assertEqual(self._stored(), summary)
+        with self.assertNumQueries(1):
+            self.assertEqual(prompt_budget.refresh_summary(self.user.id, self.snapshot), summary)
+
+    def test_concurrent_write_wins_over_refresh(self):
+        summarize = prompt_budget.summarize
+
+        def racing_summarize(snapshot):
+            experience = ExperienceSummary.objects.get(user=self.user)
+            experience.session_logs = [{'date': '2026-01-01'}]
+            experience.save()
+            return summarize(snapshot)
+
+        with patch.object(prompt_budget, 'summarize', racing_summarize):
+            summary = prompt_budget.refresh_summary(self.user.id, self.snapshot)
+        self.assertEqual(summary['attempts'], 30)
+        self.assertIsNone(self._stored())
+        self.assertEqual(ExperienceSummary.objects.get(user=self.user).session_logs, [{'date': '2026-01-01'}])
@@ -0,0 +1,123 @@
+"""
+Token-bucket throttle shared by all workers.
+
+Drop-in replacement for ScopedRateThrottle (same throttle_scope and
+DEFAULT_THROTTLE_RATES): a rate of N/period becomes a bucket of N tokens
+refilled at N/period per second. Each request is one EVALSHA of an atomic
+Lua script on a two-field hash per key, using Redis server time so worker
+clocks do not matter. Without Redis (see learning/redis_conn.py) the bucket
+lives in the Django cache, still shared by the workers but updated with a
+plain get/set like ScopedRateThrottle's history, so concurrent requests may
+occasionally both take the last token. Only when that cache fails too is the
+bucket kept per process.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import ScopedRateThrottle
+
+from . import redis_conn
+
+logger = logging.getLogger('learning')
+
+KEY_PREFIX = 'deutschlearner:tb'
+
+# KEYS[1] bucket; ARGV capacity, refill per second, cost -> {allowed, seconds to wait}
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_scripts = {}
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+def _script(conn):
+    script = _scripts.get(id(conn))
+    if script is None:
+        script = _scripts[id(conn)] = conn.register_script(_TOKEN_BUCKET_SCRIPT)
+    return script
+
+
+def _take_local(key, capacity, rate, cost):
+    now = time.monotonic()
+    with _local_lock:
+        tokens, ts = _local_buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        if tokens >= cost:
+            _local_buckets[key] = (tokens - cost, now)
+            return True, 0.0
+        _local_buckets[key] = (tokens, now)
+        return False, (cost - tokens) / rate
+
+
+def _take_cached(key, capacity, rate, cost):
+    cache_key = f'{KEY_PREFIX}:{key}'
+    now = time.time()
+    tokens, ts = cache.get(cache_key) or (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    cache.set(cache_key, (tokens, now), timeout=math.ceil(capacity / rate) + 1)
+    return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+def take(key, capacity, rate, cost=1):
+    """Try to take cost tokens; returns (allowed, seconds until enough tokens)."""
+    conn = redis_conn.get_connection()
+    if conn is not None:
+        try:
+            allowed, wait = _script(conn)(keys=[f'{KEY_PREFIX}:{key}'], args=[capacity, rate, cost])
+            return bool(int(allowed)), float(wait)
+        except Exception as e:
+            logger.warning(f'Token bucket unavailable, using the cache: {e}')
+    try:
+        return _take_cached(key, capacity, rate, cost)
+    except Exception as e:
+        # Fail open to the per-process bucket rather than rejecting everything
+        logger.warning(f'Token bucket cache unavailable, using local bucket: {e}')
+        return _take_local(key, capacity, rate, cost)
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    """ScopedRateThrottle semantics (throttle_scope + rates) on a shared token bucket."""
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = take(self.key, self.num_requests, self.num_requests / self.duration)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self._wait) if self._wait else None
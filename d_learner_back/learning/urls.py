@@ -5,10 +5,15 @@ from .views import (
     CreateUserView, LessonListCreateView, LessonDetailView,
     ProfileView, ExerciseHistoryViewSet, RecommendationViewSet, RatingViewSet,
     ExperienceSummaryView, UserContextView,
-    AIGenerateTaskView, AISubmitTaskView, AIRecommendationsView, LevelTestView,
+    AIGenerateTaskView, AISubmitTaskView, GradingJobView, AIRecommendationsView, LLMStatsView, TaskPoolStatsView, AdmissionStatsView, ResponseCacheStatsView, LevelTestView, AdaptiveLevelTestView,
     TaskListView, TaskStartView, TaskSubmitView, TaskDetailView, UserProgressView,
-    RatingsIntakeView, TaskFeedbackView, RecommendationsOverviewView
+    RatingsIntakeView, RatingsBulkIntakeView, RatingStatsView, TaskFeedbackView, TaskFeedbackBulkView,
+    RecommendationsOverviewView
 )
+from .async_views import (
+    AsyncAIGenerateTaskView, AsyncAISubmitTaskView, AsyncAIRecommendationsView, AsyncLevelTestView
+)
+from .streaming import AIGenerateTaskStreamView
 from .health_checks import HealthCheckView, ReadinessCheckView, LivenessCheckView
 
 router = DefaultRouter()
@@ -38,22 +43,38 @@ urlpatterns = [
     path('ai/generate-task/', AIGenerateTaskView.as_view(), name='ai-generate-task'),
     path('ai/submit-task/', AISubmitTaskView.as_view(), name='ai-submit-task'),
     path('ai/recommendations/', AIRecommendationsView.as_view(), name='ai-recommendations'),
+    path('ai/llm-stats/', LLMStatsView.as_view(), name='ai-llm-stats'),
+    path('ai/task-pool-stats/', TaskPoolStatsView.as_view(), name='ai-task-pool-stats'),
+    path('ai/admission-stats/', AdmissionStatsView.as_view(), name='ai-admission-stats'),
+    path('response-cache-stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+
+    # Async AI endpoints (served by uvicorn workers via asgi.py)
+    path('ai/async/generate-task/', AsyncAIGenerateTaskView.as_view(), name='ai-async-generate-task'),
+    path('ai/async/submit-task/', AsyncAISubmitTaskView.as_view(), name='ai-async-submit-task'),
+    path('ai/async/recommendations/', AsyncAIRecommendationsView.as_view(), name='ai-async-recommendations'),
+    path('ai/generate-task/stream/', AIGenerateTaskStreamView.as_view(), name='ai-generate-task-stream'),
 
     # Level Test (NEW!)
     path('level-test/', LevelTestView.as_view(), name='level-test'),
+    path('level-test/async/', AsyncLevelTestView.as_view(), name='level-test-async'),
+    path('level-test/adaptive/', AdaptiveLevelTestView.as_view(), name='level-test-adaptive'),
 
     # RESTful Tasks API
     path('tasks/', TaskListView.as_view(), name='tasks-list'),
     path('tasks/start/', TaskStartView.as_view(), name='tasks-start'),
     path('tasks/submit/', TaskSubmitView.as_view(), name='tasks-submit'),
     path('tasks/<int:pk>/', TaskDetailView.as_view(), name='tasks-detail'),
+    path('grading-jobs/<int:pk>/', GradingJobView.as_view(), name='grading-job-detail'),
 
     # User progress API
     path('user/progress/', UserProgressView.as_view(), name='user-progress'),
 
     # Ratings intake and task feedback
     path('ratings/', RatingsIntakeView.as_view(), name='ratings-intake'),
+    path('ratings/stats/', RatingStatsView.as_view(), name='ratings-stats'),
+    path('ratings/bulk/', RatingsBulkIntakeView.as_view(), name='ratings-bulk-intake'),
     path('tasks/feedback/', TaskFeedbackView.as_view(), name='tasks-feedback'),
+    path('tasks/feedback/bulk/', TaskFeedbackBulkView.as_view(), name='tasks-feedback-bulk'),
 
     # Recommendations overview
     path('recommendations/', RecommendationsOverviewView.as_view(), name='recommendations-overview'),
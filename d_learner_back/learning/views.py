@@ -3,18 +3,21 @@ from django.contrib.auth.models import User
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+import json
 import logging
 from django.contrib.contenttypes.models import ContentType
-from rest_framework.throttling import ScopedRateThrottle
 
 from .models import (
     Lesson, LessonStatus, UserProfile, Assignment,
     ExerciseHistory, Recommendation, Rating, ExperienceSummary,
-    TaskType, CompletionStatus, LevelTest
+    TaskType, LevelTest, GradingJob, GradingJobStatus, AdaptiveTestItem, RatingAggregate
 )
 from .serializers import (
     UserSerializer, LessonSerializer, UserProfileSerializer, AssignmentSerializer,
@@ -22,7 +25,15 @@ from .serializers import (
     ExperienceSummarySerializer, LevelTestSerializer
 )
 from .user_context import build_user_context
-from . import ai_service, xml_parsers
+from .throttling import TokenBucketThrottle
+from .admission import AdmissionControlMixin
+from .idempotency import IdempotencyMixin
+from .async_views import AIThreadPoolMixin
+from . import llm_client, task_pool, grading, grading_jobs, ai_flows, local_grader, adaptive_test, response_cache, rating_stats, intake, admission
+from .conditional import ConditionalGetMixin
+from .archive import HydrateArchivedMixin
+from .pagination import KeysetPagination
+from .sparse_fields import SparseFieldsetViewMixin
 from .audit import log_audit
 from .monitoring import MonitoringMetrics, monitor_endpoint
 
@@ -46,7 +57,7 @@ class CreateUserView(generics.CreateAPIView):
             'refresh': str(refresh)
         }, status=status.HTTP_201_CREATED)
 
-class LessonListCreateView(generics.ListCreateAPIView):
+class LessonListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """List and create user lessons."""
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
@@ -54,6 +65,12 @@ class LessonListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         return Lesson.objects.filter(user=self.request.user).select_related('user').prefetch_related('assignments').order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional(request, lambda: self.cached_response(
+            request, 'lessons',
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data)
+        ))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
         logger.info(f'Lesson created by {self.request.user.username}')
@@ -73,7 +90,7 @@ class LessonDetailView(generics.RetrieveUpdateDestroyAPIView):
         else:
             serializer.save()
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     """Current user profile."""
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
@@ -81,19 +98,25 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user.profile
 
-class ExerciseHistoryViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional(request, lambda: self.cached_response(
+            request, 'profile', lambda: dict(self.get_serializer(self.get_object()).data)
+        ))
+
+class ExerciseHistoryViewSet(ConditionalGetMixin, HydrateArchivedMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet for user exercise history."""
     serializer_class = ExerciseHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return ExerciseHistory.objects.filter(user=self.request.user).order_by('-attempt_timestamp')
+        return ExerciseHistory.objects.filter(user=self.request.user).order_by('-attempt_timestamp', '-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
         logger.info(f'ExerciseHistory created for {self.request.user.username}')
 
-class RecommendationViewSet(viewsets.ModelViewSet):
+class RecommendationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for user recommendations."""
     serializer_class = RecommendationSerializer
     permission_classes = [IsAuthenticated]
@@ -112,8 +135,28 @@ class RatingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Rating.objects.filter(user=self.request.user).select_related('content_type').order_by('-timestamp')
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        rating = serializer.save(user=self.request.user)
+        rating_stats.record(rating.user_id, rating.rating_type, rating.value)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = serializer.instance
+        old_type, old_value = old.rating_type, old.value
+        rating = serializer.save()
+        if (old_type, old_value) != (rating.rating_type, rating.value):
+            rating_stats.record_many([
+                (rating.user_id, old_type, old_value, -1),
+                (rating.user_id, rating.rating_type, rating.value, 1),
+            ])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Delete first: a missing aggregate row is seeded from the remaining ratings
+        user_id, rating_type, value = instance.user_id, instance.rating_type, instance.value
+        instance.delete()
+        rating_stats.record(user_id, rating_type, value, delta=-1)
 
 class ExperienceSummaryView(generics.RetrieveUpdateAPIView):
     """View and update user experience."""
@@ -123,6 +166,10 @@ class ExperienceSummaryView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user.experience
 
+    def retrieve(self, request, *args, **kwargs):
+        data = response_cache.cached('experience', request.user.id, lambda: dict(self.get_serializer(self.get_object()).data))
+        return Response(data)
+
 class UserContextView(APIView):
     """Aggregated user context for AI requests."""
     permission_classes = [IsAuthenticated]
@@ -132,13 +179,13 @@ class UserContextView(APIView):
         context = build_user_context(request.user, n_per_type=n_per_type)
         return Response(context)
 
-class AIGenerateTaskView(APIView):
+class AIGenerateTaskView(AIThreadPoolMixin, AdmissionControlMixin, IdempotencyMixin, APIView):
     """
     POST /api/ai/generate-task/
     Generates new task via AI based on user context.
     """
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ai-generate'
 
     @monitor_endpoint('ai_generate_task')
@@ -155,65 +202,20 @@ class AIGenerateTaskView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            result = ai_service.generate_task_xml(
-                user=request.user,
-                task_type=task_type,
-                desired_difficulty=desired_difficulty
-            )
-            if 'error' in result:
-                MonitoringMetrics.record_ai_failure(
-                    'generate_task',
-                    result.get('error', 'Unknown error'),
-                    request.user.id
-                )
-                return Response({'error': 'AI task generation failed', 'details': result['error'], 'raw_xml': result.get('raw_xml')}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Parse XML strictly
-            parse_errors = []
-            try:
-                parsed_task = xml_parsers.parse_task_xml(task_type, result['xml'])
-            except xml_parsers.ParseError as e:
-                parsed_task = {}
-                parse_errors.append(str(e))
-                MonitoringMetrics.record_xml_parse_error(task_type, result['xml'], str(e))
-            exercise = ExerciseHistory.objects.create(
-                user=request.user,
-                task_type=task_type,
-                ai_prompt=result.get('prompt_used', ''),
-                ai_generated_task_xml=result['xml'],
-                parsed_task=parsed_task,
-                parse_errors=parse_errors,
-                completion_status=CompletionStatus.IN_PROGRESS
-            )
-            # Response
-            payload = {
-                'task_id': exercise.id,
-                'task_xml': result['xml'],
-                'task_type': task_type,
-                'difficulty': desired_difficulty or request.user.profile.language_level,
-                'parsed_task': parsed_task,
-                'parse_errors': parse_errors,
-                'message': 'Task generated successfully' if not parse_errors else 'Task generated with parsing issues'
-            }
-            status_code = status.HTTP_201_CREATED if not parse_errors else status.HTTP_207_MULTI_STATUS
-            log_audit('ai_generate_task', request.user.id, {
-                'task_type': task_type,
-                'exercise_id': exercise.id,
-                'parse_errors': parse_errors,
-            })
+            payload, status_code = ai_flows.generate_task(request.user, task_type, desired_difficulty)
             return Response(payload, status=status_code)
         except Exception as e:
             MonitoringMetrics.record_ai_failure('generate_task', str(e), request.user.id)
             logger.exception(f'Error generating AI task: {e}')
             return Response({'error': 'Failed to generate task', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class AISubmitTaskView(APIView):
+class AISubmitTaskView(AIThreadPoolMixin, AdmissionControlMixin, IdempotencyMixin, APIView):
     """
     POST /api/ai/submit-task/
     Accepts user solution, evaluates via AI and saves feedback.
     """
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ai-submit'
 
     @monitor_endpoint('ai_submit_task')
@@ -239,137 +241,66 @@ class AISubmitTaskView(APIView):
                 'error': 'Task does not have AI-generated XML'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Parse user_solution if it's JSON string
-            if isinstance(user_solution, str):
-                import json
-                try:
-                    user_solution_parsed = json.loads(user_solution)
-                except json.JSONDecodeError:
-                    user_solution_parsed = {'raw': user_solution}
-            else:
-                user_solution_parsed = user_solution
-
-            result = ai_service.grade_submission(
-                user=request.user,
-                task_xml=exercise.ai_generated_task_xml,
-                user_solution=str(user_solution)
-            )
-            if 'error' in result:
-                MonitoringMetrics.record_ai_failure(
-                    'grade_submission',
-                    result.get('error', 'Unknown error'),
-                    request.user.id
-                )
-                # Save error in history
-                exercise.user_submission_raw = str(user_solution)
-                exercise.user_submission_parsed = user_solution_parsed
-                exercise.parse_errors = exercise.parse_errors + [result['error']]
-                exercise.save()
-                return Response({'error': 'AI feedback generation failed', 'details': result['error'], 'raw_xml': result.get('raw_xml')}, status=status.HTTP_400_BAD_REQUEST)
-            # Strict feedback parsing
-            parsed_feedback = {}
-            try:
-                parsed_feedback = xml_parsers.parse_feedback_xml(result['feedback_xml'])
-            except xml_parsers.ParseError as e:
-                exercise.parse_errors = exercise.parse_errors + [str(e)]
-                MonitoringMetrics.record_xml_parse_error('feedback', result['feedback_xml'], str(e))
-            # Update history
-            exercise.user_submission_raw = str(user_solution)
-            exercise.user_submission_parsed = user_solution_parsed
-            exercise.ai_feedback_xml = result['feedback_xml']
-            exercise.parsed_feedback = parsed_feedback
-            exercise.result_score = result['score']
-            exercise.completion_status = (
-                CompletionStatus.COMPLETED if result['score'] >= 0.6
-                else CompletionStatus.FAILED if result['score'] < 0.4
-                else CompletionStatus.PARTIAL
+        if request.data.get('mode') == 'async':
+            # Queue and return immediately; poll GET /learning/grading-jobs/<id>/
+            job, created = grading_jobs.enqueue(
+                request.user,
+                exercise,
+                user_solution if isinstance(user_solution, str) else json.dumps(user_solution)
             )
-            exercise.save()
-
-            # Update user statistics
-            profile = request.user.profile
-            if exercise.completion_status == CompletionStatus.COMPLETED:
-                profile.progress += 10
-            else:
-                profile.errors += 1
-            profile.save()
-
-            # Update ExperienceSummary
-            try:
-                exp = request.user.experience
-                xp_gain = int(result['score'] * 50)  # Up to 50 XP per task
-                exp.total_xp += xp_gain
-                exp.completed_exercises += 1
-                exp.save()
-            except Exception as e:
-                logger.warning(f'Could not update experience: {e}')
-
-            logger.info(f'Task {task_id} submitted by {request.user.username}, score: {result["score"]:.2f}')
-
-            # Response
-            payload = {
-                'task_id': exercise.id,
-                'score': result['score'],
-                'status': exercise.completion_status,
-                'feedback_xml': result['feedback_xml'],
-                'parsed_feedback': parsed_feedback,
-                'parse_errors': exercise.parse_errors,
-                'xp_gained': (int(result['score'] * 50) if 'score' in result else 0),
-                'message': 'Submission graded successfully' if parsed_feedback else 'Submission graded with parsing issues'
-            }
-            log_audit('ai_submit_task', request.user.id, {
+            return Response({
+                'job_id': job.id,
                 'task_id': exercise.id,
-                'score': result['score'],
-                'status': exercise.completion_status,
-                'parse_errors': exercise.parse_errors,
-            })
-            return Response(payload, status=status.HTTP_200_OK)
+                'status': job.status,
+                'message': 'Submission queued for grading' if created else 'Submission is already being graded'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            payload, status_code = grading.grade_exercise(request.user, exercise, user_solution)
+            return Response(payload, status=status_code)
         except Exception as e:
             MonitoringMetrics.record_ai_failure('grade_submission', str(e), request.user.id)
             logger.exception(f'Error grading submission: {e}')
             return Response({'error': 'Failed to grade submission', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class AIRecommendationsView(APIView):
+class GradingJobView(APIView):
+    """GET /learning/grading-jobs/<id>/ — status (and result once done) of a queued grading job."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            job = GradingJob.objects.get(pk=pk, user=request.user)
+        except GradingJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        payload = {
+            'job_id': job.id,
+            'task_id': job.exercise_id,
+            'status': job.status,
+            'attempts': job.attempts,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        }
+        if job.status in (GradingJobStatus.DONE, GradingJobStatus.FAILED):
+            payload['result'] = job.result
+            payload['http_status'] = job.http_status
+        return Response(payload)
+
+class AIRecommendationsView(AIThreadPoolMixin, AdmissionControlMixin, APIView):
     """
     POST /api/ai/recommendations/
     Generates personalized recommendations via AI.
     """
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ai-recommend'
 
     def post(self, request):
         current_skill = request.data.get('current_skill')
 
         try:
-            # Generate recommendations via AI
-            result = ai_service.generate_recommendations_xml(
-                user=request.user,
-                current_skill=current_skill
-            )
-
-            if 'error' in result:
-                return Response(result, status=status.HTTP_400_BAD_REQUEST)
-
-            # Save recommendation
-            recommendation = Recommendation.objects.create(
-                user=request.user,
-                ai_prompt=result.get('prompt_used', ''),
-                generated_recommendations_xml=result['recommendations_xml']
-            )
-
-            logger.info(f'AI recommendations generated for {request.user.username}, id={recommendation.id}')
-
-            log_audit('ai_recommendations', request.user.id, {
-                'recommendation_id': recommendation.id,
-            })
-            return Response({
-                'recommendation_id': recommendation.id,
-                'recommendations_xml': result['recommendations_xml'],
-                'message': 'Recommendations generated successfully'
-            }, status=status.HTTP_201_CREATED)
-
+            payload, status_code = ai_flows.generate_recommendations(request.user, current_skill)
+            return Response(payload, status=status_code)
         except Exception as e:
             logger.exception(f'Error generating recommendations: {e}')
             return Response({
@@ -383,7 +314,35 @@ class AIRecommendationsView(APIView):
         serializer = RecommendationSerializer(recommendations, many=True)
         return Response(serializer.data)
 
-class LevelTestView(APIView):
+class LLMStatsView(APIView):
+    """GET /learning/ai/llm-stats/ — per-call latency, circuit state and pool stats of the LLM client."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(llm_client.get_stats())
+
+class AdmissionStatsView(APIView):
+    """GET /learning/ai/admission-stats/ — in-flight AI calls, queue depth and rejection counters (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(admission.get_stats())
+
+class ResponseCacheStatsView(APIView):
+    """GET /learning/response-cache-stats/ — per-process response cache hit ratio (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.get_stats())
+
+class TaskPoolStatsView(APIView):
+    """GET /learning/ai/task-pool-stats/ — pool sizes and hit/miss counters per (task_type, level)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(task_pool.get_stats())
+
+class LevelTestView(AIThreadPoolMixin, APIView):
     """
     POST /learning/level-test/ - Start or submit test
     GET /learning/level-test/?action=current - Get current incomplete test
@@ -391,7 +350,7 @@ class LevelTestView(APIView):
     GET /learning/level-test/?action=status - User status
     """
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'level-test'
 
     def post(self, request):
@@ -401,35 +360,9 @@ class LevelTestView(APIView):
         if action == 'start':
             test_type = request.data.get('test_type', 'initial')
 
-            # Check for incomplete test
-            existing = LevelTest.objects.filter(user=request.user, completed=False).first()
-            if existing:
-                return Response({
-                    'error': 'You have an incomplete test',
-                    'test_id': existing.id,
-                    'message': 'Please complete or cancel the existing test first'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Generate test
             try:
-                result = ai_service.generate_level_test_xml(test_type)
-
-                level_test = LevelTest.objects.create(
-                    user=request.user,
-                    test_type=test_type,
-                    ai_generated_test_xml=result['test_xml'],
-                    ai_prompt=result.get('prompt_used', '')
-                )
-
-                logger.info(f'Level test started for {request.user.username}, id={level_test.id}')
-
-                return Response({
-                    'test_id': level_test.id,
-                    'test_xml': result['test_xml'],
-                    'test_type': test_type,
-                    'message': 'Level test generated successfully'
-                }, status=status.HTTP_201_CREATED)
-
+                payload, status_code = ai_flows.start_level_test(request.user, test_type)
+                return Response(payload, status=status_code)
             except Exception as e:
                 logger.exception(f'Error generating level test: {e}')
                 return Response({
@@ -453,43 +386,9 @@ class LevelTestView(APIView):
                     'error': 'Test not found or already completed'
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            # Evaluate test
             try:
-                evaluation = ai_service.evaluate_level_test(
-                    level_test.ai_generated_test_xml,
-                    user_answers
-                )
-
-                # Update test
-                level_test.user_answers = user_answers
-                level_test.ai_evaluation_xml = evaluation['evaluation_xml']
-                level_test.determined_level = evaluation['determined_level']
-                level_test.total_score = evaluation['total_score']
-                level_test.completed = True
-                level_test.completed_at = timezone.now()
-                level_test.save()
-
-                # Update user profile
-                profile = request.user.profile
-                profile.language_level = evaluation['determined_level']
-                profile.last_level_test_date = timezone.now()
-
-                # If this is the first test
-                if level_test.test_type == 'initial' and not profile.initial_test_completed:
-                    profile.initial_test_completed = True
-
-                profile.save()
-
-                logger.info(f'Level test {test_id} completed by {request.user.username}, level: {evaluation["determined_level"]}')
-
-                return Response({
-                    'test_id': level_test.id,
-                    'determined_level': evaluation['determined_level'],
-                    'total_score': evaluation['total_score'],
-                    'evaluation_xml': evaluation['evaluation_xml'],
-                    'message': 'Test completed successfully'
-                }, status=status.HTTP_200_OK)
-
+                payload, status_code = ai_flows.submit_level_test(request.user, level_test, user_answers)
+                return Response(payload, status=status_code)
             except Exception as e:
                 logger.exception(f'Error evaluating level test: {e}')
                 return Response({
@@ -520,30 +419,140 @@ class LevelTestView(APIView):
 
         elif action == 'history':
             # All tests history
-            tests = LevelTest.objects.filter(user=request.user, completed=True).order_by('-completed_at')[:10]
-            serializer = LevelTestSerializer(tests, many=True)
-            return Response(serializer.data)
+            def build():
+                tests = LevelTest.objects.filter(user=request.user, completed=True).order_by('-completed_at')[:10]
+                return list(LevelTestSerializer(tests, many=True).data)
+            return Response(response_cache.cached('level_test_history', request.user.id, build))
 
         elif action == 'status':
             # User status
-            profile = request.user.profile
-            return Response({
-                'initial_test_completed': profile.initial_test_completed,
-                'current_level': profile.language_level,
-                'last_test_date': profile.last_level_test_date.isoformat() if profile.last_level_test_date else None,
-                'has_active_test': LevelTest.objects.filter(user=request.user, completed=False).exists()
-            })
+            def build():
+                profile = request.user.profile
+                return {
+                    'initial_test_completed': profile.initial_test_completed,
+                    'current_level': profile.language_level,
+                    'last_test_date': profile.last_level_test_date.isoformat() if profile.last_level_test_date else None,
+                    'has_active_test': LevelTest.objects.filter(user=request.user, completed=False).exists()
+                }
+            return Response(response_cache.cached('level_test_status', request.user.id, build))
 
         else:
             return Response({
                 'error': 'Invalid action. Use "current", "history", or "status"'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class TaskListView(generics.ListAPIView):
+class AdaptiveLevelTestView(APIView):
+    """
+    POST /learning/level-test/adaptive/
+    action=start -> first item; action=answer (test_id, item_id, answer) -> next item or result.
+    Items come from the calibrated bank and the level is estimated locally (IRT), no LLM call.
+    """
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'level-test'
+
+    @staticmethod
+    def _item_payload(item_id):
+        item = AdaptiveTestItem.objects.only('id', 'question', 'options').get(pk=item_id)
+        return {'item_id': item.id, 'question': item.question, 'options': item.options}
+
+    def post(self, request):
+        action = request.data.get('action')
+
+        if action == 'start':
+            test_type = request.data.get('test_type', 'initial')
+            existing = LevelTest.objects.filter(user=request.user, completed=False).first()
+            if existing:
+                return Response({
+                    'error': 'You have an incomplete test',
+                    'test_id': existing.id,
+                    'message': 'Please complete or cancel the existing test first'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            state = adaptive_test.step([])
+            if state['next_item_id'] is None:
+                return Response({'error': 'Adaptive item bank is empty'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            level_test = LevelTest.objects.create(
+                user=request.user,
+                test_type=test_type,
+                ai_generated_test_xml='',
+                user_answers={'mode': 'adaptive', 'responses': [], 'pending_item_id': state['next_item_id']}
+            )
+            return Response({
+                'test_id': level_test.id,
+                'item': self._item_payload(state['next_item_id']),
+                'message': 'Adaptive level test started'
+            }, status=status.HTTP_201_CREATED)
+
+        elif action == 'answer':
+            test_id = request.data.get('test_id')
+            item_id = request.data.get('item_id')
+            answer = request.data.get('answer')
+            if not test_id or not item_id or answer is None:
+                return Response({'error': 'test_id, item_id and answer are required'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                level_test = LevelTest.objects.get(id=test_id, user=request.user, completed=False)
+            except LevelTest.DoesNotExist:
+                return Response({'error': 'Test not found or already completed'}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                item_id = int(item_id)
+            except (TypeError, ValueError):
+                return Response({'error': 'item_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            state = level_test.user_answers or {}
+            if state.get('mode') != 'adaptive' or item_id != state.get('pending_item_id'):
+                return Response({'error': 'Unexpected item for this test'}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                item = AdaptiveTestItem.objects.only('id', 'correct_answer').get(pk=item_id)
+            except AdaptiveTestItem.DoesNotExist:
+                return Response({'error': 'Test item not found'}, status=status.HTTP_404_NOT_FOUND)
+            credit, _ = local_grader.compare(item.correct_answer, answer)
+            state['responses'].append({'item_id': item.id, 'answer': answer, 'correct': credit == 1.0})
+            result = adaptive_test.step(state['responses'])
+            state.update(theta=result['theta'], se=result['se'], pending_item_id=result['next_item_id'])
+            level_test.user_answers = state
+
+            if not result['finished']:
+                level_test.save(update_fields=['user_answers'])
+                return Response({
+                    'test_id': level_test.id,
+                    'item': self._item_payload(result['next_item_id']),
+                    'answered': len(state['responses']),
+                })
+
+            level_test.determined_level = result['level']
+            level_test.total_score = sum(r['correct'] for r in state['responses']) / len(state['responses'])
+            level_test.completed = True
+            level_test.completed_at = timezone.now()
+            level_test.save()
+
+            profile = request.user.profile
+            profile.language_level = result['level']
+            profile.last_level_test_date = timezone.now()
+            if level_test.test_type == 'initial' and not profile.initial_test_completed:
+                profile.initial_test_completed = True
+            profile.save()
+
+            logger.info(f'Adaptive level test {test_id} completed by {request.user.username}, level: {result["level"]}')
+            return Response({
+                'test_id': level_test.id,
+                'determined_level': result['level'],
+                'total_score': level_test.total_score,
+                'theta': result['theta'],
+                'standard_error': result['se'],
+                'items_used': len(state['responses']),
+                'message': 'Test completed successfully'
+            }, status=status.HTTP_200_OK)
+
+        return Response({'error': 'Invalid action. Use "start" or "answer"'}, status=status.HTTP_400_BAD_REQUEST)
+
+class TaskListView(ConditionalGetMixin, HydrateArchivedMixin, SparseFieldsetViewMixin, generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'tasks'
     serializer_class = ExerciseHistorySerializer
+    pagination_class = KeysetPagination
+    # Compact listing; ?fields= / ?omit= select the large columns explicitly
+    default_fields = ('id', 'task_type', 'result_score', 'attempt_timestamp', 'completion_status')
 
     def get_queryset(self):
         qs = ExerciseHistory.objects.filter(user=self.request.user)
@@ -562,11 +571,11 @@ class TaskListView(generics.ListAPIView):
                     qs = qs.filter(attempt_timestamp__gte=dt)
             except Exception:
                 pass
-        return qs.order_by('-attempt_timestamp')
+        return qs.order_by('-attempt_timestamp', '-id')
 
-class TaskStartView(APIView):
+class TaskStartView(AIThreadPoolMixin, AdmissionControlMixin, IdempotencyMixin, APIView):
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ai-generate'
 
     def post(self, request):
@@ -577,16 +586,16 @@ class TaskStartView(APIView):
         # Переиспользуем AIGenerateTaskView
         return AIGenerateTaskView().post(request)
 
-class TaskSubmitView(APIView):
+class TaskSubmitView(AIThreadPoolMixin, AdmissionControlMixin, IdempotencyMixin, APIView):
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ai-submit'
 
     def post(self, request):
         # Переиспользуем AISubmitTaskView
         return AISubmitTaskView().post(request)
 
-class TaskDetailView(generics.RetrieveAPIView):
+class TaskDetailView(ConditionalGetMixin, HydrateArchivedMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ExerciseHistorySerializer
 
@@ -608,7 +617,7 @@ class UserProgressView(APIView):
 class RatingsIntakeView(APIView):
     """POST /learning/ratings/ — accept user ratings (task/recommendation/experience)."""
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'ratings'
 
     def post(self, request):
@@ -639,13 +648,15 @@ class RatingsIntakeView(APIView):
             except Exception:
                 return Response({'error': 'Object not found'}, status=404)
 
-        rating = Rating.objects.create(
-            user=request.user,
-            content_type=content_type if content_type else ContentType.objects.get_for_model(User),
-            object_id=object_id or request.user.id,
-            rating_type=rating_type,
-            value=value_i
-        )
+        with transaction.atomic():
+            rating = Rating.objects.create(
+                user=request.user,
+                content_type=content_type if content_type else ContentType.objects.get_for_model(User),
+                object_id=object_id or request.user.id,
+                rating_type=rating_type,
+                value=value_i
+            )
+            rating_stats.record(request.user.id, rating_type, value_i)
         logger.info(f'Rating stored: {rating_type}={value_i} by {request.user.username}')
         log_audit('rating_intake', request.user.id, {
             'rating_type': rating_type,
@@ -655,10 +666,49 @@ class RatingsIntakeView(APIView):
         })
         return Response({'message': 'Rating recorded', 'id': rating.id}, status=201)
 
+class RatingsBulkIntakeView(APIView):
+    """POST /learning/ratings/bulk/ — store many ratings ({"ratings": [...]}) in one request, all or nothing."""
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'ratings'
+
+    def post(self, request):
+        items = request.data.get('ratings')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'ratings must be a non-empty list'}, status=400)
+        if len(items) > settings.BULK_INTAKE_MAX_ITEMS:
+            return Response({'error': f'At most {settings.BULK_INTAKE_MAX_ITEMS} ratings per request'}, status=400)
+        try:
+            ratings = intake.create_ratings(request.user, items)
+        except intake.IntakeError as e:
+            return Response({'error': 'Invalid ratings', 'items': e.errors}, status=e.status_code)
+        logger.info(f'{len(ratings)} ratings stored by {request.user.username}')
+        log_audit('rating_intake_bulk', request.user.id, {
+            'count': len(ratings),
+            'rating_types': sorted({r.rating_type for r in ratings}),
+        })
+        return Response({'message': 'Ratings recorded', 'ids': [r.id for r in ratings]}, status=201)
+
+class RatingStatsView(APIView):
+    """GET /learning/ratings/stats/ — rolling rating statistics per type, for the user and globally."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rows = RatingAggregate.objects.filter(Q(user=request.user) | Q(user__isnull=True))
+        stats = {}
+        for row in rows:
+            scope = 'global' if row.user_id is None else 'user'
+            stats.setdefault(row.rating_type, {})[scope] = {
+                'count': row.count,
+                'average': row.average,
+                'histogram': row.histogram,
+            }
+        return Response(stats)
+
 class TaskFeedbackView(APIView):
     """POST /learning/tasks/feedback/ — accept arbitrary text feedback по задаче."""
     permission_classes = [IsAuthenticated]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'feedback'
 
     def post(self, request):
@@ -667,28 +717,54 @@ class TaskFeedbackView(APIView):
         if not task_id or not note:
             return Response({'error': 'task_id and note are required'}, status=400)
         try:
-            ex = ExerciseHistory.objects.get(pk=task_id, user=request.user)
-        except ExerciseHistory.DoesNotExist:
-            return Response({'error': 'Task not found'}, status=404)
-        ex.user_feedback_notes = (ex.user_feedback_notes or []) + [str(note)]
-        ex.save()
+            counts = intake.append_notes(request.user, [{'task_id': task_id, 'note': note}])
+        except intake.IntakeError as e:
+            return Response({'error': next(iter(e.errors.values()))}, status=e.status_code)
+        notes_count = next(iter(counts.values()))
         log_audit('task_feedback', request.user.id, {
-            'task_id': ex.id,
-            'notes_count': len(ex.user_feedback_notes)
+            'task_id': int(task_id),
+            'notes_count': notes_count
         })
-        return Response({'message': 'Feedback saved', 'notes_count': len(ex.user_feedback_notes)}, status=201)
+        return Response({'message': 'Feedback saved', 'notes_count': notes_count}, status=201)
+
+class TaskFeedbackBulkView(APIView):
+    """POST /learning/tasks/feedback/bulk/ — append many notes ({"notes": [{"task_id", "note"}, ...]}) at once."""
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'feedback'
+
+    def post(self, request):
+        items = request.data.get('notes')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'notes must be a non-empty list'}, status=400)
+        if len(items) > settings.BULK_INTAKE_MAX_ITEMS:
+            return Response({'error': f'At most {settings.BULK_INTAKE_MAX_ITEMS} notes per request'}, status=400)
+        try:
+            counts = intake.append_notes(request.user, items)
+        except intake.IntakeError as e:
+            return Response({'error': 'Invalid notes', 'items': e.errors}, status=e.status_code)
+        log_audit('task_feedback_bulk', request.user.id, {
+            'notes': len(items),
+            'tasks': len(counts),
+        })
+        return Response({'message': 'Feedback saved', 'notes_count': counts}, status=201)
 
 class RecommendationsOverviewView(APIView):
     """GET /learning/recommendations/ — return actual recommendations и недавние источники."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        return Response(response_cache.cached('recommendations_overview', request.user.id, lambda: self._build(request.user)), status=200)
+
+    def _build(self, user):
         # last 10 recommendations
-        recs = Recommendation.objects.filter(user=request.user).order_by('-timestamp')[:10]
-        data = RecommendationSerializer(recs, many=True).data
-        # effectiveness statistics (простая метрика по оценкам)
-        ratings = Rating.objects.filter(user=request.user, rating_type='recommendation')
-        avg = None
-        if ratings.exists():
-            avg = sum(r.value for r in ratings) / ratings.count()
-        return Response({'items': data, 'avg_recommendation_rating': avg}, status=200)
+        recs = Recommendation.objects.filter(user=user).order_by('-timestamp')[:10]
+        data = list(RecommendationSerializer(recs, many=True).data)
+        # effectiveness statistics (rolling aggregate, one row)
+        stats = rating_stats.get('recommendation', user.id)
+        return {
+            'items': data,
+            'avg_recommendation_rating': stats['average'],
+            'recommendation_rating_count': stats['count'],
+            'recommendation_rating_histogram': stats['histogram'],
+        }
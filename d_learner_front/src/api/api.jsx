@@ -59,10 +59,12 @@ Api.interceptors.response.use(
       }
     }
 
-    // Handle 429 Too Many Requests
-    if (error.response?.status === 429) {
-      const retryAfter = error.response.data?.retry_after || 60;
-      console.warn(`Rate limit exceeded. Retry after ${retryAfter} seconds`);
+    // Handle 429 Too Many Requests / 503 AI service overloaded
+    if ([429, 503].includes(error.response?.status)) {
+      const retryAfter = Number(error.response.headers?.['retry-after'])
+        || error.response.data?.retry_after || 60;
+      error.retryAfter = retryAfter;
+      console.warn(`Request rejected (${error.response.status}). Retry after ${retryAfter} seconds`);
     }
 
     // Handle network errors
@@ -75,4 +77,22 @@ Api.interceptors.response.use(
   }
 );
 
+// Idempotency keys identify one user action, not one HTTP request: create the key
+// when the action starts (form submit, "new task" click) and pass the same key to
+// every re-send of it, so the server replays the first response instead of
+// calling the LLM again.
+export const newIdempotencyKey = () => crypto.randomUUID();
+
+// Submitting an answer: one key per task attempt, so a double click or a re-send
+// after a timeout never grades the same attempt twice
+export const submitIdempotencyKey = (taskId, attempt) => `submit:${taskId}:${attempt}`;
+
+// POST to an endpoint that accepts Idempotency-Key (tasks/start, tasks/submit,
+// ai/generate-task, ai/submit-task)
+export const postIdempotent = (url, data, idempotencyKey, config = {}) =>
+  Api.post(url, data, {
+    ...config,
+    headers: { ...config.headers, 'Idempotency-Key': idempotencyKey },
+  });
+
 export default Api;
@@ -73,6 +73,8 @@ export const ENDPOINTS = {
   TASK_START: '/tasks/start/',
   TASK_SUBMIT: '/tasks/submit/',
   TASK_FEEDBACK: '/tasks/feedback/',
+  TASK_FEEDBACK_BULK: '/tasks/feedback/bulk/',
+  GRADING_JOB: '/grading-jobs/',
 
   // Level Test
   LEVEL_TEST: '/level-test/',
@@ -83,6 +85,7 @@ export const ENDPOINTS = {
 
   // Ratings
   RATINGS: '/ratings/',
+  RATINGS_BULK: '/ratings/bulk/',
 
   // Lessons
   LESSONS: '/lessons/',